@@ -0,0 +1,77 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Compares the cost of an ADD_ACTOR_COMMAND message with many commands,
+parsed one command at a time with an event each as it used to be, and
+parsed in bulk with a single ACTORS_MOVED event.
+
+Run from the top-level directory: python3 benchmarks/actorcommands.py
+"""
+import os
+import random
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.common.actors import ELActor
+from pyela.el.logic.events import ELEvent, ELEventType
+from pyela.el.logic.session import ELSession
+from pyela.el.net.connections import ELConnection
+from pyela.el.net.elconstants import ELNetFromServer, ELConstants
+from pyela.el.net.packets import ELPacket
+from pyela.el.net.parsers import ELAddActorCommandParser
+
+ACTORS = 200
+COMMANDS = (100, 500, 2000)
+
+def old_parse(connection, packet):
+	"""ELAddActorCommandParser.parse as it used to be"""
+	events = []
+	data = packet.data
+	offset = 0
+	while offset < len(data):
+		actor_id, command = struct.unpack_from('<HB', data, offset)
+		offset += 3
+		if actor_id in connection.session.actors:
+			connection.session.actors[actor_id].handle_command(command)
+			event = ELEvent(ELEventType(ELNetFromServer.ADD_ACTOR_COMMAND))
+			event.data = {'actor': connection.session.actors[actor_id], 'command': command, 'connection': connection}
+			events.append(event)
+	return events
+
+def main():
+	connection = ELConnection(ELSession('name', 'password'))
+	for i in range(ACTORS):
+		actor = ELActor()
+		actor.id = i
+		connection.session.actors[i] = actor
+	parser = ELAddActorCommandParser(connection)
+	commands = list(range(ELConstants.MOVE_N, ELConstants.MOVE_NW + 1)) + \
+		list(range(ELConstants.RUN_N, ELConstants.RUN_NW + 1)) + [ELConstants.TURN_LEFT, ELConstants.TURN_RIGHT]
+	random.seed(1)
+	print("%10s %16s %16s" % ("commands", "old us/command", "bulk us/command"))
+	for count in COMMANDS:
+		data = b''.join(struct.pack('<HB', random.randrange(ACTORS), random.choice(commands)) for i in range(count))
+		packet = ELPacket(ELNetFromServer.ADD_ACTOR_COMMAND, data)
+		number = max(1, 20000 // count)
+		old = min(timeit.repeat(lambda: old_parse(connection, packet), number=number, repeat=3))
+		new = min(timeit.repeat(lambda: parser.parse(packet), number=number, repeat=3))
+		print("%10d %16.3f %16.3f" % (count, old / number / count * 1e6, new / number / count * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,100 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Compares parsing ADD_NEW_ENHANCED_ACTOR messages with the parser as it
+used to be (byte-by-byte name scanning, no caching) and with the current
+single-pass ELAddActorMessageParser.
+
+Run from the top-level directory: python3 benchmarks/actors.py
+"""
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.common.actors import ELActor
+from pyela.el.logic.session import ELSession
+from pyela.el.net.connections import ELConnection
+from pyela.el.net.elconstants import ELNetFromServer, ELConstants
+from pyela.el.net.packets import ELPacket
+from pyela.el.net.parsers import ELAddActorMessageParser
+from pyela.el.util.strings import strip_chars, is_colour, el_colour_to_rgb, bytes_find, bytes_rfind
+
+NAMES = [b'\x8fPlayer%d \x83GUILD%d' % (i, i % 7) for i in range(20)] + \
+	[b'\x84Monster%d' % i for i in range(10)] + [b'Npc%d' % i for i in range(10)]
+
+def old_parse(connection, packet):
+	"""The name, guild and colour parsing ELAddActorMessageParser.parse used to do"""
+	actor = ELActor()
+	actor.id, actor.x_pos, actor.y_pos, actor.z_pos, \
+	actor.z_rot, actor.type, frame, actor.max_health, \
+	actor.cur_health, actor.kind_of_actor \
+	= struct.unpack('<HHHHHBBHHB', packet.data[:17])
+	actor.x_pos = actor.x_pos & 0x7FF
+	actor.y_pos = actor.y_pos & 0x7FF
+	actor.name = packet.data[28:]
+	frame = packet.data[22]
+	actor.kind_of_actor = packet.data[27]
+	name_end = bytes_find(actor.name, 0)
+	if name_end < len(actor.name)-2:
+		actor.scale = struct.unpack('<H', actor.name[name_end+1:name_end+3])[0]
+		actor.name = actor.name[:name_end]
+	else:
+		actor.scale = 1
+		actor.name = actor.name[:-1]
+	i = 0
+	while i < len(actor.name) and is_colour(actor.name[i]):
+		actor.name_colour = el_colour_to_rgb(actor.name[i])
+		i += 1
+	if actor.name_colour[0] == -1:
+		actor.name_colour = (1.0, 1.0, 1.0)
+	space = bytes_rfind(actor.name, ord(' '))
+	if space != -1 and space > 0 and space+1 < len(actor.name) and is_colour(actor.name[space+1]):
+		actor.name = strip_chars(actor.name)
+		tokens = actor.name.rsplit(' ', 1)
+		actor.name = tokens[0]
+		actor.guild = tokens[1]
+	else:
+		actor.name = strip_chars(actor.name)
+	connection.session.actors[actor.id] = actor
+	return actor
+
+def make_packet(i):
+	name = NAMES[i % len(NAMES)]
+	data = struct.pack('<HHHHHBBBBBBBBBBBBBHHB', i, 10, 20, 0, 90, 1, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 0, 50, 40, 1) + \
+		name + b'\0' + struct.pack('<HB', 256, 255)
+	return ELPacket(ELNetFromServer.ADD_NEW_ENHANCED_ACTOR, data)
+
+def main():
+	connection = ELConnection(ELSession('name', 'password'))
+	parser = ELAddActorMessageParser(connection)
+	packets = [make_packet(i) for i in range(1000)]
+	for packet in packets[:len(NAMES)]:
+		old = old_parse(connection, packet)
+		parser.parse(packet)
+		new = connection.session.actors[old.id]
+		assert (old.name, old.guild, old.name_colour, old.scale) == (new.name, new.guild, new.name_colour, new.scale)
+	number = 5
+	old = min(timeit.repeat(lambda: [old_parse(connection, p) for p in packets], number=number, repeat=3))
+	new = min(timeit.repeat(lambda: [parser.parse(p) for p in packets], number=number, repeat=3))
+	print("%-30s %10s" % ("", "us/actor"))
+	print("%-30s %10.3f" % ("old parser", old / number / len(packets) * 1e6))
+	print("%-30s %10.3f" % ("single-pass, cached names", new / number / len(packets) * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,68 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures the per-packet overhead of naming packet types in
+BaseELPacketHandler.process_packets, before and after the lookup tables of
+pyela.el.net.elconstants.
+
+Run from the top-level directory: python3 benchmarks/constants.py
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.net.elconstants import ELNetFromServer
+from pyela.el.net.packethandlers import BaseELPacketHandler
+from pyela.el.net.packets import ELPacket
+
+PACKETS = 10000
+
+def reflective_to_identifier(instance, val):
+	"""The lookup ReflectiveConstants.to_identifier used to do"""
+	for att in dir(instance):
+		if not att.startswith("__") and getattr(instance, att) == int(val):
+			return att
+
+def old_process_packets(packets, log=logging.getLogger('benchmark')):
+	"""process_packets as it used to be, with no parsers registered"""
+	events = []
+	for packet in packets:
+		log.debug("Message: %s?, %d, type=%s" % \
+			(reflective_to_identifier(ELNetFromServer(), int(packet.type)), packet.type, type(packet)))
+	return events
+
+def main():
+	logging.basicConfig(level=logging.INFO)
+	types = list(ELNetFromServer.names)
+	packets = [ELPacket(types[i % len(types)], b'') for i in range(PACKETS)]
+	handler = BaseELPacketHandler(None)
+
+	for i in types:
+		assert reflective_to_identifier(ELNetFromServer(), i) == ELNetFromServer.name_of(i)
+	print("%-36s %10s" % ("", "us/packet"))
+	number = 3
+	t = min(timeit.repeat(lambda: old_process_packets(packets[:1000]), number=number, repeat=3))
+	print("%-36s %10.3f" % ("to_identifier() via dir()", t / number / 1000 * 1e6))
+	t = min(timeit.repeat(lambda: handler.process_packets(packets), number=number, repeat=3))
+	print("%-36s %10.3f" % ("process_packets(), debug off", t / number / PACKETS * 1e6))
+	t = min(timeit.repeat(lambda: [ELNetFromServer.name_of(p.type) for p in packets], number=number, repeat=3))
+	print("%-36s %10.3f" % ("name_of() table lookup", t / number / PACKETS * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,152 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures how many events per second go from a parser to the handlers
+through ELSimpleEventManager, compared with the event types and the
+singleton proxy as they used to be. Each event gets a new event type, as
+the parsers do, and half of the events have no handler.
+
+Then compares a handler per bot on one shared event manager, where each
+handler has to skip the other bots' events, with a handler on each bot's
+own event manager.
+
+Run from the top-level directory: python3 benchmarks/events.py
+"""
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.logic.eventmanager import SimpleEventManager
+from pyela.el.logic.eventmanagers import ELEventManager, ELSimpleEventManager
+from pyela.el.logic.events import ELEvent, ELEventType
+from pyela.el.net.elconstants import ELNetFromServer
+
+log = logging.getLogger('benchmarks.events')
+
+EVENTS = 100000
+
+class OldELEventType(object):
+	"""ELEventType as it used to be"""
+	def __init__(self, id):
+		self.id = id
+
+	def __str__(self):
+		return repr("ELEventType.id=%i" % self.id)
+
+	def __eq__(self, other):
+		return self.id == other.id
+
+	def __hash__(self):
+		s = self.__str__()
+		return hash(s)
+
+class OldELSimpleEventManager(object):
+	"""ELSimpleEventManager as it used to be"""
+	__instance = None
+
+	class __impl(SimpleEventManager):
+		def raise_event(self, event):
+			log.debug("Got event: %s" % event)
+			if event.type in self._handlers:
+				for handler in self._handlers[event.type]:
+					handler.notify(event)
+			else:
+				log.debug("Event %s not handled, no mapping available" % event)
+
+		def add_handler(self, event_handler):
+			for t in event_handler.get_event_types():
+				if t in self._handlers:
+					self._handlers[t].append(event_handler)
+				else:
+					self._handlers[t] = [event_handler]
+
+	def __init__(self):
+		if OldELSimpleEventManager.__instance is None:
+			OldELSimpleEventManager.__instance = OldELSimpleEventManager.__impl()
+		self.__dict__['_OldELSimpleEventManager__instance'] = OldELSimpleEventManager.__instance
+
+	def __getattr__(self, attr):
+		return getattr(self.__instance, attr)
+
+class CountingHandler(object):
+	def __init__(self, event_types):
+		self.event_types = event_types
+		self.count = 0
+
+	def get_event_types(self):
+		return self.event_types
+
+	def notify(self, event):
+		self.count += 1
+
+def run(type_class, manager_class):
+	"""Returns the events per second raised with the given classes"""
+	handlers = [CountingHandler([type_class(ELNetFromServer.RAW_TEXT)]) for i in range(3)]
+	for handler in handlers:
+		manager_class().add_handler(handler)
+	ids = [ELNetFromServer.RAW_TEXT, ELNetFromServer.NEW_MINUTE] * (EVENTS // 2)
+	def raise_all():
+		em = manager_class()
+		for id in ids:
+			em.raise_event(ELEvent(type_class(id)))
+	t = min(timeit.repeat(raise_all, number=1, repeat=3))
+	assert handlers[0].count == 3 * EVENTS // 2
+	return EVENTS / t
+
+class BotHandler(CountingHandler):
+	"""Counts the events of one bot"""
+	def __init__(self, event_types, bot):
+		CountingHandler.__init__(self, event_types)
+		self.bot = bot
+
+	def notify(self, event):
+		if event.data['connection'] is self.bot:
+			self.count += 1
+
+def run_bots(bots, shared):
+	"""Returns the events per second raised for bots bots, with a handler per
+	bot on a shared event manager, or on each bot's own event manager"""
+	types = [ELEventType(ELNetFromServer.RAW_TEXT)]
+	parent = ELEventManager()
+	managers = [ELEventManager(parent) for bot in range(bots)]
+	for bot, em in enumerate(managers):
+		(parent if shared else em).add_handler(BotHandler(types, bot))
+	events = []
+	for bot in range(bots):
+		event = ELEvent(types[0])
+		event.data = {'connection': bot}
+		events.append((managers[bot], event))
+	events = events * (EVENTS // bots // 10)
+	def raise_all():
+		for em, event in events:
+			em.raise_event(event)
+	t = min(timeit.repeat(raise_all, number=1, repeat=3))
+	return len(events) / t
+
+def main():
+	print("%-28s %12s" % ("", "events/s"))
+	print("%-28s %12d" % ("old types and manager", run(OldELEventType, OldELSimpleEventManager)))
+	print("%-28s %12d" % ("interned types, dispatch", run(ELEventType, ELSimpleEventManager)))
+	print()
+	print("%8s %18s %18s" % ("bots", "shared events/s", "per-bot events/s"))
+	for bots in (1, 10, 100, 500):
+		print("%8d %18d %18d" % (bots, run_bots(bots, True), run_bots(bots, False)))
+
+if __name__ == '__main__':
+	main()
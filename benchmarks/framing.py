@@ -0,0 +1,79 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Compares the cost per packet of framing a burst of messages received in
+one read, using the old re-slicing input buffer and ELPacketFramer, and
+the cost of skipping messages nobody handles.
+
+Run from the top-level directory: python3 benchmarks/framing.py
+"""
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.net.elconstants import ELNetFromServer
+from pyela.el.net.framing import ELPacketFramer
+from pyela.el.net.packets import ELPacket
+
+BURST_SIZES = (10, 100, 1000, 5000, 20000)
+
+def make_burst(count):
+	"""A burst of ADD_ACTOR_COMMAND messages, each with three commands"""
+	payload = struct.pack('<HBHBHB', 1, 2, 3, 4, 5, 6)
+	msg = struct.pack('<BH', ELNetFromServer.ADD_ACTOR_COMMAND, len(payload) + 1) + payload
+	return msg * count
+
+def reslice_framing(data):
+	"""The framing ELConnection.recv used to do"""
+	inp = bytearray()
+	inp += data
+	packets = []
+	while len(inp) >= 3:
+		header = struct.unpack('<BH', inp[:3])
+		msg_len = header[1]-1
+		if len(inp) >= msg_len+3:
+			packets.append(ELPacket(header[0], inp[3:3+msg_len]))
+			inp = inp[3+msg_len:]
+		else:
+			break
+	return packets
+
+def framer_framing(data, framer=ELPacketFramer()):
+	framer.feed(data)
+	return framer.packets()
+
+def skipping_framing(data, framer=ELPacketFramer(), wanted=bytearray(256)):
+	"""Framing when the packet handler has no use for the message type"""
+	framer.feed(data)
+	return framer.packets(wanted)
+
+def main():
+	print("%8s %16s %16s %16s" % ("packets", "re-slice us/pkt", "framer us/pkt", "skipped us/pkt"))
+	for count in BURST_SIZES:
+		data = make_burst(count)
+		assert len(reslice_framing(data)) == len(framer_framing(data)) == count
+		number = max(1, 20000 // count)
+		old = min(timeit.repeat(lambda: reslice_framing(data), number=number, repeat=3))
+		new = min(timeit.repeat(lambda: framer_framing(data), number=number, repeat=3))
+		skipped = min(timeit.repeat(lambda: skipping_framing(data), number=number, repeat=3))
+		print("%8d %16.3f %16.3f %16.3f" % (count, old / number / count * 1e6, new / number / count * 1e6, \
+			skipped / number / count * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,94 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures how long the loop is held up by raising the events of a read
+when a handler does slow, blocking work for each of them (a sleep standing
+in for disk or database I/O), with the handler run inline and off the loop.
+
+Run from the top-level directory: python3 benchmarks/offloop.py
+"""
+import os
+import selectors
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.logic.eventhandlers import OffLoopEventHandler, INLINE, THREAD
+from pyela.logic.workers import EventWorkers
+from pyela.el.logic.eventmanagers import ELEventManager
+from pyela.el.logic.events import ELEvent, ELEventType
+from pyela.el.net.elconstants import ELNetFromServer
+
+READS = 20
+
+EVENTS_PER_READ = 5
+
+WORK_SECS = 0.01
+
+TYPE = ELEventType(ELNetFromServer.RAW_TEXT)
+
+class SlowHandler(OffLoopEventHandler):
+	def __init__(self, execution):
+		self.execution = execution
+		self.applied = 0
+
+	def get_event_types(self):
+		return [TYPE]
+
+	def work(self, arg):
+		time.sleep(WORK_SECS)
+
+	def apply(self, event, result):
+		self.applied += 1
+
+def run(execution, handlers):
+	"""Returns the average and the highest amount of seconds raising the
+	events of a read took, and the seconds until all the work was applied"""
+	workers = EventWorkers()
+	em = ELEventManager(ELEventManager())
+	em.parent.workers = workers
+	slow = [SlowHandler(execution) for i in range(handlers)]
+	for handler in slow:
+		em.add_handler(handler)
+	selector = selectors.DefaultSelector()
+	selector.register(workers.fileno(), selectors.EVENT_READ)
+	stalls = []
+	start = time.time()
+	for i in range(READS):
+		t = time.time()
+		em.raise_events([ELEvent(TYPE) for j in range(EVENTS_PER_READ)])
+		stalls.append(time.time() - t)
+		if selector.select(0):
+			workers.process_done()
+	while sum(handler.applied for handler in slow) < READS * EVENTS_PER_READ * handlers:
+		selector.select(1)
+		workers.process_done()
+	total = time.time() - start
+	workers.shutdown()
+	return sum(stalls) / len(stalls), max(stalls), total
+
+def main():
+	print("%d reads of %d events, %.0f ms of work per event and handler" % \
+		(READS, EVENTS_PER_READ, WORK_SECS * 1000))
+	print("%-10s %9s %14s %14s %10s" % ("", "handlers", "avg stall ms", "max stall ms", "total s"))
+	for handlers in (1, 4):
+		for name, execution in (("inline", INLINE), ("thread", THREAD)):
+			avg, worst, total = run(execution, handlers)
+			print("%-10s %9d %14.3f %14.3f %10.3f" % (name, handlers, avg * 1000, worst * 1000, total))
+
+if __name__ == '__main__':
+	main()
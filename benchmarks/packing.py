@@ -0,0 +1,55 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Compares building a WHO reply the old way, joining every actor into one
+string and cutting it every 157 characters, with pack_text(), for a few
+amounts of actors. Shows the messages needed and the time per reply.
+
+Run from the top-level directory: python3 benchmarks/packing.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.util.strings import split_str, str_to_el_str, pack_text
+
+NAMES = ['Adventurer', 'Xx_Slayer_xX', 'Gu\xe9rrier', 'Bob', 'LongerPlayerName', 'Mo'] * 1000
+
+def old_who(names):
+	"""BotRawTextEventHandler._do_who as it used to be, encoding included"""
+	names_str = ""
+	for name in names:
+		names_str += "%s, " % name
+	return [str_to_el_str(part) for part in split_str(names_str, 157)]
+
+def new_who(names):
+	return list(pack_text(names))
+
+def main():
+	print("%8s %12s %12s %14s %14s" % ("actors", "old msgs", "new msgs", "old us/reply", "new us/reply"))
+	for count in (10, 100, 1000, 5000):
+		names = NAMES[:count]
+		old = old_who(names)
+		new = new_who(names)
+		assert b', '.join(new) == ', '.join(names).encode('el')
+		t_old = min(timeit.repeat(lambda: old_who(names), number=20, repeat=3)) / 20
+		t_new = min(timeit.repeat(lambda: new_who(names), number=20, repeat=3)) / 20
+		print("%8d %12d %12d %14.1f %14.1f" % (count, len(old), len(new), t_old * 1e6, t_new * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,139 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures, with tracemalloc, the memory allocated for the events of each
+parsed packet, with the events' payloads as the dicts they used to be and
+as the slotted EventData classes. The events are kept alive until the
+measurement is done, like they are while the handlers of a batch run.
+
+Run from the top-level directory: python3 benchmarks/payloads.py
+"""
+import os
+import random
+import struct
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.common.actors import ELActor
+from pyela.el.logic.eventmanagers import ELEventManager
+from pyela.el.logic.events import ELEventType
+from pyela.el.logic.session import ELSession
+from pyela.el.net.connections import ELConnection
+from pyela.el.net.elconstants import ELNetFromServer, ELConstants
+from pyela.el.net.packets import ELPacket
+from pyela.el.net.parsers import ELRawTextMessageParser, ELAddActorCommandParser, ELRemoveActorMessageParser
+from pyela.el.util.strings import strip_chars
+
+PACKETS = 2000
+ACTORS = 200
+COMMANDS_PER_PACKET = 10
+
+class OldELEvent(object):
+	"""ELEvent as it used to be, without __slots__"""
+	def __init__(self, type):
+		self.type = type
+
+def old_raw_text(connection, packet):
+	event = OldELEvent(ELEventType(ELNetFromServer.RAW_TEXT))
+	event.data = {}
+	event.data['connection'] = connection
+	event.data['channel'] = packet.data[0]
+	event.data['text'] = strip_chars(packet.data[1:])
+	event.data['raw'] = packet.data[1:]
+	return [event]
+
+def old_actor_command(connection, packet):
+	events = []
+	actors = connection.session.actors
+	for actor_id, command in struct.iter_unpack('<HB', packet.data):
+		event = OldELEvent(ELEventType(ELNetFromServer.ADD_ACTOR_COMMAND))
+		event.data = {'actor': actors[actor_id], 'command': command, 'connection': connection}
+		events.append(event)
+	return events
+
+def old_remove_actor(connection, packet):
+	events = []
+	for actor_id, in struct.iter_unpack('<H', packet.data):
+		event = OldELEvent(ELEventType(ELNetFromServer.REMOVE_ACTOR))
+		event.data = {}
+		event.data['connection'] = connection
+		event.data['id'] = actor_id
+		event.data['actor'] = connection.session.actors[actor_id]
+		events.append(event)
+	return events
+
+class Handler(object):
+	def get_event_types(self):
+		return [ELEventType(ELNetFromServer.RAW_TEXT), ELEventType(ELNetFromServer.ADD_ACTOR_COMMAND)]
+
+	def notify(self, event):
+		pass
+
+def new_connection():
+	connection = ELConnection(ELSession('name', 'password'), event_manager=ELEventManager())
+	connection.event_manager.add_handler(Handler())
+	for i in range(ACTORS):
+		actor = ELActor()
+		actor.id = i
+		connection.session.actors[i] = actor
+	return connection
+
+def measure(parse, connection, packets):
+	"""Returns (bytes, blocks) allocated and still held per packet"""
+	tracemalloc.start()
+	before = tracemalloc.take_snapshot()
+	events = [parse(connection, packet) for packet in packets]
+	after = tracemalloc.take_snapshot()
+	tracemalloc.stop()
+	stats = after.compare_to(before, 'filename')
+	size = sum(stat.size_diff for stat in stats)
+	count = sum(stat.count_diff for stat in stats)
+	del events
+	return size / len(packets), count / len(packets)
+
+def main():
+	random.seed(1)
+	text = [ELPacket(ELNetFromServer.RAW_TEXT, bytes([ELConstants.CHAT_LOCAL, 127 + ELConstants.C_GREY1]) + \
+		b'Someone: hello there, anyone selling iron bars? %d' % i) for i in range(PACKETS)]
+	commands = [ELPacket(ELNetFromServer.ADD_ACTOR_COMMAND, b''.join(struct.pack('<HB', random.randrange(ACTORS), \
+		ELConstants.MOVE_N + random.randrange(8)) for j in range(COMMANDS_PER_PACKET))) for i in range(PACKETS)]
+	removes = [ELPacket(ELNetFromServer.REMOVE_ACTOR, struct.pack('<HH', random.randrange(ACTORS), \
+		random.randrange(ACTORS))) for i in range(PACKETS)]
+	def new_parse(parser_class):
+		def parse(connection, packet):
+			events = parser_class(connection).parse(packet)
+			if parser_class is ELRemoveActorMessageParser:
+				# Don't run out of actors to remove
+				for event in events:
+					connection.session.actors[event.data.id] = event.data.actor
+			return events
+		return parse
+	cases = [
+		("RAW_TEXT", text, old_raw_text, new_parse(ELRawTextMessageParser)),
+		("ADD_ACTOR_COMMAND x%d" % COMMANDS_PER_PACKET, commands, old_actor_command, new_parse(ELAddActorCommandParser)),
+		("REMOVE_ACTOR x2", removes, old_remove_actor, new_parse(ELRemoveActorMessageParser)),
+	]
+	print("%-24s %14s %14s %14s %14s" % ("", "dict B/packet", "slots B/packet", "dict blocks", "slots blocks"))
+	for name, packets, old, new in cases:
+		old_size, old_count = measure(old, new_connection(), packets)
+		new_size, new_count = measure(new, new_connection(), packets)
+		print("%-24s %14.0f %14.0f %14.1f %14.1f" % (name, old_size, new_size, old_count, new_count))
+
+if __name__ == '__main__':
+	main()
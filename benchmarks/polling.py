@@ -0,0 +1,85 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Measures the overhead of one MultiConnectionManager loop iteration as the
+number of connections grows, comparing the old approach (a new poll object
+per iteration, every connection registered again and the ready file
+descriptors resolved with a linear scan) with a persistent selector.
+
+One connection has data waiting in every iteration.
+
+Run from the top-level directory: python3 benchmarks/polling.py
+"""
+import os
+import select
+import selectors
+import socket
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+CONNECTION_COUNTS = (10, 100, 250, 500)
+
+class FakeConnection(object):
+	def __init__(self, sock):
+		self.socket = sock
+
+	def fileno(self):
+		return self.socket.fileno()
+
+	def is_connected(self):
+		return True
+
+def rebuild_poll(connections):
+	"""One iteration of the old poll loop"""
+	p = select.poll()
+	for con in connections:
+		if con.is_connected():
+			p.register(con, select.POLLIN | select.POLLPRI | select.POLLERR)
+	found = []
+	for fd, event in p.poll(0):
+		for con in connections:
+			if con.is_connected() and con.fileno() == fd:
+				found.append(con)
+				break
+	return found
+
+def persistent_selector(selector):
+	"""One iteration of the selector based loop"""
+	return [key.data for key, events in selector.select(0)]
+
+def main():
+	print("%12s %18s %18s" % ("connections", "rebuild us/iter", "selector us/iter"))
+	for count in CONNECTION_COUNTS:
+		pairs = [socket.socketpair() for i in range(count)]
+		connections = [FakeConnection(a) for a, b in pairs]
+		pairs[count // 2][1].send(b'x')
+		selector = selectors.DefaultSelector()
+		for con in connections:
+			selector.register(con.fileno(), selectors.EVENT_READ, con)
+		assert rebuild_poll(connections) == persistent_selector(selector) == [connections[count // 2]]
+		number = 200
+		old = min(timeit.repeat(lambda: rebuild_poll(connections), number=number, repeat=3))
+		new = min(timeit.repeat(lambda: persistent_selector(selector), number=number, repeat=3))
+		print("%12d %18.2f %18.2f" % (count, old / number * 1e6, new / number * 1e6))
+		selector.close()
+		for a, b in pairs:
+			a.close()
+			b.close()
+
+if __name__ == '__main__':
+	main()
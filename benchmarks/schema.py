@@ -0,0 +1,61 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Compares decoding messages with format strings parsed on every call, as
+the parsers used to, with the precompiled layouts of pyela.el.net.schema.
+
+Run from the top-level directory: python3 benchmarks/schema.py
+"""
+import os
+import struct
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.net.elconstants import ELNetFromServer
+from pyela.el.net.schema import FROM_SERVER
+
+NUMBER = 100000
+
+def main():
+	actor = struct.pack('<HHHHHBBHHB', 1, 2, 3, 4, 5, 6, 7, 8, 9, 10) + b'Name\0'
+	channels = struct.pack('<BIIII', 1, 2, 3, 4, 5)
+	commands = struct.pack('<HB', 1, 2) * 50
+	new_actor = FROM_SERVER[ELNetFromServer.ADD_NEW_ACTOR]
+	active_channels = FROM_SERVER[ELNetFromServer.GET_ACTIVE_CHANNELS]
+	actor_command = FROM_SERVER[ELNetFromServer.ADD_ACTOR_COMMAND]
+	cases = [
+		("ADD_NEW_ACTOR",
+			lambda: struct.unpack('<HHHHHBBHHB', actor[:17]),
+			lambda: new_actor.decode(actor)),
+		("GET_ACTIVE_CHANNELS",
+			lambda: struct.unpack('<BIIII', channels),
+			lambda: active_channels.decode(channels)),
+		("ADD_ACTOR_COMMAND x50",
+			lambda: [struct.unpack_from('<HB', commands, o) for o in range(0, len(commands), 3)],
+			lambda: list(actor_command.decode_all(commands))),
+	]
+	print("%-24s %14s %14s" % ("message", "format us", "schema us"))
+	for name, old, new in cases:
+		assert list(old()) == list(new())
+		number = NUMBER // 50 if 'x50' in name else NUMBER
+		t_old = min(timeit.repeat(old, number=number, repeat=3))
+		t_new = min(timeit.repeat(new, number=number, repeat=3))
+		print("%-24s %14.3f %14.3f" % (name, t_old / number * 1e6, t_new / number * 1e6))
+
+if __name__ == '__main__':
+	main()
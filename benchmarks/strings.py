@@ -0,0 +1,116 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Compares strip_chars() and str_to_el_str() as they used to be, looping
+over every character in Python, with the table-driven versions and the
+'el' codec, on a corpus of typical chat lines. Does the same for splitting
+a line into colour runs, as the chat GUI does.
+
+Run from the top-level directory: python3 benchmarks/strings.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pyela.el.net.elconstants import ELConstants
+from pyela.el.util.strings import strip_chars, str_to_el_str, split_colours, is_colour, \
+	is_special_char, special_char_to_char, char_to_special_char
+
+def colour(c):
+	return bytes([127 + c])
+
+# RAW_TEXT payloads (without the channel byte) as the server sends them
+CORPUS = [
+	colour(ELConstants.C_GREY1) + b'[PM from Someone: are you selling any fire essences?]',
+	colour(ELConstants.C_LBOUND) + b'[6] SomePlayer: WTB 500 iron bars, paying 25gc each, pm me',
+	colour(ELConstants.C_GREEN1) + b'You are in Isla Prima [123,45]',
+	colour(ELConstants.C_ORANGE1) + b'#GM from Moderator: Please keep market talk in channel 3',
+	colour(ELConstants.C_GREY1) + b'Gu\xe9rrier: d\xe9j\xe0 vu, \xe7a va tr\xe8s bien merci',
+	colour(ELConstants.C_YELLOW1) + b'You gained 120 harvesting exp. ' + colour(ELConstants.C_GREY1) + b'(1234/5678)',
+	colour(ELConstants.C_BLUE1) + b'[3] Trader: ' + colour(ELConstants.C_RED1) + b'WTS' + colour(ELConstants.C_BLUE1) + \
+		b' titanium serpent sword, enriched ring of portland, 3x hydrogenium ore. Offers?',
+	colour(ELConstants.C_GREY1) + b'Just now: Stra\xdfe, M\xfcller, \xc5ngstr\xf6m logged in',
+] * 25
+
+# Typical outgoing messages
+OUTGOING = ['@@3 WTB bones and ashes', 'Hi there, how are you doing today?', 'd\xe9j\xe0 vu, \xe7a va tr\xe8s bien', \
+	'/SomeBuddy can you meet me at the VotD storage?'] * 50
+
+def old_strip_chars(s):
+	"""strip_chars as it used to be"""
+	stripped_str = ""
+	for char in s:
+		if not is_colour(char):
+			if is_special_char(char):
+				stripped_str += special_char_to_char(char)
+			elif char < 127 and char > 0:
+				stripped_str += str(chr(char))
+	return stripped_str
+
+def old_str_to_el_str(s):
+	"""str_to_el_str as it used to be"""
+	out_str = bytearray()
+	for char in s:
+		if ord(char) > 127:
+			elch = char_to_special_char(char)
+			if elch != None:
+				out_str.append(ord(elch))
+		else:
+			out_str += char.encode('ascii', 'replace')
+	return out_str
+
+def old_split_colours(s):
+	"""The chat GUI's parse_el_colours as it used to be, without the tags"""
+	runs = []
+	colour = None
+	text = ""
+	for char in s:
+		if is_colour(char):
+			if len(text):
+				runs.append((colour, text))
+			text = ""
+			colour = char - 127
+		else:
+			text += special_char_to_char(char)
+	if len(text):
+		runs.append((colour, text))
+	return runs
+
+def main():
+	for line in CORPUS:
+		assert old_strip_chars(line) == strip_chars(line) == line.decode('el')
+		assert old_split_colours(line) == split_colours(line)
+	for line in OUTGOING:
+		assert old_str_to_el_str(line) == str_to_el_str(line)
+	cases = [
+		("decode, old strip_chars", lambda: [old_strip_chars(l) for l in CORPUS], len(CORPUS)),
+		("decode, strip_chars", lambda: [strip_chars(l) for l in CORPUS], len(CORPUS)),
+		("decode, bytes.decode('el')", lambda: [l.decode('el') for l in CORPUS], len(CORPUS)),
+		("colours, old parse_el_colours", lambda: [old_split_colours(l) for l in CORPUS], len(CORPUS)),
+		("colours, split_colours", lambda: [split_colours(l) for l in CORPUS], len(CORPUS)),
+		("encode, old str_to_el_str", lambda: [old_str_to_el_str(l) for l in OUTGOING], len(OUTGOING)),
+		("encode, str_to_el_str", lambda: [str_to_el_str(l) for l in OUTGOING], len(OUTGOING)),
+		("encode, str.encode('el')", lambda: [l.encode('el') for l in OUTGOING], len(OUTGOING)),
+	]
+	print("%-32s %10s" % ("", "us/line"))
+	for name, func, lines in cases:
+		t = min(timeit.repeat(func, number=20, repeat=3))
+		print("%-32s %10.3f" % (name, t / 20 / lines * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -18,19 +18,23 @@
 
 from pyela.logic.eventhandlers import BaseEventHandler
 from pyela.el.logic.events import ELEventType
-from pyela.el.util.strings import split_str
+from pyela.el.logic.textfilters import TextFilter
+from pyela.el.util.strings import pack_text, str_to_el_str
 from pyela.el.net.packets import ELPacket
 from pyela.el.net.elconstants import ELNetFromServer, ELNetToServer
 
 import logging
+import re
 import time
 
 log = logging.getLogger('pyela.bots.logic.eventhandlers')
 
 class BotRawTextEventHandler(BaseEventHandler):
-	"""Handles RAW_TEXT messages
+	"""Handles RAW_TEXT messages addressed to the bot called name, like
+	"Someone: name, who". Its text filter lets no other messages through
 
 	Attributes:
+		name	 - the name of the bot
 		commands - a dict of command name ('who', 'inv') and the 
 					respective callback to use
 					
@@ -39,12 +43,16 @@ class BotRawTextEventHandler(BaseEventHandler):
 					- person: The person who sent the command
 					- params: A list of the parameters to the command (params[0] is the command itself)
 					
-					The callback must return a list of ELPacket instances it wants to return
-					to the server.
+					The callback must return a list (or any other iterable) of ELPacket
+					instances it wants to return to the server.
 	"""
 
-	def __init__(self):
+	def __init__(self, name):
+		self.name = name
 		self.event_types = [ELEventType(ELNetFromServer.RAW_TEXT)]
+		# Anyone but the bot itself, followed by the bot's name and a comma
+		el_name = re.escape(name.encode('el', 'replace'))
+		self.text_filters = [TextFilter(pattern=re.compile(b'(?!' + el_name + b':)[^:]+: ' + el_name + b',', re.I))]
 		self.commands = {}
 		self.commands['WHO'] = self._do_who
 		self.commands['HI'] = self._do_hi
@@ -52,30 +60,25 @@ class BotRawTextEventHandler(BaseEventHandler):
 		self.commands['LICK'] = self._do_lick
 
 	def notify(self, event):
+		# The text filter only lets "person: name, command params" through
 		text = event.data['text']
-
-		name_str = "%s:" % event.data['connection'].session.name
-		#TODO: This must all be cleaned up
-		if not text.startswith(name_str):
-			if log.isEnabledFor(logging.DEBUG): log.debug("Not a message from me! (%s)" % name_str)
-			if log.isEnabledFor(logging.DEBUG): log.debug("Found: %d" % (text.find(':') + 1))
-			person = text[:text.find(':')]
-			text = text[text.find(':') + 2:]
-			if log.isEnabledFor(logging.DEBUG): log.debug("is message for me: (%s) %s" % (text, text.lower().startswith("%s," % name_str[0].lower())))
-			if text.lower().startswith("%s," % name_str[0].lower()):
-				words = text[text.find(",") + 1:].split()
-				if log.isEnabledFor(logging.DEBUG): log.debug("Data; %s" % text)
-				if log.isEnabledFor(logging.DEBUG): log.debug("Words for commands: %s" % words)
-				if len(words) >= 1 and words[0].upper() in self.commands:
-					if log.isEnabledFor(logging.DEBUG): log.debug("Found command '%s', executing" % words[0].upper())
-					# data[1] is the params onwards to the command
-					packets = self.commands[words[0].upper()](event.data['connection'].session, person, words)
-					for packet in packets:
-						event.data['connection'].send(packet)
+		person = text[:text.find(':')]
+		text = text[text.find(':') + 2:]
+		words = text[text.find(",") + 1:].split()
+		if log.isEnabledFor(logging.DEBUG): log.debug("Words for commands: %s" % words)
+		if len(words) >= 1 and words[0].upper() in self.commands:
+			if log.isEnabledFor(logging.DEBUG): log.debug("Found command '%s', executing" % words[0].upper())
+			# data[1] is the params onwards to the command
+			packets = self.commands[words[0].upper()](event.data['connection'].session, person, words)
+			for packet in packets:
+				event.data['connection'].send(packet)
 
 	def get_event_types(self):
 		return self.event_types
 
+	def get_text_filters(self):
+		return self.text_filters
+
 	def subscribe_event(self, event):
 		pass
 
@@ -83,24 +86,19 @@ class BotRawTextEventHandler(BaseEventHandler):
 		return repr("RawTextHandler.types=%s" % self.event_types)
 	
 	def _do_who(self, session, person, params):
-		packets = []
-		actors_str = ""
-		for actor in session.actors.values():
-			actors_str += "%s, " % actor
-		actors_strs = split_str(actors_str, 157)
-		packets = []
-		for part in actors_strs:
-			packets.append(ELPacket(ELNetToServer.RAW_TEXT, part))
-		return packets
+		if not session.actors:
+			return [ELPacket(ELNetToServer.RAW_TEXT, str_to_el_str("I can't see anyone"))]
+		names = (actor.name for actor in session.actors.values())
+		return (ELPacket(ELNetToServer.RAW_TEXT, part) for part in pack_text(names))
 
 	def _do_hi(self, session, person, params):
-		return [ELPacket(ELNetToServer.RAW_TEXT, "Hi there, %s :D" % person)]
+		return [ELPacket(ELNetToServer.RAW_TEXT, str_to_el_str("Hi there, %s :D" % person))]
 
 	def _do_time(self, session, person, params):
-		return [ELPacket(ELNetToServer.RAW_TEXT, "%s: %s" % (person, time.asctime()))]
+		return [ELPacket(ELNetToServer.RAW_TEXT, str_to_el_str("%s: %s" % (person, time.asctime())))]
 
 	def _do_lick(self, session, person, params):
 		if len(params) > 1:
-			return [ELPacket(ELNetToServer.RAW_TEXT, ":licks %s" % params[1])]
+			return [ELPacket(ELNetToServer.RAW_TEXT, str_to_el_str(":licks %s" % params[1]))]
 		else:
-			return [ELPacket(ELNetToServer.RAW_TEXT, "...I'm not going to lick the air...")]
+			return [ELPacket(ELNetToServer.RAW_TEXT, str_to_el_str("...I'm not going to lick the air..."))]
@@ -19,5 +19,5 @@ from pyela.el.logic.managers import MultiConnectionManager
 from logic.eventhandlers import BotRawTextEventHandler
 
 class BotMultiConnectionManager(MultiConnectionManager):
-	def _map_events(self):
-		self._em.add_handler(BotRawTextEventHandler())
+	def _map_connection_events(self, con):
+		con.event_manager.add_handler(BotRawTextEventHandler(con.session.name))
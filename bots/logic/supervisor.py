@@ -0,0 +1,169 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Runs the bots in several worker processes, each with its own manager"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+log = logging.getLogger('pyela.bots.logic.supervisor')
+
+REPORT_SECS = 60
+
+RESTART_DELAY_SECS = 5
+
+def shard(items, count):
+	"""Split the list items into count lists of (nearly) the same length"""
+	return [items[i::count] for i in range(count)]
+
+def manager_stats(manager):
+	"""Returns a dict describing the health of the connections of the
+	MultiConnectionManager instance manager"""
+	login_times = list(manager.login_times.values())
+	workers = manager.workers.stats()
+	return {
+		'pid': os.getpid(),
+		'connections': len(manager.connections),
+		'connected': len([con for con in manager.connections if con.is_connected()]),
+		'pending_output': sum(con.pending_output() for con in manager.connections),
+		'login_time_max': max(login_times) if login_times else None,
+		'offloop_queued': workers['queued'] + workers['in_flight'],
+		'offloop_dropped': workers['dropped'],
+		'offloop_latency_max': workers['latency_max'],
+	}
+
+def report_stats(manager, index, stats_queue, report_secs=REPORT_SECS):
+	"""Put manager_stats(manager) on stats_queue as (index, stats) every
+	report_secs seconds, from the manager's loop. Used by the workers of a
+	Supervisor"""
+	try:
+		stats_queue.put_nowait((index, manager_stats(manager)))
+	except queue.Full:
+		pass
+	manager.call_later(report_secs, report_stats, manager, index, stats_queue, report_secs)
+
+class Supervisor(object):
+	"""Starts a worker process per shard of bot configuration files, and
+	restarts workers that crash.
+
+	Each worker runs target(index, shard, stats_queue), which is expected to
+	run a manager for the bots in shard and to report on it with
+	report_stats(). The supervisor logs the combined stats of all workers
+	every report_secs seconds.
+
+	Attributes:
+		target	- the function run by each worker process
+		shards	- a list with a list of bot configuration files per worker
+		workers	- a list with the multiprocessing.Process of each worker, or None
+				  while it's waiting to be restarted
+		stats	- a list with the last stats reported by each worker, or None
+		restarts - a list with the amount of times each worker has been restarted
+	"""
+
+	def __init__(self, target, shards, report_secs=REPORT_SECS, restart_delay=RESTART_DELAY_SECS):
+		self.target = target
+		self.shards = shards
+		self.report_secs = report_secs
+		self.restart_delay = restart_delay
+		self.stats_queue = multiprocessing.Queue()
+		self.workers = [None] * len(shards)
+		self.stats = [None] * len(shards)
+		self.restarts = [0] * len(shards)
+		self._restart_at = {} # worker index: time.time() to restart it at
+		self.running = False
+
+	def start_worker(self, index):
+		worker = multiprocessing.Process(target=self.target, name="worker-%d" % index, \
+			args=(index, self.shards[index], self.stats_queue))
+		worker.start()
+		log.info("Started worker %d (pid %d) with %d bots" % (index, worker.pid, len(self.shards[index])))
+		self.workers[index] = worker
+
+	def run(self):
+		"""Start all the workers and look after them until stop() is called,
+		or every worker has exited cleanly"""
+		self.running = True
+		for i in range(len(self.shards)):
+			self.start_worker(i)
+		next_report = time.time() + self.report_secs
+		while self.running and (any(self.workers) or self._restart_at):
+			try:
+				index, stats = self.stats_queue.get(timeout=1)
+				self.stats[index] = stats
+			except queue.Empty:
+				pass
+			self.__check_workers()
+			if time.time() >= next_report:
+				self.report()
+				next_report = time.time() + self.report_secs
+
+	def __check_workers(self):
+		now = time.time()
+		for i, worker in enumerate(self.workers):
+			if worker == None or worker.is_alive():
+				continue
+			worker.join()
+			self.workers[i] = None
+			self.stats[i] = None
+			if worker.exitcode == 0:
+				log.info("Worker %d (pid %d) has exited" % (i, worker.pid))
+				continue
+			log.error("Worker %d (pid %d) exited with code %s, restarting it in %d seconds" % \
+				(i, worker.pid, worker.exitcode, self.restart_delay))
+			self._restart_at[i] = now + self.restart_delay
+		for i, when in list(self._restart_at.items()):
+			if when <= now and self.running:
+				del self._restart_at[i]
+				self.restarts[i] += 1
+				self.start_worker(i)
+
+	def totals(self):
+		"""Returns a dict combining the last stats reported by each worker"""
+		stats = [s for s in self.stats if s != None]
+		login_times = [s['login_time_max'] for s in stats if s['login_time_max'] != None]
+		return {
+			'workers': len([w for w in self.workers if w != None]),
+			'reporting': len(stats),
+			'restarts': sum(self.restarts),
+			'connections': sum(s['connections'] for s in stats),
+			'connected': sum(s['connected'] for s in stats),
+			'pending_output': sum(s['pending_output'] for s in stats),
+			'login_time_max': max(login_times) if login_times else None,
+			'offloop_queued': sum(s['offloop_queued'] for s in stats),
+			'offloop_dropped': sum(s['offloop_dropped'] for s in stats),
+			'offloop_latency_max': max([s['offloop_latency_max'] for s in stats] or [0.0]),
+		}
+
+	def report(self):
+		totals = self.totals()
+		log.info("%(workers)d workers (%(reporting)d reporting, %(restarts)d restarts): " \
+			"%(connected)d of %(connections)d bots connected, %(pending_output)d bytes pending, " \
+			"slowest login %(login_time_max)s seconds, %(offloop_queued)d events for off-loop handlers " \
+			"(%(offloop_dropped)d dropped, waited up to %(offloop_latency_max).3f seconds)" % totals)
+
+	def stop(self):
+		"""Terminate all the workers and wait for them to exit"""
+		self.running = False
+		self._restart_at.clear()
+		for worker in self.workers:
+			if worker != None and worker.is_alive():
+				worker.terminate()
+		for worker in self.workers:
+			if worker != None:
+				worker.join(self.restart_delay)
@@ -25,14 +25,20 @@ sys.path.append(os.getcwd()+'/..') #TODO: This is a hack, fix
 
 from pyela.el.net.connections import get_elconnection_by_config, ELConnection
 from logic.managers import BotMultiConnectionManager
+from logic.supervisor import Supervisor, shard, report_stats, REPORT_SECS, RESTART_DELAY_SECS
+from pyela.el.logic.managers import MAX_CONCURRENT_CONNECTS
+from pyela.logic.workers import EventWorkers, MAX_IN_FLIGHT
 from pyela.el.logic.session import ELSession, get_elsession_by_config
 from pyela.el.net.packethandlers import ExtendedELPacketHandler
 
 connections = []
+supervisor = None
 
 # signal handlers
 def sig_cleanup(signal, frame):
 	log.info("Caught %s at frame %s, quitting" % (signal, frame))
+	if supervisor != None:
+		supervisor.stop()
 	log.debug("Closing connections: %s" % connections)
 	for con in connections:
 		con.disconnect()
@@ -43,27 +49,65 @@ def sig_hup(signal, frame):
 		con.disconnect()
 	main()
 
-def main():
+def set_signals():
 	signal.signal(signal.SIGHUP, sig_cleanup)
 	signal.signal(signal.SIGINT, sig_cleanup)
 	signal.signal(signal.SIGTERM, sig_cleanup)
 	signal.signal(signal.SIGQUIT, sig_cleanup)
 	signal.signal(signal.SIGPIPE, signal.SIG_IGN)
 
+def read_system_config():
 	sys_cfg = configparser.ConfigParser()# system-wide settings
 	sys_cfg.read('system.ini')
+	return sys_cfg
 
-	for file in os.listdir('./bots'):
-		if file.endswith(".ini"):
-			cfg = configparser.ConfigParser()
-			cfg.read("./bots/%s" % file)
-			con = get_elconnection_by_config(cfg)
-			con.packet_handler = ExtendedELPacketHandler(con)
-			connections.append(con)
-	
-	log.basicConfig(level=getattr(log, sys_cfg.get('logging', 'level').upper()), format="%(asctime)s %(name)s %(levelname)s: %(message)s", filename=sys_cfg.get('logging', 'filename'))
-	elcm = BotMultiConnectionManager(connections)
+def run_bots(files, sys_cfg, stats=None):
+	"""Run the bots configured in files with a BotMultiConnectionManager.
+	stats is None, or the (worker index, stats queue) to report to a supervisor"""
+	for file in files:
+		cfg = configparser.ConfigParser()
+		cfg.read(file)
+		con = get_elconnection_by_config(cfg)
+		con.packet_handler = ExtendedELPacketHandler(con, track_world=cfg.getboolean('actions', 'track_world', fallback=True))
+		connections.append(con)
+
+	elcm = BotMultiConnectionManager(connections, \
+		max_concurrent_connects=sys_cfg.getint('startup', 'max_concurrent_connects', fallback=MAX_CONCURRENT_CONNECTS), \
+		login_window=sys_cfg.getfloat('startup', 'login_window', fallback=0), \
+		workers=EventWorkers(max_in_flight=sys_cfg.getint('offloop', 'max_in_flight', fallback=MAX_IN_FLIGHT), \
+			threads=sys_cfg.getint('offloop', 'threads', fallback=None), \
+			processes=sys_cfg.getint('offloop', 'processes', fallback=None)))
+	if stats != None:
+		report_stats(elcm, stats[0], stats[1], sys_cfg.getint('supervisor', 'report_secs', fallback=REPORT_SECS))
 	elcm.process()
 
+def run_worker(index, files, stats_queue):
+	"""The entry point of a worker process started by the supervisor"""
+	global supervisor
+	supervisor = None # inherited from the supervisor when forked
+	set_signals()
+	run_bots(files, read_system_config(), (index, stats_queue))
+
+def main():
+	global supervisor
+	set_signals()
+	sys_cfg = read_system_config()
+
+	files = ["./bots/%s" % file for file in sorted(os.listdir('./bots')) if file.endswith(".ini")]
+	
+	log.basicConfig(level=getattr(log, sys_cfg.get('logging', 'level').upper()), format="%(asctime)s %(processName)s %(name)s %(levelname)s: %(message)s", filename=sys_cfg.get('logging', 'filename'))
+
+	workers = sys_cfg.getint('supervisor', 'workers', fallback=1)
+	if workers == 0:
+		workers = os.cpu_count() or 1
+	workers = min(workers, len(files))
+	if workers <= 1:
+		run_bots(files, sys_cfg)
+	else:
+		supervisor = Supervisor(run_worker, shard(files, workers), \
+			report_secs=sys_cfg.getint('supervisor', 'report_secs', fallback=REPORT_SECS), \
+			restart_delay=sys_cfg.getint('supervisor', 'restart_delay', fallback=RESTART_DELAY_SECS))
+		supervisor.run()
+
 if __name__ == '__main__':
 	main()
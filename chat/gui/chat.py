@@ -25,14 +25,14 @@ from pyela.el.net.packets import ELPacket
 from pyela.el.net.packethandlers import ExtendedELPacketHandler
 from pyela.el.common.exceptions import ConnectionException
 from pyela.el.logic.session import ELSession
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
-from pyela.el.util.strings import el_colour_char_table, str_to_el_str
+from pyela.el.logic.eventmanagers import ELEventManager
+from pyela.el.util.strings import el_colour_char_table, str_to_el_str, pack_text
 from gui.login import LoginGUI
 from gui.minimapwidget import Minimap
 from gui.networking_error import NetworkingErrorAlert
 from gui.locationlbl import LocationLbl
 
-from logic.eventhandler import ChatGUIEventHandler
+from logic.eventhandler import ChatGUIEventHandler, PMEventHandler
 
 def launch_gui():
     c = ChatGUI()
@@ -45,7 +45,11 @@ class ChatGUI(Gtk.Window):
 		self.last_pm_from = None
 		self.elc = None
 		self.g_watch_sources = []
-		ELSimpleEventManager().add_handler(ChatGUIEventHandler(self))
+		self.g_out_watch_source = None
+		# The widgets' handlers, for the events of self.elc
+		self.event_manager = ELEventManager()
+		self.event_manager.add_handler(ChatGUIEventHandler(self))
+		self.event_manager.add_handler(PMEventHandler(self))
 		self.__setup_gui()
 	
 	def __setup_gui(self):
@@ -147,7 +151,8 @@ class ChatGUI(Gtk.Window):
 				if self.elc == None:
 					# Initial login, setup the ELConnection
 					session = ELSession(l.user_txt.get_text(), l.passwd_txt.get_text())
-					self.elc = ELConnection(session, l.host_txt.get_text(), l.port_spin.get_value_as_int())
+					self.elc = ELConnection(session, l.host_txt.get_text(), l.port_spin.get_value_as_int(), \
+						event_manager=self.event_manager)
 					self.elc.packet_handler = ExtendedELPacketHandler(self.elc)
 				else:
 					self.elc.session = ELSession(l.user_txt.get_text(), l.passwd_txt.get_text())
@@ -169,7 +174,6 @@ class ChatGUI(Gtk.Window):
 			else:
 				# quit
 				sys.exit(0)
-		self.elc.socket.settimeout(15)
 		l.destroy()
 	
 	def _register_socket_io_watch(self):
@@ -185,6 +189,15 @@ class ChatGUI(Gtk.Window):
 		for s in self.g_watch_sources:
 			GObject.source_remove(s)
 		self.gobject_watch_sources = []
+		if self.g_out_watch_source != None:
+			GObject.source_remove(self.g_out_watch_source)
+			self.g_out_watch_source = None
+
+	def _watch_output(self):
+		"""Have gtk tell us when the socket is writable if the connection's
+		output buffer couldn't be sent in one go"""
+		if self.g_out_watch_source == None and self.elc.is_connected() and self.elc.want_write():
+			self.g_out_watch_source = GObject.io_add_watch(self.elc.fileno(), GObject.IO_OUT, self.__socket_writable)
 
 	def append_chat(self, msgs, tag = None):
 		for msg in msgs:
@@ -257,12 +270,19 @@ class ChatGUI(Gtk.Window):
 		msg = self.input_hbox.msg_txt.get_text()
 		if msg != '':
 			t = ELNetToServer.RAW_TEXT
+			prefix = b''
+			text = msg
 			if msg.startswith('/'):
 				t = ELNetToServer.SEND_PM
 				msg = self.input_hbox.msg_txt.get_text()[1:]
+				#Every part of a long PM goes to the same person
+				name, _, text = msg.partition(' ')
+				prefix = str_to_el_str(name + ' ')
 			
-			el_msg = str_to_el_str(str(msg))
-			self.elc.send(ELPacket(t, el_msg))
+			#A PM with no text still goes out, as just the name
+			for el_msg in list(pack_text([text], separator=' ', prefix=bytes(prefix))) or [bytes(prefix)]:
+				self.elc.send(ELPacket(t, el_msg))
+			self._watch_output()
 			self.input_hbox.msg_txt.set_text("")
 			#input text buffer handling
 			if self.msgb_idx > 0:
@@ -282,6 +302,7 @@ class ChatGUI(Gtk.Window):
 		This is called automatically every 15 seconds by the gobject API"""
 		if self.elc.is_connected():
 			self.elc.keep_alive()
+			self._watch_output()
 		return True
 
 	def __socket_event(self, fd, condition):
@@ -323,10 +344,22 @@ class ChatGUI(Gtk.Window):
 		except ConnectionException as e:
 			self.__elc_error(None, None, e.value)
 			return True
-		events = self.elc.process_packets(packets)
-		for e in events:
-			ELSimpleEventManager().raise_event(e)
+		self.event_manager.raise_events(self.elc.process_packets(packets))
+		self._watch_output()
 		return True
+
+	def __socket_writable(self, fd, condition):
+		"""Called by gtk when the socket can take more of the output buffer.
+		Returning False removes the watch once everything has been sent"""
+		try:
+			done = self.elc.flush()
+		except ConnectionException as e:
+			self.g_out_watch_source = None
+			self.__elc_error(None, None, e.value)
+			return False
+		if done:
+			self.g_out_watch_source = None
+		return not done
 	
 	def __set_active_channel(self, renderer, path):
 		"""User clicked an 'active' radio button in the channel list treeview.
@@ -420,7 +453,7 @@ class ToolVBox(Gtk.VBox):
 		self.pack_start(self.location_lbl, False, False, 0)
 
 		# set-up the minimap
-		self.minimap = Minimap()
+		self.minimap = Minimap(main_window.event_manager)
 		self.minimap.set_size_request(200, 200)
 		self.pack_start(self.minimap, False, False, 0)
 
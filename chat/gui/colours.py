@@ -15,26 +15,11 @@
 # You should have received a copy of the GNU General Public License
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 
-from pyela.el.util.strings import is_colour, special_char_to_char
+from pyela.el.util.strings import split_colours
 
 def parse_el_colours(text, tag_table):
 	"""
 	Parses the raw text from EL and translates color codes into tags 
 	appropriate for GTK colouring. Returns a list of tuples: (tag, text).
 	"""
-
-	tagged_text = []
-	current_tag = None
-	current_text = ""
-	for ch in text:
-		if is_colour(ch):
-			if len(current_text):
-				tagged_text.append((current_tag, current_text))
-			current_text = ""
-			current_tag = tag_table[ch-127]
-		else:
-			current_text += special_char_to_char(ch)
-	if len(current_text):
-		tagged_text.append((current_tag, current_text))
-
-	return tagged_text
+	return [(tag_table[colour] if colour != None else None, run) for colour, run in split_colours(text)]
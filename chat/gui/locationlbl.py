@@ -18,8 +18,8 @@
 from gi.repository import Gtk, Pango
 from pyela.el.net.elconstants import ELNetToServer, ELNetFromServer, ELConstants
 from pyela.el.net.packets import ELPacket
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
 from pyela.el.logic.events import ELEventType
+from pyela.el.logic.textfilters import TextFilter
 from pyela.logic.eventhandlers import BaseEventHandler
 
 class LocationLbl(Gtk.Label):
@@ -29,7 +29,7 @@ class LocationLbl(Gtk.Label):
 		self.set_line_wrap(True)
 		self.set_line_wrap_mode(Pango.WrapMode.WORD_CHAR)
 		self.set_max_width_chars(10)
-		ELSimpleEventManager().add_handler(LocationLblEventHandler(self))
+		main_window.event_manager.add_handler(LocationLblEventHandler(self))
 	def update(self):
 		self.main_window.elc.send(ELPacket(ELNetToServer.LOCATE_ME, None))
 
@@ -37,15 +37,18 @@ class LocationLblEventHandler(BaseEventHandler):
 	def __init__(self, label):
 		self.label = label
 		self.event_types = [ELEventType(ELNetFromServer.CHANGE_MAP), ELEventType(ELNetFromServer.RAW_TEXT)]
+		self.text_filters = [TextFilter(colour=ELConstants.C_GREEN1, prefix='You are in ')]
 
 	def notify(self, event):
 		if event.type.id == ELNetFromServer.RAW_TEXT:
-			if event.data['raw'][0] == ELConstants.C_GREEN1+127 and event.data['text'][:11] == 'You are in ':
-				location = event.data['text'][11:]
-				location = location.replace("  ", " ") #remove double spaces
-				self.label.set_text(location)
+			location = event.data['text'][11:]
+			location = location.replace("  ", " ") #remove double spaces
+			self.label.set_text(location)
 		elif event.type.id == ELNetFromServer.CHANGE_MAP:
 			self.label.update()
 
 	def get_event_types(self):
 		return self.event_types
+
+	def get_text_filters(self):
+		return self.text_filters
@@ -19,12 +19,11 @@ from gi.repository import Gtk, Gdk
 import math
 from pyela.logic.eventhandlers import BaseEventHandler
 from pyela.el.logic.events import ELEventType
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
 from pyela.el.net.elconstants import ELNetFromServer
 from logic.eventhandler import MinimapEventHandler
 
 class Minimap(Gtk.DrawingArea):
-	def __init__(self):
+	def __init__(self, event_manager):
 		Gtk.DrawingArea.__init__(self)
 		self.add_events(Gdk.EventMask.SCROLL_MASK)
 		self.connect("draw", self.draw)
@@ -37,7 +36,7 @@ class Minimap(Gtk.DrawingArea):
 		self.min_view_radius = 3 #Minimum number of tiles we can scroll to see
 		self.own_x = 0 #Your own X and Y coordinates
 		self.own_y = 0
-		ELSimpleEventManager().add_handler(MinimapEventHandler(self))
+		event_manager.add_handler(MinimapEventHandler(self))
 	
 	def mouse_scroll(self, widget, event):
 		"""Scroll GTK event handler, zooms the minimap"""
@@ -126,22 +125,26 @@ class Minimap(Gtk.DrawingArea):
 				context.fill()
 		return False
 	
-	def set_own_pos(self, x, y):
+	def set_own_pos(self, x, y, redraw=True):
 		self.own_x = x
 		self.own_y = y
-		self.redraw_canvas()
+		if redraw:
+			self.redraw_canvas()
 	
-	def add_dot(self, dot):
+	def add_dot(self, dot, redraw=True):
 		"""Adds a dot to the minimap"""
 		dot.minimap = self
 		self.dots.append(dot)
-		self.redraw_canvas()
+		if redraw:
+			self.redraw_canvas()
 
-	def del_dot(self, dot):
+	def del_dot(self, dot, redraw=True):
 		self.dots.remove(dot)
-		self.redraw_canvas()
+		if redraw:
+			self.redraw_canvas()
 	
-	def del_all_dots(self):
+	def del_all_dots(self, redraw=True):
 		del self.dots[:]
-		self.redraw_canvas()
+		if redraw:
+			self.redraw_canvas()
 
@@ -18,9 +18,9 @@
 from gi.repository import Gtk as gtk
 
 from pyela.el.net.elconstants import ELConstants, ELNetFromServer
-from pyela.el.logic.events import ELEventType
-from pyela.logic.eventhandlers import BaseEventHandler
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
+from pyela.el.logic.events import ELEventType, ACTORS_MOVED
+from pyela.logic.eventhandlers import BaseEventHandler, BatchEventHandler
+from pyela.el.logic.textfilters import TextFilter
 from pyela.el.util.strings import is_colour
 from pyela.logic.event import NetEventType, NET_CONNECTED, NET_DISCONNECTED
 from gui.colours import parse_el_colours
@@ -94,60 +94,77 @@ class ChatGUIEventHandler(BaseEventHandler):
 		if event.data['channel'] in (ELConstants.CHAT_MODPM, ELConstants.CHAT_POPUP):
 			if not (event.data['channel'] == ELConstants.CHAT_MODPM and text.startswith("[Mod PM to")):
 				self.gui.show_popup_message(text)
-		#Check for PM and update last_pm_from variable
-		if len(text) > 12 and text.startswith("[PM from "):
-			name_end = text[9:].find(':')
-			if name_end != -1:
-				self.gui.last_pm_from = text[9:9+name_end]
-		elif len(text) > 15 and text.startswith("[Mod PM from "):
-			name_end = text[13:].find(':')
-			if name_end != -1:
-				self.gui.last_pm_from = text[13:13+name_end]
+
+class PMEventHandler(BaseEventHandler):
+	"""Keeps track of who the last PM came from, for // name completion"""
+	def __init__(self, gui):
+		self.gui = gui
+		self.event_types = [ELEventType(ELNetFromServer.RAW_TEXT)]
+		self.text_filters = [TextFilter(prefix="[PM from "), TextFilter(prefix="[Mod PM from ")]
+
+	def notify(self, event):
+		text = event.data['text']
+		start = text.find(" from ") + 6
+		name_end = text.find(':', start)
+		if name_end > start:
+			self.gui.last_pm_from = text[start:name_end]
+
+	def get_event_types(self):
+		return self.event_types
+
+	def get_text_filters(self):
+		return self.text_filters
 
 from gui.minimapdot import MinimapDot
 
-class MinimapEventHandler(BaseEventHandler):
-	"""Event handler for the minimap widget"""
+class MinimapEventHandler(BatchEventHandler):
+	"""Event handler for the minimap widget. The minimap is redrawn once per
+	batch of events"""
 	def __init__(self, minimap):
 		self.minimap = minimap
 		self.event_types = [ELEventType(ELNetFromServer.ADD_NEW_ACTOR),
 				ELEventType(ELNetFromServer.REMOVE_ACTOR),
 				ELEventType(ELNetFromServer.KILL_ALL_ACTORS),
-				ELEventType(ELNetFromServer.ADD_ACTOR_COMMAND),
+				ELEventType(ACTORS_MOVED),
 				ELEventType(ELNetFromServer.YOU_ARE),
 				NetEventType(NET_CONNECTED)]
 	
-	def notify(self, event):
+	def notify_batch(self, events):
+		for event in events:
+			self.__update(event)
+		self.minimap.redraw_canvas()
+
+	def __update(self, event):
 		if isinstance(event.type, NetEventType):
 			if event.type.id == NET_CONNECTED:
 				# Reset the minimap when we get a new network connection
-				self.minimap.del_all_dots()
+				self.minimap.del_all_dots(False)
 		elif isinstance(event.type, ELEventType):
 			if event.type.id == ELNetFromServer.ADD_NEW_ACTOR:
 				actor = event.data
 				if actor.id == self.minimap.el_session.own_actor_id:
-					self.minimap.set_own_pos(actor.x_pos, actor.y_pos)
+					self.minimap.set_own_pos(actor.x_pos, actor.y_pos, False)
 				actor.dot = MinimapDot(actor.x_pos, actor.y_pos)
 				actor.dot.colour = actor.name_colour
 				actor.dot.name = actor.name
 				if actor.guild != None:
 					actor.dot.name += " %s" % actor.guild
-				self.minimap.add_dot(actor.dot)
+				self.minimap.add_dot(actor.dot, False)
 			elif event.type.id == ELNetFromServer.REMOVE_ACTOR:
 				actor = event.data['actor']
-				self.minimap.del_dot(actor.dot)
+				self.minimap.del_dot(actor.dot, False)
 			elif event.type.id == ELNetFromServer.KILL_ALL_ACTORS:
-				self.minimap.del_all_dots()
-			elif event.type.id == ELNetFromServer.ADD_ACTOR_COMMAND:
-				actor = event.data['actor']
-				actor.dot.x = actor.x_pos
-				actor.dot.y = actor.y_pos
-				if actor.id == self.minimap.el_session.own_actor_id:
-					self.minimap.set_own_pos(actor.x_pos, actor.y_pos)
-				self.minimap.redraw_canvas()
+				self.minimap.del_all_dots(False)
+			elif event.type.id == ACTORS_MOVED:
+				own_actor_id = self.minimap.el_session.own_actor_id
+				for actor in event.data['actors']:
+					actor.dot.x = actor.x_pos
+					actor.dot.y = actor.y_pos
+					if actor.id == own_actor_id:
+						self.minimap.set_own_pos(actor.x_pos, actor.y_pos, False)
 			elif event.type.id == ELNetFromServer.YOU_ARE:
 				actor = event.data
-				self.minimap.set_own_pos(actor.x_pos, actor.y_pos)
+				self.minimap.set_own_pos(actor.x_pos, actor.y_pos, False)
 	
 	def get_event_types(self):
 		return self.event_types
@@ -33,6 +33,20 @@ class ELActor(object):
 		self.kind_of_actor = -1
 		self.dead = False
 		self.fighting = False
+		self.scale = 1
+		# Horses and other mounts; 0 if the actor isn't riding anything
+		self.attachment_type = 0
+		# Appearance and equipment, only sent for enhanced actors (players)
+		self.skin = None
+		self.hair = None
+		self.shirt = None
+		self.pants = None
+		self.boots = None
+		self.cape = None
+		self.head = None
+		self.shield = None
+		self.weapon = None
+		self.helmet = None
 	
 	def __str__(self):
 		return repr("%d - %s (%s)" % (self.id, self.name, self.guild))
@@ -47,34 +61,11 @@ class ELActor(object):
 	def handle_command(self, cmd):
 		"""Applies the actor command cmd to the actor"""
 		#Movement tracking:
-		if cmd == ELConstants.MOVE_N or cmd == ELConstants.RUN_N:
-			self.y_pos += 1
-			self.z_rot = 0
-		elif cmd == ELConstants.MOVE_NE or cmd == ELConstants.RUN_NE:
-			self.x_pos += 1
-			self.y_pos += 1
-			self.z_rot = 45
-		elif cmd == ELConstants.MOVE_E or cmd == ELConstants.RUN_E:
-			self.x_pos += 1
-			self.z_rot = 90
-		elif cmd == ELConstants.MOVE_SE or cmd == ELConstants.RUN_SE:
-			self.x_pos += 1
-			self.y_pos -= 1
-			self.z_rot = 135
-		elif cmd == ELConstants.MOVE_S or cmd == ELConstants.RUN_S:
-			self.y_pos -= 1
-			self.z_rot = 180
-		elif cmd == ELConstants.MOVE_SW or cmd == ELConstants.RUN_SW:
-			self.x_pos -= 1
-			self.y_pos -= 1
-			self.z_rot = 225
-		elif cmd == ELConstants.MOVE_W or cmd == ELConstants.RUN_W:
-			self.x_pos -= 1
-			self.z_rot = 270
-		elif cmd == ELConstants.MOVE_NW or cmd == ELConstants.RUN_NW:
-			self.x_pos -= 1
-			self.y_pos += 1
-			self.z_rot = 315
+		move = MOVES[cmd]
+		if move != None:
+			self.x_pos += move[0]
+			self.y_pos += move[1]
+			self.z_rot = move[2]
 		#Rotation tracking:
 		elif cmd == ELConstants.TURN_LEFT:
 			self.z_rot += 45
@@ -91,3 +82,17 @@ class ELActor(object):
 		elif cmd == ELConstants.LEAVE_COMBAT:
 			self.fighting = False
 
+# The (x delta, y delta, z_rot) of each walking and running actor command,
+# indexed by command; None for the other commands
+MOVES = [None] * 256
+for cmds, move in (((ELConstants.MOVE_N, ELConstants.RUN_N), (0, 1, 0)),
+		((ELConstants.MOVE_NE, ELConstants.RUN_NE), (1, 1, 45)),
+		((ELConstants.MOVE_E, ELConstants.RUN_E), (1, 0, 90)),
+		((ELConstants.MOVE_SE, ELConstants.RUN_SE), (1, -1, 135)),
+		((ELConstants.MOVE_S, ELConstants.RUN_S), (0, -1, 180)),
+		((ELConstants.MOVE_SW, ELConstants.RUN_SW), (-1, -1, 225)),
+		((ELConstants.MOVE_W, ELConstants.RUN_W), (-1, 0, 270)),
+		((ELConstants.MOVE_NW, ELConstants.RUN_NW), (-1, 1, 315))):
+	for cmd in cmds:
+		MOVES[cmd] = move
+del cmds, move, cmd
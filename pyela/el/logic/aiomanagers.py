@@ -0,0 +1,155 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Connection management on an asyncio event loop"""
+
+import asyncio
+import logging
+
+from pyela.el.common.exceptions import ConnectionException, ManagerException
+from pyela.el.logic.eventmanagers import ELEventManager, ELSimpleEventManager
+from pyela.el.logic.managers import reconnect_delay, RECONNECT_DELAY_SECS, RECONNECT_MAX_DELAY_SECS
+from pyela.logic.workers import EventWorkers
+
+log = logging.getLogger('pyela.el.logic.aiomanagers')
+
+MAX_CONCURRENT_CONNECTS = 50
+
+class AsyncMultiConnectionManager(object):
+	"""Runs any number of pyela.el.net.aioconnections.AsyncELConnection
+	instances on one asyncio event loop.
+
+	Each connection gets its own task that connects, passes the packets from
+	every read to the connection's packet handler and raises the resulting
+	events, and reconnects when the connection is lost. Reconnects back off
+	like MultiConnectionManager's, exponentially and randomised.
+
+	Attributes:
+		_em			- the manager's own ELEventManager, shared by its connections; it
+					  becomes the parent of each connection's event manager and holds
+					  the workers. Its parent is the event_manager passed to init, by
+					  default ELSimpleEventManager(), whose handlers get the events of
+					  every manager
+		connections - the list of AsyncELConnection instances to manage
+		max_concurrent_connects - how many connections may be connecting at once
+		workers		- the pyela.logic.workers.EventWorkers running the work of the
+					  off-loop event handlers. By default, this is EventWorkers()
+	"""
+
+	def __init__(self, connections, max_concurrent_connects=MAX_CONCURRENT_CONNECTS, event_manager=None, \
+		workers=None):
+		if event_manager == None:
+			event_manager = ELSimpleEventManager()
+		# The workers stay with this manager, and die with it
+		self._em = ELEventManager(event_manager)
+		if workers == None:
+			workers = EventWorkers()
+		self.workers = workers
+		self._em.workers = workers
+		self._map_events()
+		if None in connections:
+			raise ManagerException('None cannot be a connection')
+		self.connections = connections
+		for con in connections:
+			self.__manage(con)
+		self.max_concurrent_connects = max_concurrent_connects
+		self._connect_slots = None
+		self._tasks = {}
+
+	def _map_events(self):
+		"""Add the handlers for the events of all the connections to self._em"""
+		pass
+
+	def _map_connection_events(self, con):
+		"""Add the handlers for the events of con alone to con.event_manager.
+		Called once for each connection, as the manager takes it on"""
+		pass
+
+	def __manage(self, con):
+		con.event_manager.parent = self._em
+		self._map_connection_events(con)
+
+	def add_connection(self, con):
+		"""Appends the given connection to the connection list. If the manager
+		is running, the connection is connected right away"""
+		self.__manage(con)
+		self.connections.append(con)
+		if self._connect_slots != None:
+			self.__start(con)
+
+	def process(self):
+		"""Run the manager on a new event loop until all connections have
+		given up. This is the asyncio counterpart of MultiConnectionManager.process"""
+		asyncio.run(self.run())
+
+	async def run(self):
+		"""Run all the connections on the current event loop until each has
+		given up reconnecting"""
+		if len(self.connections) == 0:
+			raise ManagerException('Cannot run connections. None provided.')
+		self._connect_slots = asyncio.Semaphore(self.max_concurrent_connects)
+		loop = asyncio.get_running_loop()
+		loop.add_reader(self.workers.fileno(), self.workers.process_done)
+		try:
+			for con in self.connections:
+				self.__start(con)
+			while self._tasks:
+				await asyncio.gather(*list(self._tasks.values()))
+		finally:
+			loop.remove_reader(self.workers.fileno())
+			self.workers.shutdown()
+
+	def __start(self, con):
+		task = asyncio.get_running_loop().create_task(self._run_connection(con))
+		self._tasks[con] = task
+		task.add_done_callback(lambda t: self._tasks.pop(con, None))
+
+	async def _connect(self, con):
+		"""Connect con, retrying until it succeeds or runs out of tries.
+		Returns True if the connection is up"""
+		while not con.is_connected():
+			if con.con_tries >= con.MAX_CON_TRIES:
+				log.error("Giving up on %s: %s" % (con, con.error))
+				return False
+			if con.con_tries > 0:
+				delay = self._reconnect_delay(con)
+				if log.isEnabledFor(logging.DEBUG): log.debug("Reconnecting %s in %.1f seconds" % (con, delay))
+				await asyncio.sleep(delay)
+			async with self._connect_slots:
+				await con.connect()
+		return True
+
+	def _reconnect_delay(self, con):
+		"""Returns the amount of seconds to wait before connecting con again.
+		Backs off like MultiConnectionManager, see
+		pyela.el.logic.managers.reconnect_delay()"""
+		return reconnect_delay(con)
+
+	async def _run_connection(self, con):
+		"""Process the input of con until it can't be reconnected"""
+		em = con.event_manager
+		while await self._connect(con):
+			try:
+				while True:
+					packets = await con.recv()
+					em.raise_events(con.process_packets(packets))
+					con.process_queue()
+					if con.is_congested():
+						await con.drain()
+			except ConnectionException as ce:
+				log.error("Connection %s lost: %s" % (con, ce))
+				if con.is_connected():
+					con.disconnect()
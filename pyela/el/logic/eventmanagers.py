@@ -16,52 +16,241 @@
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 """EL event management"""
 
+import itertools
 import logging
 
 from pyela.logic.eventmanager import SimpleEventManager
+from pyela.logic.eventhandlers import BatchEventHandler, INLINE
+from pyela.el.net.elconstants import ELNetFromServer
+from pyela.el.logic.events import ELEventType
+from pyela.el.logic.textfilters import text_filters_match
 
 log = logging.getLogger('pyela.el.logic.eventmanagers.ELSimpleEventManager')
 
-class ELSimpleEventManager(object):
-	"""A singleton implementation of a SimpleEventManager"""
-	__instance = None
+RAW_TEXT_TYPE = ELEventType(ELNetFromServer.RAW_TEXT)
+
+# Every change to an event manager takes the next number, so that a
+# generation is never repeated, not even across event managers
+_generations = itertools.count(1)
+
+class ELEventManager(SimpleEventManager):
+	"""Maps event types to the handlers to notify of them.
+
+	For each event type, the notify methods of its handlers are kept in a
+	tuple that's rebuilt when a handler is added, so raising an event is a
+	single dict lookup and a loop over that tuple.
+
+	raise_events() raises a list of events at once. Each BatchEventHandler
+	then gets the events it's subscribed to in one notify_batch() call, after
+	the other handlers have been notified of them one by one.
+
+	Each connection has an event manager of its own (ELConnection.event_manager),
+	so that its events only go to its own handlers. Events are then passed on
+	to the parent event manager, if there is one, which is shared by a fleet
+	of connections; by default that's ELSimpleEventManager().
+
+	Handlers subscribed to RAW_TEXT can narrow it down with text filters (see
+	pyela.el.logic.textfilters). The filters are indexed by channel, and
+	wants_text() checks them against the raw message before it becomes an
+	event. A filtered handler is only notified of the messages it matches.
+
+	Handlers that run off the loop (pyela.logic.eventhandlers.OffLoopEventHandler)
+	are handed to the workers of the event manager the event was raised on,
+	or else of the nearest event manager on the way up from it that has
+	workers. That way the handlers of
+	the process-wide ELSimpleEventManager use the workers of the manager
+	whose connection raised the event. They're notified inline if no event
+	manager on the way has workers.
+
+	Attributes:
+		parent		- None, or the ELEventManager that raised events are passed on to
+		workers		- None, or the pyela.logic.workers.EventWorkers that the work of
+					  off-loop handlers is submitted to. Set by connection managers
+		generation	- changes whenever the handlers of this event manager or of
+					  its parent change, or the parent is replaced. It's the
+					  latest of the process-wide numbers taken by these changes
+	"""
+
+	def __init__(self, parent=None):
+		self._handlers = {}
+		self._dispatch = {} # event type: tuple of handler.notify
+		self._batch_dispatch = {} # event type: (tuple of notify, tuple of (notify_batch, accepts))
+		self._offloop_dispatch = {} # event type: tuple of (off-loop handler, accepts)
+		self._accepts = {} # (handler, event type): None, or a function of an event telling if handler wants it
+		self._text_all = False # True if a RAW_TEXT handler has no text filters
+		self._text_by_channel = {} # channel: list of TextFilter
+		self._text_any_channel = [] # TextFilters for any channel
+		self._generation = 0
+		self._parent = parent
+		self.workers = None
+
+	@property
+	def parent(self):
+		return self._parent
+
+	@parent.setter
+	def parent(self, parent):
+		self._parent = parent
+		self._generation = next(_generations)
+
+	@property
+	def generation(self):
+		if self._parent == None:
+			return self._generation
+		return max(self._generation, self._parent.generation)
 
-	class __impl(SimpleEventManager):
-		def __init__(self):
-			self._handlers = {}
+	def raise_event(self, event, workers=None):
+		"""Notify all handlers for the given event, then pass it on to
+		the parent. workers is None, or the workers of the event manager the
+		event was raised on, when it's passed on from a child"""
+		if workers == None:
+			workers = self.workers
+		notifiers = self._dispatch.get(event.type)
+		if notifiers != None:
+			if log.isEnabledFor(logging.DEBUG): log.debug("Got event: %s" % event)
+			for notify in notifiers:
+				notify(event)
+		if self._offloop_dispatch:
+			self.__submit(self._offloop_dispatch.get(event.type, ()), event, workers)
+		if self._parent != None:
+			self._parent.raise_event(event, workers)
+		elif notifiers == None and log.isEnabledFor(logging.DEBUG):
+			log.debug("Event %s not handled, no mapping available" % event)
 
-		def raise_event(self, event):
-			"""Notify all handlers for the given event"""
-			log.debug("Got event: %s" % event)
-			if event.type in self._handlers:
-				for handler in self._handlers[event.type]:
-					handler.notify(event)
+	def raise_events(self, events, workers=None):
+		"""Notify all handlers for the given list of events, then pass the
+		list on to the parent. BatchEventHandler instances get the events
+		they're subscribed to in one notify_batch() call. workers is as for
+		raise_event()"""
+		if workers == None:
+			workers = self.workers
+		batches = {} # notify_batch: list of events
+		dispatch = self._batch_dispatch
+		offloop = self._offloop_dispatch
+		for event in events:
+			if offloop:
+				self.__submit(offloop.get(event.type, ()), event, workers)
+			notifiers = dispatch.get(event.type)
+			if notifiers == None:
+				continue
+			if log.isEnabledFor(logging.DEBUG): log.debug("Got event: %s" % event)
+			for notify in notifiers[0]:
+				notify(event)
+			for notify_batch, accepts in notifiers[1]:
+				if accepts != None and not accepts(event):
+					continue
+				if notify_batch in batches:
+					batches[notify_batch].append(event)
+				else:
+					batches[notify_batch] = [event]
+		for notify_batch, batch in batches.items():
+			notify_batch(batch)
+		if self._parent != None:
+			self._parent.raise_events(events, workers)
+
+	def add_handler(self, event_handler):
+		"""Manage the given handler. When an event raised
+		whose .type value is in event_handler.get_event_types(),
+		notify() will be called on this handler
+		"""
+		if log.isEnabledFor(logging.DEBUG): log.debug("received handler: %s"\
+			% event_handler)
+
+		for t in event_handler.get_event_types():
+			if t in self._handlers:
+				self._handlers[t].append(event_handler)
+			else: 
+				self._handlers[t] = [event_handler]
+			self._accepts[(event_handler, t)] = self.__add_filters(event_handler, t)
+			handlers = [h for h in self._handlers[t] if not self.__is_offloop(h)]
+			self._dispatch[t] = tuple(self.__notifier(h, t) for h in handlers)
+			self._batch_dispatch[t] = (
+				tuple(self.__notifier(h, t) for h in handlers if not isinstance(h, BatchEventHandler)),
+				tuple((h.notify_batch, self._accepts[(h, t)]) for h in handlers if isinstance(h, BatchEventHandler)))
+			offloop = tuple((h, self._accepts[(h, t)]) for h in self._handlers[t] if self.__is_offloop(h))
+			if offloop:
+				self._offloop_dispatch[t] = offloop
+		self._generation = next(_generations)
+
+	def __add_filters(self, handler, event_type):
+		"""Index the text filters of handler, if it has any for event_type.
+		Returns None, or a function telling if handler wants an event"""
+		if event_type != RAW_TEXT_TYPE:
+			return None
+		filters = None
+		if hasattr(handler, 'get_text_filters'):
+			filters = handler.get_text_filters()
+		if not filters:
+			self._text_all = True
+			return None
+		filters = tuple(filters)
+		for f in filters:
+			if f.channels == None:
+				self._text_any_channel.append(f)
 			else:
-				log.debug("Event %s not handled, no mapping available" % event)
-
-		def add_handler(self, event_handler):
-			"""Manage the given handler. When an event raised
-			whose .type value is in event_handler.get_event_types(),
-			notify() will be called on this handler
-			"""
-			if log.isEnabledFor(logging.DEBUG): log.debug("received handler: %s"\
-				% event_handler)
-
-			for t in event_handler.get_event_types():
-				if t in self._handlers:
-					self._handlers[t].append(event_handler)
-				else: 
-					self._handlers[t] = [event_handler]
+				for channel in f.channels:
+					self._text_by_channel.setdefault(channel, []).append(f)
+		return lambda event: text_filters_match(filters, event.data['channel'], event.data['raw'])
 
-	def __init__(self):
-		if ELSimpleEventManager.__instance is None:
-			ELSimpleEventManager.__instance = ELSimpleEventManager.__impl()
-		self.__dict__['_ELSimpleEventManager__instance'] = \
-			ELSimpleEventManager.__instance
+	def __is_offloop(self, handler):
+		return getattr(handler, 'execution', INLINE) != INLINE
+
+	def __notifier(self, handler, event_type):
+		accepts = self._accepts[(handler, event_type)]
+		notify = handler.notify
+		if accepts == None:
+			return notify
+		def notify_accepted(event):
+			if accepts(event):
+				notify(event)
+		return notify_accepted
 
-	def __getattr__(self, attr):
-		return getattr(self.__instance, attr)
+	def __submit(self, offloop, event, workers):
+		"""Hand event to the off-loop handlers in offloop that accept it"""
+		for handler, accepts in offloop:
+			if accepts != None and not accepts(event):
+				continue
+			em = self._parent
+			while workers == None and em != None:
+				# Neither the event manager the event was raised on nor this one
+				# has workers, use the nearest parent's
+				workers = em.workers
+				em = em._parent
+			if workers != None:
+				workers.submit(handler, event)
+			else:
+				handler.notify(event)
 
-	def __setattr__(self, attr, value):
-		return setattr(self.__instance, attr, value)
+	def is_handled(self, event_type):
+		"""Returns True if a handler has been added for event_type, to this
+		event manager or its parent"""
+		return event_type in self._handlers or (self._parent != None and self._parent.is_handled(event_type))
 
+	def wants_text(self, channel, raw):
+		"""Returns True if a RAW_TEXT handler of this event manager or its
+		parent wants the message with the raw text raw in channel channel"""
+		if self._text_all:
+			return True
+		filters = self._text_by_channel.get(channel)
+		if filters != None and text_filters_match(filters, channel, raw):
+			return True
+		if self._text_any_channel and text_filters_match(self._text_any_channel, channel, raw):
+			return True
+		return self._parent != None and self._parent.wants_text(channel, raw)
+
+class ELSimpleEventManager(ELEventManager):
+	"""The process-wide ELEventManager: ELSimpleEventManager() always
+	returns the same instance. It's the default parent of the connections'
+	event managers, so its handlers get the events of every connection"""
+	__instance = None
+
+	def __new__(cls):
+		if ELSimpleEventManager.__instance is None:
+			instance = ELEventManager.__new__(cls)
+			ELEventManager.__init__(instance)
+			ELSimpleEventManager.__instance = instance
+		return ELSimpleEventManager.__instance
+
+	def __init__(self):
+		# Already initialised by __new__
+		pass
@@ -16,29 +16,49 @@
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 """EL related events"""
 
-from pyela.logic.event import BaseEventType, BaseEvent, EventException
+from pyela.logic.event import BaseEventType, BaseEvent, EventData, EventException
+
+# Events that don't stand for a single message from the server. Their ids
+# start above the message types, so they can't clash with them
+# ACTORS_MOVED is raised once per ADD_ACTOR_COMMAND message that moved or
+# turned actors; event.data['actors'] is the list of those actors
+ACTORS_MOVED = 256
 
 class ELEventType(BaseEventType):
-	def __init__(self, id):
-		self.id = id
+	"""The type of an EL event; id is the message type, or one of the ids
+	above. Instances are interned: ELEventType(id) always returns the same
+	instance for a given id, so creating one per event costs a dict lookup"""
+	_types = {}
+
+	def __new__(cls, id):
+		try:
+			return cls._types[id]
+		except KeyError:
+			self = object.__new__(cls)
+			self.id = id
+			return cls._types.setdefault(id, self)
+
+	def __reduce__(self):
+		return (self.__class__, (self.id,))
 
 	def __str__(self):
 		return repr("ELEventType.id=%i" % self.id)
 	
 	def __eq__(self, other):
-		return self.id == other.id
+		return self is other or (other.__class__ is self.__class__ and self.id == other.id)
 	
 	def __cmp__(self, other):
 		return self.id - other.id
 	
 	def __hash__(self):
-		s = self.__str__()
-		return hash(s)
+		return self.id
 
 class ELEvent(BaseEvent):
+	__slots__ = ('type', 'data')
 
-	def __init__(self, type):
+	def __init__(self, type, data=None):
 		self.type = type
+		self.data = data
 
 	def get_type(self):
 		return self.type
@@ -46,6 +66,96 @@ class ELEvent(BaseEvent):
 	def __str__(self):
 		return repr("ELEvent.type=%s" % self.type)
 
+# The payloads (event.data) of the EL events, see EventData. ADD_NEW_ACTOR and
+# YOU_ARE events have the ELActor itself as their payload
+
+class ConnectionData(EventData):
+	"""The payload of events that only carry their connection: KILL_ALL_ACTORS,
+	YOU_DONT_EXIST and LOG_IN_OK"""
+	__slots__ = ('connection',)
+
+	def __init__(self, connection):
+		self.connection = connection
+
+class RawTextData(EventData):
+	"""RAW_TEXT: the channel, the text with the colour codes stripped and
+	special characters translated, and the raw text"""
+	__slots__ = ('connection', 'channel', 'text', 'raw')
+
+	def __init__(self, connection, channel, text, raw):
+		self.connection = connection
+		self.channel = channel
+		self.text = text
+		self.raw = raw
+
+class RemoveActorData(EventData):
+	"""REMOVE_ACTOR: the id and the ELActor instance of the actor removed"""
+	__slots__ = ('connection', 'id', 'actor')
+
+	def __init__(self, connection, id, actor):
+		self.connection = connection
+		self.id = id
+		self.actor = actor
+
+class ActorCommandData(EventData):
+	"""ADD_ACTOR_COMMAND: the ELActor and the command applied to it"""
+	__slots__ = ('connection', 'actor', 'command')
+
+	def __init__(self, connection, actor, command):
+		self.connection = connection
+		self.actor = actor
+		self.command = command
+
+class ActorsMovedData(EventData):
+	"""ACTORS_MOVED: the list of the actors that moved or turned"""
+	__slots__ = ('connection', 'actors')
+
+	def __init__(self, connection, actors):
+		self.connection = connection
+		self.actors = actors
+
+class ActiveChannelsData(EventData):
+	"""GET_ACTIVE_CHANNELS: the session's new list of Channel instances"""
+	__slots__ = ('connection', 'channels')
+
+	def __init__(self, connection, channels):
+		self.connection = connection
+		self.channels = channels
+
+class BuddyData(EventData):
+	"""BUDDY_EVENT: event is 'online' or 'offline', name the buddy's name"""
+	__slots__ = ('connection', 'event', 'name')
+
+	def __init__(self, connection, event, name):
+		self.connection = connection
+		self.event = event
+		self.name = name
+
+class LoginFailedData(EventData):
+	"""LOG_IN_NOT_OK: the reason given by the server, stripped and raw"""
+	__slots__ = ('connection', 'text', 'raw')
+
+	def __init__(self, connection, text, raw):
+		self.connection = connection
+		self.text = text
+		self.raw = raw
+
+class NewMinuteData(EventData):
+	"""NEW_MINUTE: the game time, in minutes"""
+	__slots__ = ('connection', 'time')
+
+	def __init__(self, connection, time):
+		self.connection = connection
+		self.time = time
+
+class ChangeMapData(EventData):
+	"""CHANGE_MAP: the raw name of the new map"""
+	__slots__ = ('connection', 'map')
+
+	def __init__(self, connection, map):
+		self.connection = connection
+		self.map = map
+
 #TODO: This class is not used, remove it?
 class ELNetEvent(ELEvent):
 	"""A network related event. The constructor will enforce the given type is 
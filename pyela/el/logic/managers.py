@@ -15,7 +15,10 @@
 # You should have received a copy of the GNU General Public License
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 import time
-import select
+import random
+import selectors
+import socket
+import collections
 import struct
 import sys
 import datetime
@@ -27,7 +30,12 @@ from pyela.el.net.elconstants import ELNetFromServer, ELNetToServer
 from pyela.el.net.packets import ELPacket
 from pyela.el.logic.session import ELSession
 from pyela.el.common.exceptions import ConnectionException, ManagerException
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
+from pyela.el.logic.eventmanagers import ELEventManager, ELSimpleEventManager
+from pyela.el.logic.events import ELEventType
+from pyela.logic.eventhandlers import BaseEventHandler
+from pyela.logic.event import NetEventType, NET_CONNECTED, NET_DISCONNECTED
+from pyela.logic.scheduler import Scheduler
+from pyela.logic.workers import EventWorkers
 
 log = logging.getLogger('pyela.el.logic.managers')
 
@@ -39,6 +47,25 @@ HEART_BEAT_MAX_SECS = 18
 
 POLL_TIMEOUT_MILLIS = HEART_BEAT_MAX_SECS * 1000
 
+RECONNECT_DELAY_SECS = 5
+
+RECONNECT_MAX_DELAY_SECS = 300
+
+CONNECT_TIMEOUT_SECS = 30
+
+# How long the address of a host is used for before it's looked up again
+ADDRESS_TTL_SECS = 300
+
+MAX_CONCURRENT_CONNECTS = 50
+
+def reconnect_delay(con):
+	"""Returns the amount of seconds to wait before connecting con again.
+	The delay doubles with every failed try, up to RECONNECT_MAX_DELAY_SECS,
+	and is randomised between half and all of that so that connections
+	lost at the same time don't all come back at the same time"""
+	delay = min(RECONNECT_MAX_DELAY_SECS, RECONNECT_DELAY_SECS * 2 ** max(0, con.con_tries - 1))
+	return delay / 2.0 + random.uniform(0, delay / 2.0)
+
 class ConnectionManager(object):
 	"""A manager for a Connection object."""
 
@@ -57,37 +84,122 @@ class MultiConnectionManager(ConnectionManager):
 	All messages received (instances of pyela.el.net.packets.Packet) are passed to 
 	the particular connection's packet handler (pyela.el.net.packethandlers)
 
+	Connected sockets stay registered with the manager's selector (epoll on
+	Linux) and are only registered or unregistered when their connection
+	connects or disconnects, or changes its interest in writing.
+
+	Heartbeats, reconnects and any other timers registered with call_later()
+	and call_at() run from the same loop, which never waits longer than
+	until the next timer is due.
+
+	Connections are connected without blocking the loop, at most
+	max_concurrent_connects at a time. A lost connection is retried after
+	an exponentially growing, randomised delay, until it has used up its
+	MAX_CON_TRIES.
+
+	The hostname of each server is looked up once for all the connections
+	to it, and again once ADDRESS_TTL_SECS have passed or a connection to it
+	has been lost. A failed lookup counts as a failed connect. On startup,
+	the first connects are spread evenly over login_window seconds so that
+	the logins don't all hit the server at once. How long each connection took to get LOG_IN_OK is logged and kept
+	in login_times.
+
+	The work of off-loop event handlers (see
+	pyela.logic.eventhandlers.OffLoopEventHandler) is handed to the manager's
+	workers; their results are applied from the loop as they come in.
+
 	Attributes:
-		_p 			- instance of select.poll(); leave it alone
-		_em			- instance of ELSimpleEventManager; used to map events
+		_selector	- instance of selectors.DefaultSelector(); leave it alone
+		scheduler	- the pyela.logic.scheduler.Scheduler running the manager's timers.
+					  It's also assigned to the .scheduler attribute of each connection
+		_em			- the manager's own ELEventManager, shared by its connections; it
+					  becomes the parent of each connection's event manager and holds
+					  the workers. Its parent is the event_manager passed to init, by
+					  default ELSimpleEventManager(), whose handlers get the events of
+					  every manager
 		connections - a list of pyela.net.connections.BaseConnection or derivative
 					  to manage
 		config		- the instance of ConfigParser, passed to init
 		session		- the ELSession instance, representing the data
 					  for this connection
+		max_concurrent_connects - how many connections may be connecting at once
+		login_window - the amount of seconds the connects on startup are spread over
+		login_times	- dict of connection: the amount of seconds between the start of
+					  its last successful connect and LOG_IN_OK
+		workers		- the pyela.logic.workers.EventWorkers running the work of the
+					  off-loop event handlers. By default, this is EventWorkers()
 	"""
 
-	def __init__(self, connections):
+	def __init__(self, connections, max_concurrent_connects=MAX_CONCURRENT_CONNECTS, login_window=0, \
+		event_manager=None, workers=None):
 		"""Creates an instane with the given config, and the given connections"""
-		self._em = ELSimpleEventManager()
+		if event_manager == None:
+			event_manager = ELSimpleEventManager()
+		# The workers stay with this manager, and die with it
+		self._em = ELEventManager(event_manager)
+		if workers == None:
+			workers = EventWorkers()
+		self.workers = workers
+		self._em.workers = workers
 		self._map_events()
 		if None not in connections:
 			self.connections = connections
 		else:
 			raise ManagerException('None cannot be a connection')
+		self._selector = selectors.DefaultSelector()
+		self._selector.register(self.workers.fileno(), selectors.EVENT_READ, self.workers)
+		self._registered = {} # connection: (fileno, registered selector events)
+		self._fds = {} # fileno: connection
+		self._pending_output = set() # connections that have queued output this iteration
+		self.scheduler = Scheduler()
+		self._heart_beats = {} # connection: keep-alive Timer
+		self.max_concurrent_connects = max_concurrent_connects
+		self._connect_queue = collections.deque() # connections waiting for a connect slot
+		self._connecting = {} # connection: connect timeout Timer
+		self.login_window = login_window
+		self.login_times = {}
+		self._connect_started = {} # connection: time.time() its current connect started
+		self._startup = set() # connections started by __connect_all that haven't logged in yet
+		self._startup_time = None
+		self._addresses = {} # (host, port): (address, time.time() it was looked up)
+		for con in self.connections:
+			self.__manage(con)
+		# On the manager's own event manager, so that it goes away with the
+		# manager and doesn't see the events of other managers' connections
+		self._em.add_handler(ManagedConnectionEventHandler(self))
 
 	def _map_events(self):
+		"""Add the handlers for the events of all the connections to self._em"""
+		pass
+
+	def _map_connection_events(self, con):
+		"""Add the handlers for the events of con alone to con.event_manager.
+		Called once for each connection, as the manager takes it on"""
 		pass
 
 	def __set_opt(self, val):
 		log.info("Something's trying to set my output queue. Blocked!")
 		pass
 
+	def __manage(self, con):
+		# Output is flushed once per loop iteration
+		con.autoflush = False
+		con.on_output_pending = self._output_pending
+		con.scheduler = self.scheduler
+		con.event_manager.parent = self._em
+		self._map_connection_events(con)
+		if con.is_connected():
+			self._update_registration(con)
+			self._schedule_heart_beat(con)
+
+	def _output_pending(self, con):
+		self._pending_output.add(con)
+
 	def add_connection(self, con):
 		"""Appends the given connection to the connection list, and calls connect"""
-		con.connect()
+		self.__manage(con)
 		self.connections.append(con)
-		self.__register_connections()
+		self.__queue_connect(con)
 
 	def process(self):
 		"""Overrides super's process impl to govern all the connections """
@@ -96,91 +208,314 @@ class MultiConnectionManager(ConnectionManager):
 		if len(self.connections) == 0:
 			raise ManagerException('Cannot register connections. None provided.')
 
+		try:
+			self.__loop()
+		finally:
+			self.workers.shutdown()
+
+	def __loop(self):
 		while len(self.connections) > 0:
-			self._p = select.poll()
-			self.__register_connections() #Rebuild the poll object for each loop. It's the best way to get rid of old file descriptors.
-			poll_time = self.__calc_poll_time()
-			if log.isEnabledFor(logging.DEBUG): log.debug("Setting poll with timeout %d" % poll_time)
-			p_opt = self._p.poll(poll_time)
+			# Wait until the next timer is due at the latest
+			poll_time = self.scheduler.next_timeout()
+			if poll_time == None:
+				poll_time = POLL_TIMEOUT_MILLIS / 1000.0
+			if log.isEnabledFor(logging.DEBUG): log.debug("Setting poll with timeout %f" % poll_time)
+			p_opt = self._selector.select(poll_time)
 			if log.isEnabledFor(logging.DEBUG): log.debug("Poll ended: %s" % p_opt)
 
 			# p_opt may be empty, which means the timeout occured
-			if len(p_opt) == 0:
-				# no input from our connections
-				if log.isEnabledFor(logging.DEBUG): log.debug("Poll returned nothing. Processing connection opt queue")
-				# check if we need to send a keep-alive
-				for con in self.connections:
-					if con.last_send+HEART_BEAT_MAX_SECS <= time.time()+1:
-						# send a keep-alive packet if we need to, with a
-						# 1 second margin to avoid having to poll() for just a few ms
-						con.keep_alive()
-				# process output queue??
-			else:
+			if len(p_opt) != 0:
 				# data received in a connection
-				# get the connection poll is referring to
-
-				p_event = None
-				for p in p_opt:
-					p_fileno = p[0] # the file descriptor and poll event
-					p_event = p[1]
-					con = self.get_connection_by_id(p_fileno)
-					if con != None and (p_event & select.POLLIN or p_event & select.POLLPRI):
-						# found the con poll's referring to
+				for key, p_event in p_opt:
+					con = key.data # the connection registered for the file descriptor
+					if con is self.workers:
+						# off-loop work is done, apply its results
+						self.workers.process_done()
+						continue
+					if con in self._connecting:
+						# the outcome of a non-blocking connect is known
+						self.__finish_connect(con)
+						continue
+					if p_event & selectors.EVENT_WRITE:
+						# the socket can take more of the connection's output buffer
+						self._pending_output.add(con)
+					if p_event & selectors.EVENT_READ:
 						if log.isEnabledFor(logging.DEBUG): log.debug("Got data for connection '%s'" % con)
 						try:
-							packets = con.recv(2048)
+							packets = con.recv()
+							#log.debug("Bytes (%d): %s" % (len(bytes), bytes))
+							if len(packets) != 0:
+								if log.isEnabledFor(logging.DEBUG): log.debug("Received %d packets" % len(packets))
+								con.event_manager.raise_events(con.process_packets(packets))
+							elif log.isEnabledFor(logging.DEBUG):
+								log.debug("No complete packets received yet (con=%s)" % con)
 						except ConnectionException:
 							self.__reconnect(con)
-						#log.debug("Bytes (%d): %s" % (len(bytes), bytes))
-						if len(packets) != 0:
-							if log.isEnabledFor(logging.DEBUG): log.debug("Received %d packets" % len(packets))
-							for e in con.process_packets(packets):
-								ELSimpleEventManager().raise_event(e)
-						else:
-							log.error("Empty packets returned. Connection down? Reconnecting... (con=%s)" % con)
-					con.process_queue()
-			del self._p
-			self._p = None
+							continue
+					if con.is_connected():
+						con.process_queue()
+			# heartbeats, reconnects and any other timers
+			self.scheduler.run_due()
+			self.__flush_pending()
+
+	def __flush_pending(self):
+		"""Write everything queued up during this iteration, a connection at a time"""
+		while self._pending_output:
+			con = self._pending_output.pop()
+			if not con.is_connected():
+				continue
+			try:
+				con.flush()
+			except ConnectionException:
+				self.__reconnect(con)
+				continue
+			self._update_registration(con)
+
+	def call_at(self, when, callback, *args):
+		"""Run callback(*args) from the manager's loop once time.time() reaches when.
+		Returns a pyela.logic.scheduler.Timer"""
+		return self.scheduler.call_at(when, callback, *args)
+
+	def call_later(self, delay, callback, *args):
+		"""Run callback(*args) from the manager's loop in delay seconds.
+		Returns a pyela.logic.scheduler.Timer"""
+		return self.scheduler.call_later(delay, callback, *args)
 
 	def __reconnect(self, con):
-		# connection retries sleep
-		try:
-			if log.isEnabledFor(logging.DEBUG): log.debug("Sleeping 5 seconds before reconnect")
-			time.sleep(5) #TODO: This will block everything for 5 seconds. Not good.
-			return con.reconnect()
-		except ConnectionException as ce:
-			log.error("Exception when reconnecting: %s" % ce)
+		"""Disconnect con and have it connect again after a backoff delay"""
+		self.__connect_done(con)
+		if con.is_connected() or con.is_connecting():
+			con.disconnect()
+		if hasattr(con, 'address'):
+			self.__expire_address(con)
+		if con.con_tries >= con.MAX_CON_TRIES:
+			log.error("Giving up on %s after %d tries: %s" % (con, con.con_tries, con.error))
+			self.__startup_done(con)
+			return
+		delay = self._reconnect_delay(con)
+		if log.isEnabledFor(logging.DEBUG): log.debug("Reconnecting %s in %.1f seconds" % (con, delay))
+		self.scheduler.call_later(delay, self.__queue_connect, con)
 
-	def get_connection_by_id(self, id):
-		for con in self.connections:
-			if con.is_connected() and con.fileno() == id:
-				return con
-		return None
-
-	def __calc_poll_time(self):
-		"""Calculate the poll time from all the connections in milliseconds, 
-		based on their MAX_LAST_SEND_SECS and their last_send value
-		"""
-		poll_time = HEART_BEAT_MAX_SECS
-		for con in self.connections:
-			if con.is_connected():
-				this_pt = int(con.MAX_LAST_SEND_SECS - int(time.time() - con.last_send))
-				if this_pt < poll_time and this_pt > 0 and poll_time > 0:
-					poll_time = this_pt
-		if log.isEnabledFor(logging.DEBUG): log.debug("Calc'd poll time for %s is %d" % (con, int(poll_time)))
+	def _reconnect_delay(self, con):
+		"""Returns the amount of seconds to wait before connecting con again,
+		see reconnect_delay()"""
+		return reconnect_delay(con)
 
-		return int(poll_time * 1000)
+	def __queue_connect(self, con):
+		"""Connect con as soon as there's a free connect slot"""
+		if con not in self._connect_queue:
+			self._connect_queue.append(con)
+		self.__start_connects()
+
+	def __start_connects(self):
+		"""Start non-blocking connects for queued connections, as long as
+		fewer than max_concurrent_connects are in progress"""
+		while self._connect_queue and len(self._connecting) < self.max_concurrent_connects:
+			con = self._connect_queue.popleft()
+			if con.is_connected() or con.is_connecting():
+				continue
+			if hasattr(con, 'address') and not self._resolve(con):
+				# Counts as a failed try, and backs off like one
+				con.con_tries += 1
+				self.__reconnect(con)
+				continue
+			self._connect_started[con] = time.time()
+			try:
+				if not con.connect(blocking=False):
+					self.__reconnect(con)
+					continue
+			except ConnectionException as ce:
+				# Give up on con, like __reconnect does once it's out of tries
+				self._connect_started.pop(con, None)
+				con.error = str(ce)
+				log.error("Giving up on %s, exception when connecting: %s" % (con, ce))
+				self.__startup_done(con)
+				continue
+			if con.is_connecting():
+				self._connecting[con] = self.scheduler.call_later(CONNECT_TIMEOUT_SECS, self.__connect_timeout, con)
+				self._update_registration(con)
+
+	def __finish_connect(self, con):
+		if con.finish_connect():
+			self.__connect_done(con)
+		else:
+			self.__reconnect(con)
+
+	def __connect_timeout(self, con):
+		con.error = "Timed out connecting"
+		log.error("Timed out connecting %s" % con)
+		self.__reconnect(con)
+
+	def __connect_done(self, con):
+		"""con isn't connecting anymore, let the next queued connection start"""
+		timer = self._connecting.pop(con, None)
+		if timer != None:
+			timer.cancel()
+			self.__start_connects()
+
+	def _schedule_heart_beat(self, con):
+		"""(Re)schedule the keep-alive timer of con for when it will have been
+		quiet for MAX_LAST_SEND_SECS, with a 1 second margin"""
+		timer = self._heart_beats.pop(con, None)
+		if timer != None:
+			timer.cancel()
+		if con.is_connected():
+			self._heart_beats[con] = self.scheduler.call_at(con.last_send + con.MAX_LAST_SEND_SECS - 1, \
+				self.__heart_beat, con)
+
+	def __heart_beat(self, con):
+		del self._heart_beats[con]
+		if not con.is_connected():
+			return
+		if con.last_send + con.MAX_LAST_SEND_SECS - 1 <= time.time():
+			# Nothing's been sent for a while, tell the server we're still alive
+			try:
+				con.keep_alive()
+			except ConnectionException:
+				self.__reconnect(con)
+				return
+		self._schedule_heart_beat(con)
+
+	def get_connection_by_id(self, id):
+		"""Return the connected connection whose socket has the file descriptor id"""
+		return self._fds.get(id)
 
 	def __connect_all(self):
-		"""call connect on all the connections if con.is_connected() yields False"""
-		for con in self.connections:
-			if not con.is_connected():
-				con.connect()
+		"""Queue a connect for all the connections that aren't connected,
+		spread over self.login_window seconds"""
+		self.resolve_addresses()
+		cons = [con for con in self.connections if not con.is_connected() and not con.is_connecting()]
+		self._startup = set(cons)
+		self._startup_time = time.time()
+		if len(cons) > 1:
+			step = self.login_window / float(len(cons))
+		else:
+			step = 0
+		for i, con in enumerate(cons):
+			if i == 0 or step <= 0:
+				self.__queue_connect(con)
+			else:
+				self.scheduler.call_later(i * step, self.__queue_connect, con)
 
-	def __register_connections(self):
-		"""Registers socket file descriptors in the manager's poll object"""
-		if self._p == None:
-			return #Fall through, the connections will be registered when required
+	def resolve_addresses(self):
+		"""Look up the address of each connection's host, once per host and port,
+		and assign it to the connection so that connecting doesn't do it again"""
 		for con in self.connections:
-			if con.is_connected():
-				self._p.register(con, select.POLLIN | select.POLLPRI | select.POLLERR)
+			if hasattr(con, 'address'):
+				self._resolve(con)
+
+	def _resolve(self, con):
+		"""Assign the address of con's host to con.address, looking it up unless
+		it was looked up less than ADDRESS_TTL_SECS ago. Returns False, with
+		con.error set, if the lookup failed"""
+		key = (con.host, con.port)
+		now = time.time()
+		entry = self._addresses.get(key)
+		if entry == None or now - entry[1] >= ADDRESS_TTL_SECS:
+			try:
+				address = socket.getaddrinfo(con.host, con.port, socket.AF_INET, socket.SOCK_STREAM)[0][4]
+			except socket.gaierror as why:
+				con.error = "Failed to resolve %s:%d - %s" % (con.host, con.port, why)
+				log.error(con.error)
+				# Don't let connect() look the host up itself, that would block the loop
+				con.address = None
+				return False
+			entry = self._addresses[key] = (address, now)
+		con.address = entry[0]
+		return True
+
+	def __expire_address(self, con):
+		"""con was lost or failed to connect, the server may have moved.
+		Look its host up again on the next connect, unless it was just looked up"""
+		key = (con.host, con.port)
+		entry = self._addresses.get(key)
+		if entry != None and time.time() - entry[1] >= RECONNECT_DELAY_SECS:
+			del self._addresses[key]
+
+	def _logged_in(self, con):
+		"""Called when con has received LOG_IN_OK"""
+		started = self._connect_started.pop(con, None)
+		if started != None:
+			self.login_times[con] = time.time() - started
+			log.info("%s logged in %.3f seconds after connecting" % (con, self.login_times[con]))
+		self.__startup_done(con)
+
+	def __startup_done(self, con):
+		"""con has either logged in or given up; report once all the
+		connections started together are done"""
+		if con not in self._startup:
+			return
+		self._startup.remove(con)
+		if len(self._startup) == 0:
+			log.info("%d of %d connections logged in, %.3f seconds after startup" % \
+				(len([c for c in self.connections if c.is_connected()]), len(self.connections), \
+				time.time() - self._startup_time))
+
+	def _update_registration(self, con):
+		"""Register, re-register or unregister the socket of con with the selector,
+		depending on whether it's connected and has output waiting"""
+		if con.is_connecting():
+			# the socket becomes writable once the connect has completed or failed
+			events = selectors.EVENT_WRITE
+			fd = con.fileno()
+		elif con.is_connected():
+			events = selectors.EVENT_READ
+			if con.want_write():
+				# wait for the socket to take the rest of the output buffer
+				events |= selectors.EVENT_WRITE
+			fd = con.fileno()
+		else:
+			events = 0
+			fd = None
+		registered = self._registered.get(con)
+		if registered == (fd, events):
+			return
+		if registered != None and registered[0] != fd:
+			self._unregister(con)
+			registered = None
+		if events == 0:
+			return
+		if registered == None:
+			self._selector.register(fd, events, con)
+			self._fds[fd] = con
+		else:
+			self._selector.modify(fd, events, con)
+		self._registered[con] = (fd, events)
+
+	def _unregister(self, con):
+		"""Remove the socket of con from the selector, if it's registered"""
+		registered = self._registered.pop(con, None)
+		if registered != None:
+			self._selector.unregister(registered[0])
+			del self._fds[registered[0]]
+			self._pending_output.discard(con)
+
+	def manages(self, con):
+		"""Returns True if con is one of this manager's connections"""
+		return getattr(con, 'on_output_pending', None) == self._output_pending
+
+class ManagedConnectionEventHandler(BaseEventHandler):
+	"""Keeps a MultiConnectionManager's selector up to date when one of
+	its connections connects or disconnects, and tells it when one logs in.
+	Added to the manager's own event manager"""
+
+	def __init__(self, manager):
+		self.manager = manager
+		self.event_types = [NetEventType(NET_CONNECTED), NetEventType(NET_DISCONNECTED), \
+			ELEventType(ELNetFromServer.LOG_IN_OK)]
+
+	def notify(self, event):
+		con = event.data['connection']
+		if not self.manager.manages(con):
+			return
+		if not isinstance(event.type, NetEventType):
+			self.manager._logged_in(con)
+			return
+		if event.type.id == NET_CONNECTED:
+			self.manager._update_registration(con)
+		else:
+			self.manager._unregister(con)
+		self.manager._schedule_heart_beat(con)
+
+	def get_event_types(self):
+		return self.event_types
@@ -17,9 +17,16 @@
 """Sessions represent the information we recored while logged-in to an EL server
 """
 
+import time
+
 from pyela.el.net.elconstants import ELNetToServer, ELConstants
-from pyela.el.net.packets import ELPacket
-import struct
+from pyela.el.net.schema import TO_SERVER
+
+# A resync is over once no actor has been added for this many seconds
+RESYNC_SETTLE_SECS = 1
+
+# Give up waiting for a resync after this many seconds
+RESYNC_TIMEOUT_SECS = 10
 
 def get_elsession_by_config(config):
 	"""Load all relevant configuration and message values from the given
@@ -64,6 +71,7 @@ class ELSession(Session):
 		self.own_actor = None
 		self.game_time = 0 # The ingame time, hour given by int(.gametime/360) and minute by .gametime%360
 		self.current_map = ""
+		self.resync = ActorResync()
 	
 	def add_actor(self, actor):
 		self.actors.append(actor)
@@ -105,11 +113,86 @@ class ELSession(Session):
 			return
 		pos = self.get_channel_pos(channel.number)
 		#Calculate the channel ID from the position in the list and notify the server of the change
-		data = struct.pack('B', pos-1+ELConstants.CHAT_CHANNEL1)
-		channel.connection.send(ELPacket(ELNetToServer.SET_ACTIVE_CHANNEL, data))
+		channel.connection.send(TO_SERVER[ELNetToServer.SET_ACTIVE_CHANNEL].packet(pos-1+ELConstants.CHAT_CHANNEL1))
 		#Update the local list
 		for c in self.channels:
 			if c.number == channel.number:
 				c.is_active = True
 			else:
 				c.is_active = False
+
+class ActorResync(object):
+	"""Coalesces requests for the list of nearby actors (SEND_ME_MY_ACTORS).
+
+	A request is only sent when no resync is in progress. A resync is in
+	progress from the request until the server's answer (KILL_ALL_ACTORS
+	followed by an ADD_NEW_ACTOR per actor) has gone quiet for
+	RESYNC_SETTLE_SECS, or until RESYNC_TIMEOUT_SECS have passed.
+
+	Attributes:
+		sent		- the amount of requests sent
+		suppressed	- the amount of requests not sent, as a resync was in progress
+		completed	- the amount of resyncs the server answered
+		timed_out	- the amount of resyncs that weren't answered in time
+		aborted		- the amount of resyncs cut short by the connection going down
+	"""
+
+	def __init__(self):
+		self.sent = 0
+		self.suppressed = 0
+		self.completed = 0
+		self.timed_out = 0
+		self.aborted = 0
+		self._in_flight = False
+		self._requested_at = 0
+		self._last_actor_at = None # when the answer last added an actor, None until it starts
+
+	def request(self, connection):
+		"""Send SEND_ME_MY_ACTORS over connection, unless a resync is in progress.
+		Returns True if the request was sent"""
+		if self.in_progress():
+			self.suppressed += 1
+			return False
+		connection.send(TO_SERVER[ELNetToServer.SEND_ME_MY_ACTORS].packet())
+		self._in_flight = True
+		self._requested_at = time.time()
+		self._last_actor_at = None
+		self.sent += 1
+		return True
+
+	def in_progress(self):
+		"""Is a resync waiting for (the rest of) its answer?"""
+		if not self._in_flight:
+			return False
+		now = time.time()
+		if self._last_actor_at != None and now - self._last_actor_at >= RESYNC_SETTLE_SECS:
+			self.completed += 1
+		elif now - self._requested_at >= RESYNC_TIMEOUT_SECS:
+			self.timed_out += 1
+		else:
+			return True
+		self._in_flight = False
+		return False
+
+	def reset(self):
+		"""Forget the resync in progress, if any. Called when the connection
+		goes down or logs in again, as the answer to a request made over an
+		earlier socket will never come"""
+		if self._in_flight:
+			self.aborted += 1
+		self._in_flight = False
+		self._last_actor_at = None
+
+	def actors_cleared(self):
+		"""Called on KILL_ALL_ACTORS, which starts the server's answer"""
+		if self._in_flight:
+			self._last_actor_at = time.time()
+
+	def actor_added(self):
+		"""Called on ADD_NEW_(ENHANCED_)ACTOR"""
+		if self._in_flight and self._last_actor_at != None:
+			self._last_actor_at = time.time()
+
+	def __str__(self):
+		return "ActorResync: %d sent, %d suppressed, %d completed, %d timed out, %d aborted" % \
+			(self.sent, self.suppressed, self.completed, self.timed_out, self.aborted)
@@ -0,0 +1,96 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Declarative filters for RAW_TEXT subscriptions.
+
+A handler subscribed to RAW_TEXT can implement get_text_filters() to
+return a list of TextFilter instances; it's then only notified of the
+messages matched by at least one of them. The filters are checked against
+the raw message, before its text is decoded, and messages that no handler
+wants don't become events at all. For example:
+
+	def get_text_filters(self):
+		return [TextFilter(colour=ELConstants.C_GREEN1, prefix='You are in ')]
+"""
+
+from pyela.el.net.elconstants import ELConstants
+
+COLOUR_START = 127 + ELConstants.C_LBOUND
+COLOUR_END = 127 + ELConstants.C_UBOUND
+
+def _to_el_bytes(s):
+	if isinstance(s, str):
+		return s.encode('el', 'replace')
+	return bytes(s)
+
+class TextFilter(object):
+	"""Matches RAW_TEXT messages. A message is matched when it passes every
+	check that's set; a TextFilter with nothing set matches everything.
+
+	The text checks apply to the raw text following its leading colour codes.
+
+	Attributes:
+		channels - None, or the frozenset of the channels (ELConstants.CHAT_*)
+				   the message must be in
+		colour	- None, or the colour (ELConstants.C_*) the text must start with
+		prefix	- None, or the EL-encoded bytes the text must start with
+		sender	- None, or the EL-encoded name the text must start with, followed
+				  by a colon, like in local chat
+		pattern	- None, or a compiled bytes regular expression that must match
+				  at the start of the text
+	"""
+
+	def __init__(self, channels=None, colour=None, prefix=None, sender=None, pattern=None):
+		"""channels may be a single channel or any iterable of them; prefix and
+		sender may be str or bytes"""
+		if isinstance(channels, int):
+			channels = (channels,)
+		self.channels = frozenset(channels) if channels != None else None
+		self.colour = colour
+		self.prefix = _to_el_bytes(prefix) if prefix else None
+		self.sender = _to_el_bytes(sender) if sender else None
+		self._sender = self.sender + b':' if self.sender else None
+		self.pattern = pattern
+
+	def matches(self, channel, raw):
+		"""Returns True if the message with the raw text raw (bytes-like, colour
+		codes included) in the channel channel passes the filter"""
+		if self.channels != None and channel not in self.channels:
+			return False
+		start = 0
+		end = len(raw)
+		while start < end and COLOUR_START <= raw[start] <= COLOUR_END:
+			start += 1
+		if self.colour != None and (start == 0 or raw[start-1] != self.colour + 127):
+			return False
+		if self.prefix != None and not raw.startswith(self.prefix, start):
+			return False
+		if self._sender != None and not raw.startswith(self._sender, start):
+			return False
+		if self.pattern != None and self.pattern.match(raw, start) == None:
+			return False
+		return True
+
+	def __str__(self):
+		return repr("TextFilter.channels=%s, colour=%s, prefix=%s, sender=%s, pattern=%s" % \
+			(self.channels, self.colour, self.prefix, self.sender, self.pattern))
+
+def text_filters_match(filters, channel, raw):
+	"""Returns True if any of the TextFilter instances in filters matches"""
+	for f in filters:
+		if f.matches(channel, raw):
+			return True
+	return False
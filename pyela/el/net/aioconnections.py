@@ -0,0 +1,309 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""asyncio implementation of the EL client connection.
+
+AsyncELConnection is used like ELConnection, except that connecting and
+receiving are coroutines. Packet handlers, parsers and event handlers
+written for ELConnection work unchanged, as sending stays a plain method.
+"""
+import asyncio
+import collections
+import logging
+import time
+
+from pyela.net.connections import BaseConnection
+from pyela.el.net.elconstants import ELNetToServer
+from pyela.el.net.packets import ELPacket
+from pyela.el.net.packethandlers import BasePacketHandler
+from pyela.el.net.framing import ELPacketFramer, HEADER
+from pyela.el.net.connections import CONNECTED, CONNECTING, DISCONNECTED
+from pyela.el.common.exceptions import ConnectionException
+from pyela.el.logic.session import get_elsession_by_config
+from pyela.logic.event import NetEvent, NetEventType, NET_CONNECTED, NET_DISCONNECTED
+from pyela.el.logic.eventmanagers import ELEventManager, ELSimpleEventManager
+
+log = logging.getLogger('pyela.el.net.aioconnections')
+
+def get_asyncelconnection_by_config(config):
+	"""Create an AsyncELConnection by using the ConfigParser instance, config."""
+	session = get_elsession_by_config(config)
+	elc = AsyncELConnection(session, \
+		host=config.get('login', 'host'), port=config.getint('login', 'port'))
+	elc.set_properties(config)
+	return elc
+
+class ELProtocol(asyncio.Protocol):
+	"""An asyncio protocol that frames the data received from an EL server.
+
+	Complete packets are queued up per read, in the order they arrived, until
+	the connection collects them with next_packets(). Malformed data closes
+	the connection; error then holds the reason
+	"""
+
+	def __init__(self, connection):
+		self.connection = connection
+		self.transport = None
+		self._inp = ELPacketFramer()
+		self._received = collections.deque() # lists of packets, one per read
+		self._waiter = None
+		self._closed = False
+		self._drain_waiter = None
+		self.paused = False
+		self.error = None
+
+	def connection_made(self, transport):
+		self.transport = transport
+
+	def data_received(self, data):
+		try:
+			self._inp.feed(data)
+			packets = self._inp.packets(self.connection.packet_handler.wanted)
+		except ConnectionException as ce:
+			self.error = ce.value
+			log.error("Closing connection to %s: %s" % (self.connection, self.error))
+			self._closed = True
+			self.transport.close()
+			self._wakeup()
+			return
+		if packets:
+			self._received.append(packets)
+			self._wakeup()
+
+	def eof_received(self):
+		# Let the transport close itself
+		return False
+
+	def connection_lost(self, exc):
+		if exc != None:
+			log.error("Lost connection to %s: %s" % (self.connection, exc))
+		self._closed = True
+		self._wakeup()
+		self.resume_writing()
+
+	def pause_writing(self):
+		self.paused = True
+
+	def resume_writing(self):
+		self.paused = False
+		if self._drain_waiter != None and not self._drain_waiter.done():
+			self._drain_waiter.set_result(None)
+		self._drain_waiter = None
+
+	def _wakeup(self):
+		if self._waiter != None and not self._waiter.done():
+			self._waiter.set_result(None)
+		self._waiter = None
+
+	async def next_packets(self):
+		"""Return the list of packets from the next read, or None once the
+		connection has been closed and everything received was collected"""
+		while not self._received:
+			if self._closed:
+				return None
+			self._waiter = asyncio.get_running_loop().create_future()
+			await self._waiter
+		return self._received.popleft()
+
+	async def drain(self):
+		"""Wait until the transport's write buffer is below its high-water mark"""
+		if self.paused and not self._closed:
+			if self._drain_waiter == None:
+				self._drain_waiter = asyncio.get_running_loop().create_future()
+			await self._drain_waiter
+
+class AsyncELConnection(BaseConnection):
+	"""An EL server connection running on an asyncio event loop.
+
+	Attributes are the same as for pyela.el.net.connections.ELConnection.
+	Iterating over an instance with "async for" yields every ELPacket received
+	until the connection is lost, except for the message types the packet
+	handler doesn't want (see BasePacketHandler.wanted).
+	"""
+
+	def __init__(self, session, host='game.eternal-lands.com', port=2001,\
+		packet_handler=None, MAX_CON_TRIES=3, MAX_LAST_SEND_SECS=18, event_manager=None):
+		"""Parameters are the same as for ELConnection"""
+		self.host = host
+		self.port = port
+		self.session = session
+		self.status = DISCONNECTED
+		self.socket = None
+		self.transport = None
+		self.protocol = None
+		self.last_send = None
+		self.con_tries = 0
+		self.MAX_CON_TRIES = MAX_CON_TRIES
+		self.MAX_LAST_SEND_SECS = MAX_LAST_SEND_SECS
+		if packet_handler == None:
+			self.packet_handler = BasePacketHandler()
+		else:
+			self.packet_handler = packet_handler
+		if event_manager == None:
+			self.event_manager = ELEventManager(ELSimpleEventManager())
+		else:
+			self.event_manager = event_manager
+		self.error = ""
+		self._heart_beat = None
+
+	def set_properties(self, config):
+		"""Load the configuration parameters from the ConfigParser instance config"""
+		self.config = config
+		self.session = get_elsession_by_config(config)
+		self.host = config.get('login', 'host')
+		self.port = config.getint('login', 'port')
+		self.MAX_CON_TRIES = config.getint('actions', 'max_recon')
+		self.MAX_LAST_SEND_SECS = config.getint('actions', 'max_send_secs')
+
+	def fileno(self):
+		return self.socket.fileno()
+
+	def is_connected(self):
+		return self.status == CONNECTED
+
+	async def connect(self):
+		"""Connect to the EL server and log in.
+		Returns True on success, False otherwise (see self.error)"""
+		if self.is_connected():
+			raise ConnectionException("Already connected")
+		if self.session == None or not self.session.name or not self.session.password:
+			self.error = "Username or password not set"
+			return False
+		self.con_tries += 1
+		self.status = CONNECTING
+		log.info('Connecting to %s:%d' % (self.host, self.port))
+		loop = asyncio.get_running_loop()
+		try:
+			self.transport, self.protocol = await loop.create_connection(
+				lambda: ELProtocol(self), self.host, self.port)
+		except OSError as why:
+			log.error("Error connecting to %s:%d - %s" % (self.host, self.port, why))
+			self.error = str(why)
+			self.status = DISCONNECTED
+			return False
+		self.socket = self.transport.get_extra_info('socket')
+		login_str = ('%s %s\0' % (self.session.name, self.session.password)).encode('iso8859')
+		self.send(ELPacket(ELNetToServer.LOG_IN, login_str))
+		self.status = CONNECTED
+		self.session.resync.reset()
+		self._heart_beat = loop.create_task(self.__heart_beat())
+		self.event_manager.raise_event(NetEvent(NetEventType(NET_CONNECTED), self))
+		return True
+
+	async def reconnect(self):
+		"""Closes the connection, then connects again"""
+		if self.con_tries >= self.MAX_CON_TRIES:
+			raise ConnectionException("Max connection retries has been exceeded")
+		self.disconnect()
+		return await self.connect()
+
+	def disconnect(self):
+		"""Closes the connection gracefully"""
+		if self.status == CONNECTED and not self.protocol._closed:
+			self.send(ELPacket(ELNetToServer.BYE, None))
+		if self._heart_beat != None:
+			self._heart_beat.cancel()
+			self._heart_beat = None
+		if self.transport != None:
+			self.transport.close()
+		if self.session != None:
+			# A resync requested over this transport won't be answered
+			self.session.resync.reset()
+		self.event_manager.raise_event(NetEvent(NetEventType(NET_DISCONNECTED), self))
+		self.transport = None
+		self.socket = None
+		self.status = DISCONNECTED
+
+	def keep_alive(self):
+		"""Sends a heartbeat to the server so that it knows we're still alive"""
+		if self.is_connected():
+			self.send(ELPacket(ELNetToServer.HEART_BEAT, None))
+
+	async def __heart_beat(self):
+		# Send a heartbeat whenever nothing else has been sent for a while,
+		# with a one second margin
+		while True:
+			await asyncio.sleep(max(0, self.last_send + self.MAX_LAST_SEND_SECS - 1 - time.time()))
+			if self.last_send + self.MAX_LAST_SEND_SECS - 1 <= time.time():
+				self.keep_alive()
+
+	def send(self, packet, flush=None):
+		"""Hand the ELPacket instance packet to the transport.
+		The transport does its own buffering, so flush is ignored"""
+		if self.transport == None or self.transport.is_closing():
+			raise ConnectionException("Not connected")
+		if log.isEnabledFor(logging.DEBUG): log.debug("Sending %s, %s" % (packet.type, packet.data))
+		if packet.data:
+			self.transport.writelines((HEADER.pack(packet.type, len(packet.data) + 1), packet.data))
+		else:
+			self.transport.write(HEADER.pack(packet.type, 1))
+		self.last_send = time.time()
+
+	def send_all(self, packets):
+		for packet in packets:
+			self.send(packet)
+
+	def want_write(self):
+		return self.transport != None and self.transport.get_write_buffer_size() > 0
+
+	def pending_output(self):
+		"""Returns the amount of bytes buffered by the transport"""
+		if self.transport == None:
+			return 0
+		return self.transport.get_write_buffer_size()
+
+	def is_congested(self):
+		return self.protocol != None and self.protocol.paused
+
+	async def drain(self):
+		"""Wait until the output buffered by the transport is below its high-water mark"""
+		if self.protocol != None:
+			await self.protocol.drain()
+
+	def byte_counts(self):
+		"""Returns a dict of message type: (parsed bytes, skipped bytes) for the
+		messages received since the connection was made"""
+		if self.protocol == None:
+			return {}
+		return self.protocol._inp.byte_counts()
+
+	async def recv(self):
+		"""Return the list of ELPacket instances from the next read.
+		Raises ConnectionException when the other end closes the connection"""
+		packets = await self.protocol.next_packets()
+		if packets == None:
+			error = self.protocol.error
+			self.status = DISCONNECTED
+			self.disconnect()
+			if error != None:
+				self.error = error
+				raise ConnectionException(error)
+			raise ConnectionException("Other end terminated the connection")
+		return packets
+
+	def __aiter__(self):
+		return self.__packets()
+
+	async def __packets(self):
+		while True:
+			packets = await self.protocol.next_packets()
+			if packets == None:
+				return
+			for packet in packets:
+				yield packet
+
+	def __str__(self):
+		return "%s @ %s:%d" % (self.session.name, self.host, self.port)
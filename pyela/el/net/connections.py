@@ -16,23 +16,33 @@
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 import socket
 import os
+import errno
 import logging
 import struct
 import time
 import collections
+import itertools
 
 from pyela.net.connections import BaseConnection
 from pyela.el.net.elconstants import ELConstants
 from pyela.el.net.elconstants import ELNetToServer
 from pyela.el.net.packets import ELPacket
+from pyela.el.net.framing import ELPacketFramer, DEFAULT_BUFFER_SIZE, HEADER, HEADER_LEN
 from pyela.el.net.packethandlers import BasePacketHandler
 from pyela.el.common.exceptions import ConnectionException
 from pyela.el.logic.session import ELSession, get_elsession_by_config
 from pyela.logic.event import NetEvent, NetEventType, NET_CONNECTED, NET_DISCONNECTED
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
+from pyela.el.logic.eventmanagers import ELEventManager, ELSimpleEventManager
 
 CONNECTED, CONNECTING, DISCONNECTED = range(3)
 
+# Packets that are written to the socket as soon as they're sent, rather
+# than waiting for the rest of the output to be batched up
+URGENT_PACKETS = frozenset([ELNetToServer.PING_RESPONSE, ELNetToServer.HEART_BEAT])
+
+# The maximum amount of buffers handed to a single sendmsg() call
+MAX_SEND_SEGMENTS = 64
+
 log = logging.getLogger('pyela.el.net.connections')
 
 def get_elconnection_by_config(config):
@@ -52,6 +62,8 @@ class ELConnection(BaseConnection):
 	Attributes:
 		host		- the hostname to connect to
 		port		- the port to connect to on self.host
+		address		- None, or the (ip, port) tuple self.host and self.port resolve to.
+					  When set, it's connected to instead of looking self.host up
 		username	- the EL username to use when logging in
 		password	- the plaintext password to use to log in
 		status		- the status of this connection, at construction this is 
@@ -64,10 +76,23 @@ class ELConnection(BaseConnection):
 		packet_handler - the packet handler instance used to process input and generated output
 							from the underlying connection. By default, this is assigned to 
 							BasePacketHandler
+		OUT_BUFFER_HIGH_WATER - the amount of unsent bytes in the output buffer at which
+							is_congested() starts returning True
+		autoflush	- if True (the default), send() writes to the socket right away when
+					  the output buffer was empty. Connection managers set this to False
+					  and flush() once per loop iteration, so packets are coalesced
+		on_output_pending - None, or a callable taking this connection as its argument.
+					  It's called when data is left in the empty output buffer after send()
+		scheduler	- the pyela.logic.scheduler.Scheduler of the manager running this
+					  connection, if any. Handlers can use it to run code later on
+		event_manager - the ELEventManager that this connection's events are raised
+					  on. Handlers added to it only get this connection's events.
+					  By default, its parent is ELSimpleEventManager()
 	"""
 
 	def __init__(self, session, host='game.eternal-lands.com', port=2001,\
-		packet_handler=None, MAX_CON_TRIES=3, MAX_LAST_SEND_SECS=18):
+		packet_handler=None, MAX_CON_TRIES=3, MAX_LAST_SEND_SECS=18, \
+		OUT_BUFFER_HIGH_WATER=65536, event_manager=None):
 		"""Create an instance with the given username and password, 
 		as well as the hostname and port.
 		This constructor will assume default values for attributes 
@@ -81,11 +106,16 @@ class ELConnection(BaseConnection):
 			MAX_CON_TRIES - the maximum amount of connection attempts, default 3
 			MAX_LAST_SEND_SECS - the maximum amount of seconds allowed between 
 								 messages to the server, default 18
+			OUT_BUFFER_HIGH_WATER - the output buffer size, in bytes, that marks
+								 the connection as congested, default 65536
+			event_manager - the connection's event manager, defaults to a new
+								 ELEventManager whose parent is ELSimpleEventManager()
 			incomplete_msgs - list of ELPacket instances who are incomplete
 			error	 - String containing an error message for the last error that was encountered
 		"""
 		self.host = host
 		self.port = port
+		self.address = None
 		self.session = session
 		self.status = DISCONNECTED
 		self.socket = None
@@ -93,11 +123,23 @@ class ELConnection(BaseConnection):
 		self.con_tries = 0
 		self.MAX_CON_TRIES = MAX_CON_TRIES
 		self.MAX_LAST_SEND_SECS = MAX_LAST_SEND_SECS
+		self.OUT_BUFFER_HIGH_WATER = OUT_BUFFER_HIGH_WATER
 		if packet_handler == None:
 			self.packet_handler = BasePacketHandler() #TODO: Should this be BasePacketHandler or BaseELPacketHandler?
 		else:
 			self.packet_handler = packet_handler
-		self._inp = bytearray()
+		self._inp = ELPacketFramer()
+		self._out = collections.deque() # output buffer, byte strings not yet (fully) sent
+		self._out_pos = 0 # how much of self._out[0] has been sent
+		self._out_len = 0 # the amount of unsent bytes in self._out
+		self._can_sendmsg = hasattr(socket.socket, 'sendmsg') # vectored writes aren't available everywhere
+		self.autoflush = True
+		self.on_output_pending = None
+		self.scheduler = None
+		if event_manager == None:
+			self.event_manager = ELEventManager(ELSimpleEventManager())
+		else:
+			self.event_manager = event_manager
 		self.error = ""
 
 	def set_properties(self, config):
@@ -109,9 +151,10 @@ class ELConnection(BaseConnection):
 		self.session = get_elsession_by_config(config)
 		self.host = self.config.get('login', 'host')
 		self.port = self.config.getint('login', 'port')
+		self.address = None
 		self.MAX_CON_TRIES = config.getint('actions', 'max_recon')
 		self.MAX_LAST_SEND_SECS = config.getint('actions', 'max_send_secs')
-		self._inp = bytearray() # input buffer, for incomplete messages
+		self._inp = ELPacketFramer() # input buffer, for incomplete messages
 	
 	def fileno(self):
 		"""Allows this object to be used with poll() etc"""
@@ -120,67 +163,139 @@ class ELConnection(BaseConnection):
 		#	raise ConnectionException("Instance not connected to remote server, no fileno available")
 		return self.socket.fileno()
 
-	#TODO: Reconsider this status scheme. Currently CONNECTING is never used.
 	def is_connected(self):
 		return self.status == CONNECTED
 
-	def connect(self):
-		"""Connects to the EL server specified at construction"""
-		if self.is_connected():
+	def is_connecting(self):
+		"""Returns True while a non-blocking connect is in progress"""
+		return self.status == CONNECTING
+
+	def connect(self, blocking=True):
+		"""Connects to the EL server specified at construction and logs in.
+		If blocking is False, the connection attempt is only started: the
+		status becomes CONNECTING, and finish_connect() must be called once
+		the socket is writable.
+		Returns False if the attempt failed, see self.error"""
+		if self.is_connected() or self.is_connecting():
 			raise ConnectionException("Already connected")
 		self.con_tries += 1
 		if not self.__setup_socket():
 			return False
-		self._inp = bytearray() #Discard old data
-		return self._send_login()
+		self._inp.reset() #Discard old data
+		self.__clear_output()
+		if blocking:
+			return self._send_login()
+		return self._start_connect()
 
-	def reconnect(self):
+	def reconnect(self, blocking=True):
 		"""Shuts down the socket, then reinitialises and reopens the connection."""
 		if self.con_tries >= self.MAX_CON_TRIES:
 			raise ConnectionException("Max connection retries has been exceeded")
 		self.disconnect()
-		return self.connect()
+		return self.connect(blocking)
 
 	def disconnect(self):
 		"""Closes our socket gracefully"""
-		if self.status != DISCONNECTED:
-			self.send(ELPacket(ELNetToServer.BYE, None)) #This is not really necessary, but d
-			self.socket.shutdown(socket.SHUT_RDWR)
+		if self.status == CONNECTED:
+			try:
+				# Write out what's been queued, replies included, and BYE
+				# before the socket goes; managed connections don't autoflush
+				self.send(ELPacket(ELNetToServer.BYE, None), flush=True) #This is not really necessary, but d
+				self.flush()
+				self.socket.shutdown(socket.SHUT_RDWR)
+			except (ConnectionException, socket.error):
+				if self.socket == None:
+					# flush() found the connection dead and disconnected it
+					return
+		self.__clear_output()
+		self.__reset_resync()
 		event = NetEvent(NetEventType(NET_DISCONNECTED), self)
-		ELSimpleEventManager().raise_event(event)
+		self.event_manager.raise_event(event)
 		if self.socket != None:
 			self.socket.close()
 		self.socket = None
 		self.status = DISCONNECTED
 
-	def _send_login(self):
+	def __has_credentials(self):
 		if self.session == None or self.session.name == None or self.session.password == None or \
 			self.session.name == "" or self.session.password == "":
 			self.error = "Username or password not set"
 			return False
-		login_str = ('%s %s\0' % (self.session.name, self.session.password)).encode('iso8859')
+		return True
+
+	def _send_login(self):
+		if not self.__has_credentials():
+			return False
 		try:
 			log.info('Connecting to %s:%d' % (self.host, self.port))
-			ret = self.socket.connect_ex((self.host, self.port))
+			ret = self.socket.connect_ex(self.address or (self.host, self.port))
 			if ret == 0:
-				self.send(ELPacket(ELNetToServer.LOG_IN, login_str))	
-				self.status = CONNECTED
-				self.socket.setblocking(1)
-				event = NetEvent(NetEventType(NET_CONNECTED), self)
-				ELSimpleEventManager().raise_event(event)
+				self.__login()
 				return True
 			else:
-				log.error("Error %d connecting - %s" % (ret, os.strerror(ret)))
-				self.status = DISCONNECTED
-				self.disconnect()
-				self.error = os.strerror(ret)
-				return False
+				return self.__connect_failed(ret)
 		except (socket.error, socket.herror, socket.gaierror) as why:
-			self.error = "%s (%i)" % (why[1], why[0])
-			self.status = DISCONNECTED
-			self.disconnect()
+			return self.__connect_failed(why)
+
+	def _start_connect(self):
+		"""Start a non-blocking connect"""
+		if not self.__has_credentials():
 			return False
+		try:
+			log.info('Connecting to %s:%d' % (self.host, self.port))
+			self.socket.setblocking(0)
+			ret = self.socket.connect_ex(self.address or (self.host, self.port))
+		except (socket.error, socket.herror, socket.gaierror) as why:
+			return self.__connect_failed(why)
+		if ret == 0:
+			self.__login()
+		elif ret in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+			self.status = CONNECTING
+		else:
+			return self.__connect_failed(ret)
+		return True
 
+	def finish_connect(self):
+		"""Complete a connect started with connect(blocking=False), once the
+		socket has become writable. Logs in and returns True if the
+		connection was established, False otherwise (see self.error)"""
+		if not self.is_connecting():
+			return self.is_connected()
+		try:
+			ret = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+		except socket.error as why:
+			return self.__connect_failed(why)
+		if ret != 0:
+			return self.__connect_failed(ret)
+		self.__login()
+		return True
+
+	def __login(self):
+		"""The socket is connected, send the login details"""
+		login_str = ('%s %s\0' % (self.session.name, self.session.password)).encode('iso8859')
+		self.socket.setblocking(0)
+		self.send(ELPacket(ELNetToServer.LOG_IN, login_str), True)
+		self.status = CONNECTED
+		self.__reset_resync()
+		event = NetEvent(NetEventType(NET_CONNECTED), self)
+		self.event_manager.raise_event(event)
+
+	def __reset_resync(self):
+		"""A resync requested over an earlier socket won't be answered"""
+		if self.session != None:
+			self.session.resync.reset()
+
+	def __connect_failed(self, why):
+		"""why is either an errno or a socket exception"""
+		if isinstance(why, int):
+			self.error = os.strerror(why)
+			log.error("Error %d connecting - %s" % (why, self.error))
+		else:
+			self.error = str(why)
+			log.error("Error connecting - %s" % self.error)
+		self.status = DISCONNECTED
+		self.disconnect()
+		return False
 
 	def __setup_socket(self):
 		if self.socket is None:
@@ -199,61 +314,128 @@ class ELConnection(BaseConnection):
 		if self.is_connected():
 			self.send(ELPacket(ELNetToServer.HEART_BEAT, None))
 	
-	def send(self, packet):
-		"""Constructs the type and data in the ELPacket instance, packet and transmits"""
-		log.debug("Sending %s, %s" % (packet.type, packet.data))
-		if packet.data is not None:
-			length = len(packet.data) + 1
+	def send(self, packet, flush=None):
+		"""Appends the type and data in the ELPacket instance, packet, to the
+		output buffer.
+		The buffer is written to the socket straight away if flush is True, if
+		the packet type is in URGENT_PACKETS or if self.autoflush is set and
+		nothing else was waiting to be sent. Otherwise the packet goes out with
+		the next call to flush(), together with everything else queued up
+		"""
+		if log.isEnabledFor(logging.DEBUG): log.debug("Sending %s, %s" % (packet.type, packet.data))
+		was_empty = self._out_len == 0
+		data = packet.data
+		if data:
+			if type(data) is not bytes:
+				# Don't hold on to a buffer the caller may change before it's sent
+				data = bytes(data)
+			self._out.append(HEADER.pack(packet.type, len(data) + 1))
+			self._out.append(data)
+			self._out_len += HEADER_LEN + len(data)
 		else:
-			length = 1
-		to_send = struct.pack('<BH', packet.type, length)
-		if packet.data is not None:
-			to_send += packet.data
-		sent = 0
-		while sent < len(to_send):
-			#TODO: This may block
-			ret = self.socket.send(to_send[sent:])
-			if ret == 0 or ret == -1:
+			self._out.append(HEADER.pack(packet.type, 1))
+			self._out_len += HEADER_LEN
+		if flush is None:
+			flush = packet.type in URGENT_PACKETS or (self.autoflush and was_empty)
+		if flush:
+			self.flush()
+		if was_empty and self._out_len and self.on_output_pending != None:
+			self.on_output_pending(self)
+
+	def send_all(self, packets):
+		"""Queue all the ELPacket instances in the list packets and write
+		them with as few system calls as possible"""
+		for packet in packets:
+			self.send(packet, False)
+		if self.autoflush:
+			self.flush()
+
+	def flush(self):
+		"""Write as much of the output buffer to the socket as it will take
+		without blocking, up to MAX_SEND_SEGMENTS buffers per system call.
+		Returns True if the output buffer is now empty.
+		Raises ConnectionException if the connection has died
+		"""
+		out = self._out
+		while out:
+			try:
+				if self._can_sendmsg:
+					segments = list(itertools.islice(out, 0, MAX_SEND_SEGMENTS))
+					if self._out_pos:
+						segments[0] = memoryview(segments[0])[self._out_pos:]
+					ret = self.socket.sendmsg(segments)
+				else:
+					with memoryview(out[0]) as view:
+						ret = self.socket.send(view[self._out_pos:])
+			except (BlockingIOError, InterruptedError):
+				break
+			except socket.error as why:
+				self.error = str(why)
+				self.status = DISCONNECTED
+				self.disconnect()
+				raise ConnectionException("Error sending to the other end: %s" % why)
+			if ret == 0:
 				self.status = DISCONNECTED
 				self.disconnect()
 				raise ConnectionException("Other end disconnected")
-			sent += ret
-		self.__set_last_send(time.time())
-		log.debug("Packet sent")
-	
-	def send_all(self, packets):
-		for packet in packets:
-			self.send(packet)
+			self.__set_last_send(time.time())
+			self._out_len -= ret
+			# Drop the buffers that have been sent completely
+			ret += self._out_pos
+			while out and ret >= len(out[0]):
+				ret -= len(out.popleft())
+			self._out_pos = ret
+		if log.isEnabledFor(logging.DEBUG): log.debug("%d bytes left in the output buffer" % self._out_len)
+		return self._out_len == 0
+
+	def want_write(self):
+		"""Returns True if there is data in the output buffer waiting for the
+		socket to become writable"""
+		return self._out_len > 0
+
+	def pending_output(self):
+		"""Returns the amount of bytes in the output buffer that have not been sent"""
+		return self._out_len
 
-	def recv(self, length=2048):
+	def is_congested(self):
+		"""Returns True if the output buffer has grown to OUT_BUFFER_HIGH_WATER
+		bytes or more. Callers generating lots of output should hold back
+		until the buffer has been flushed."""
+		return self._out_len >= self.OUT_BUFFER_HIGH_WATER
+
+	def __clear_output(self):
+		self._out.clear()
+		self._out_pos = 0
+		self._out_len = 0
+	
+	def recv(self, length=DEFAULT_BUFFER_SIZE):
 		"""
-			Return the contents of the socket. length is optional, defaults to 2048
+			Read up to length bytes from the socket and return a list of the
+			complete ELPacket instances received so far.
+			length is optional, defaults to DEFAULT_BUFFER_SIZE
 			Raises ConnectionException on errors
 		"""
-		packets = []
-		def parse_message():
-			"""Return the packet type (see ELConstants) and its data as a tuple"""
-			while len(self._inp) >= 3:
-				header = struct.unpack('<BH', self._inp[:3])
-				msg_len = header[1]-1
-				if len(self._inp) >= msg_len+3:
-					yield ELPacket(header[0], self._inp[3:3+msg_len])
-					#Get rid of the message we just returned
-					self._inp = self._inp[3+msg_len:] 
-				else:
-					#We don't have the entire message, abort
-					return
-		ret = self.socket.recv(length)
+		try:
+			ret = self._inp.recv_into(self.socket, length)
+		except (BlockingIOError, InterruptedError):
+			# Nothing to read after all
+			return []
+		except socket.error as why:
+			self.error = str(why)
+			ret = 0
 		if not ret:
 			#recv failed, connection dead
 			#TODO: Store the error somewhere?
 			self.status = DISCONNECTED
 			self.disconnect()
 			raise ConnectionException("Other end terminated the connection")
-		self._inp += ret
-		for packet in parse_message():
-			packets.append(packet)
-		return packets
+		return self._inp.packets(self.packet_handler.wanted)
+
+	def byte_counts(self):
+		"""Returns a dict of message type: (parsed bytes, skipped bytes) for the
+		messages received so far. Messages are skipped when the packet
+		handler has no use for their type"""
+		return self._inp.byte_counts()
 
 	def __set_last_send(self, t):
 		self.last_send = t
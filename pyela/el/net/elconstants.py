@@ -16,13 +16,56 @@
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 import logging as log
 
-class ReflectiveConstants(object):
-	"""Denotes that this class has functionality to reflect upon its properties"""
+class ConstantsType(type):
+	"""Metaclass of ReflectiveConstants.
+
+	When a class is created, its int attributes (and those it inherits) are
+	collected into two tables: names maps each value to the first identifier
+	defined with it, values maps each identifier to its value. The attributes
+	themselves stay plain ints, so ELNetFromServer.RAW_TEXT is still 0.
+	"""
+
+	def __init__(cls, name, bases, namespace):
+		super(ConstantsType, cls).__init__(name, bases, namespace)
+		values = {}
+		for klass in reversed(cls.__mro__):
+			for att, val in vars(klass).items():
+				if not att.startswith("_") and type(val) == int:
+					values[att] = val
+		names = {}
+		for att, val in values.items():
+			names.setdefault(val, att)
+		cls.values = values
+		cls.names = names
+
+	def __getitem__(cls, name):
+		"""ELNetToServer['LOG_IN'] returns the value of the identifier name"""
+		return cls.values[name]
+
+	def __contains__(cls, val):
+		"""Returns True if val is the value of one of the identifiers"""
+		return val in cls.names
+
+	def __iter__(cls):
+		"""Iterates over the (identifier, value) pairs, in definition order"""
+		return iter(cls.values.items())
+
+	def __len__(cls):
+		return len(cls.values)
+
+class ReflectiveConstants(object, metaclass=ConstantsType):
+	"""Denotes that this class has functionality to reflect upon its properties.
+	See ConstantsType for the lookup tables"""
+
+	@classmethod
+	def name_of(cls, val, default=None):
+		"""Returns the identifier for the value val, or default"""
+		return cls.names.get(val, default)
+
 	def to_identifier(instance, val):
-		"""Iterates through instance attributes and returns the identifier for val"""
-		for att in dir(instance):
-			if not att.startswith("__") and getattr(instance, att) == int(val):
-				return att
+		"""Returns the identifier for val. instance may be the class itself or
+		an instance of it"""
+		return instance.names.get(int(val))
 
 class ELConstants(ReflectiveConstants):
 # Actor types
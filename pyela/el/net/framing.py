@@ -0,0 +1,137 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Splits the byte stream from an EL server into ELPacket instances"""
+
+import struct
+
+from pyela.el.net.packets import ELPacket
+from pyela.el.common.exceptions import ConnectionException
+
+# Every EL message starts with its type (1 byte) and the length of the
+# type and payload (2 bytes, little endian)
+HEADER = struct.Struct('<BH')
+HEADER_LEN = HEADER.size
+
+DEFAULT_BUFFER_SIZE = 16384
+
+class ELPacketFramer(object):
+	"""An input buffer for an EL connection.
+
+	Received data is written into a reusable bytearray and complete messages
+	are consumed by advancing a read offset, so framing a burst of messages
+	costs the same per message no matter how many arrived in one read.
+	The unread tail is only moved to the front of the buffer when there is
+	no room left behind it.
+
+	Attributes:
+		buffer	- the bytearray received data is written into
+		start	- offset in buffer of the first byte not yet framed
+		end		- offset in buffer one past the last byte received
+		parsed_bytes - a list with the amount of payload bytes framed into
+				  packets so far, per message type
+		skipped_bytes - a list with the amount of payload bytes skipped so
+				  far, per message type
+	"""
+
+	def __init__(self, size=DEFAULT_BUFFER_SIZE):
+		self.buffer = bytearray(size)
+		self.start = 0
+		self.end = 0
+		self.parsed_bytes = [0] * 256
+		self.skipped_bytes = [0] * 256
+
+	def __len__(self):
+		"""The number of received bytes that haven't been framed yet"""
+		return self.end - self.start
+
+	def reset(self):
+		"""Discard all buffered data"""
+		self.start = 0
+		self.end = 0
+
+	def byte_counts(self):
+		"""Returns a dict of message type: (parsed bytes, skipped bytes), for
+		every message type that has been received"""
+		return dict((t, (self.parsed_bytes[t], self.skipped_bytes[t])) for t in range(256) \
+			if self.parsed_bytes[t] or self.skipped_bytes[t])
+
+	def _reserve(self, length):
+		"""Make room for at least length bytes after self.end"""
+		free = len(self.buffer) - self.end
+		if free >= length:
+			return
+		pending = self.end - self.start
+		if self.start > 0:
+			# Compact, move the incomplete message to the front of the buffer
+			self.buffer[:pending] = self.buffer[self.start:self.end]
+			self.start = 0
+			self.end = pending
+			free = len(self.buffer) - pending
+		if free < length:
+			self.buffer.extend(bytes(length - free))
+
+	def recv_into(self, sock, length=DEFAULT_BUFFER_SIZE):
+		"""Read up to length bytes from the socket sock straight into the buffer.
+		Returns the number of bytes read, as returned by sock.recv_into
+		"""
+		self._reserve(length)
+		with memoryview(self.buffer) as view:
+			ret = sock.recv_into(view[self.end:self.end+length], length)
+		self.end += ret
+		return ret
+
+	def feed(self, data):
+		"""Append the bytes-like object data to the buffer"""
+		length = len(data)
+		self._reserve(length)
+		self.buffer[self.end:self.end+length] = data
+		self.end += length
+
+	def packets(self, wanted=None):
+		"""Return a list of ELPacket instances for all complete messages in the
+		buffer. Each packet's data is a copy of its payload, made once.
+		wanted is None, or a sequence of 256 flags indexed by message type;
+		messages whose flag is 0 are consumed without creating a packet.
+		Raises ConnectionException if a message header is malformed
+		"""
+		packets = []
+		start = self.start
+		end = self.end
+		unpack_from = HEADER.unpack_from
+		parsed_bytes = self.parsed_bytes
+		skipped_bytes = self.skipped_bytes
+		with memoryview(self.buffer) as view:
+			while end - start >= HEADER_LEN:
+				msg_type, msg_len = unpack_from(view, start)
+				if msg_len < 1:
+					raise ConnectionException("Malformed message header (type=%d, length=%d)" % (msg_type, msg_len))
+				msg_end = start + HEADER_LEN + msg_len - 1
+				if msg_end > end:
+					#We don't have the entire message
+					break
+				if wanted == None or wanted[msg_type]:
+					packets.append(ELPacket(msg_type, view[start+HEADER_LEN:msg_end].tobytes()))
+					parsed_bytes[msg_type] += msg_len - 1
+				else:
+					skipped_bytes[msg_type] += msg_len - 1
+				start = msg_end
+		if start == end:
+			# Everything has been consumed, start over at the front of the buffer
+			self.start = self.end = 0
+		else:
+			self.start = start
+		return packets
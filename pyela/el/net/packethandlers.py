@@ -23,6 +23,8 @@ import struct
 from pyela.net.packethandlers import BasePacketHandler
 from pyela.el.net.elconstants import ELNetFromServer, ELNetToServer
 from pyela.el.net.packets import ELPacket
+from pyela.el.logic.eventmanagers import ELSimpleEventManager
+from pyela.el.logic.events import ELEventType, ACTORS_MOVED
 from pyela.el.net.parsers import ELAddActorMessageParser, \
 	ELAddActorCommandParser, ELRemoveActorMessageParser, \
 	ELGetActiveChannelsMessageParser, \
@@ -33,8 +35,58 @@ from pyela.el.net.parsers import ELAddActorMessageParser, \
 
 log = logging.getLogger('pyela.el.net.packethandlers')
 
+class DispatchTable(dict):
+	"""The message type: parser dict of a packet handler (its CALLBACKS).
+
+	Every change is mirrored into slots, a list with an entry for each of
+	the 256 message types, and into the handler's wanted flags, so that
+	dispatching a packet is a list index and unhandled types can be skipped
+	before a packet is created for them.
+	"""
+
+	def __init__(self, handler):
+		super(DispatchTable, self).__init__()
+		self.handler = handler
+		self.slots = [None] * 256
+
+	def __setitem__(self, type, parser):
+		super(DispatchTable, self).__setitem__(type, parser)
+		self.slots[type] = parser
+		self.handler._update_wanted(type)
+
+	def __delitem__(self, type):
+		super(DispatchTable, self).__delitem__(type)
+		self.slots[type] = None
+		self.handler._update_wanted(type)
+
+	def pop(self, type, *default):
+		had = type in self
+		parser = super(DispatchTable, self).pop(type, *default)
+		if had:
+			self.slots[type] = None
+			self.handler._update_wanted(type)
+		return parser
+
+	def clear(self):
+		types = list(self)
+		super(DispatchTable, self).clear()
+		for type in types:
+			self.slots[type] = None
+			self.handler._update_wanted(type)
+
 class BaseELPacketHandler(BasePacketHandler):
 	"""Defines base functionality for handling an ELConnection.
+
+	Parsers are registered by assigning them to CALLBACKS[message type].
+	Callables registered with add_raw_subscriber() get every ELPacket of a
+	message type before it's parsed. Message types that have neither are
+	never turned into ELPacket instances by the connection's framer.
+
+	Attributes:
+		connection	- the ELConnection that this packet handler handles packets for
+		CALLBACKS	- a DispatchTable of message type: parser
+		wanted		- a bytearray of 256 flags, 1 for each message type that has
+					  a parser or raw subscriber
 	"""
 
 	def __init__(self, connection):
@@ -44,37 +96,144 @@ class BaseELPacketHandler(BasePacketHandler):
 		"""
 		super(BaseELPacketHandler, self).__init__()
 		self.connection = connection
-		self.CALLBACKS = {}
+		self._wanted = bytearray(256)
+		self._raw_subscribers = [None] * 256 # message type: list of callables, or None
+		self.CALLBACKS = DispatchTable(self)
+
+	@property
+	def wanted(self):
+		return self._wanted
+
+	def _update_wanted(self, type):
+		self._wanted[type] = self.CALLBACKS.slots[type] != None or self._raw_subscribers[type] != None
+
+	def add_raw_subscriber(self, type, callback):
+		"""Call callback(packet) for each ELPacket of the given message type,
+		before it's parsed"""
+		if self._raw_subscribers[type] == None:
+			self._raw_subscribers[type] = []
+		self._raw_subscribers[type].append(callback)
+		self._update_wanted(type)
+
+	def remove_raw_subscriber(self, type, callback):
+		subscribers = self._raw_subscribers[type]
+		if subscribers != None and callback in subscribers:
+			subscribers.remove(callback)
+			if len(subscribers) == 0:
+				self._raw_subscribers[type] = None
+			self._update_wanted(type)
 
 	def process_packets(self, packets):
 		events = []
+		debug = log.isEnabledFor(logging.DEBUG)
+		slots = self.CALLBACKS.slots
+		raw_subscribers = self._raw_subscribers
 		for packet in packets:
-			log.debug("Message: %s?, %d, type=%s" % \
-				(ELNetFromServer.to_identifier(ELNetFromServer(), int(packet.type)), packet.type, type(packet)))
-			if packet.type in self.CALLBACKS:
-				events.extend(self.CALLBACKS[packet.type].parse(packet))
+			if debug: log.debug("Message: %s?, %d, type=%s" % \
+				(ELNetFromServer.name_of(packet.type), packet.type, type(packet)))
+			subscribers = raw_subscribers[packet.type]
+			if subscribers != None:
+				for callback in subscribers:
+					callback(packet)
+			parser = slots[packet.type]
+			if parser != None:
+				events.extend(parser.parse(packet))
 		return events
 
 ## ExtendedELPacketHandler is the same as above, except it has all the
 ## message parsers related to connection/session handling set up
 class ExtendedELPacketHandler(BaseELPacketHandler):
 	""" ExtendedELPacketHandler is the same as BaseELPacketHandler, except it
-	has all the message parsers related to session handling set up
+	has all the message parsers related to session handling set up.
+
+	Only the parsers that are needed are registered: those in STATE_PARSERS
+	always are, those in WORLD_PARSERS when track_world is True or a handler
+	of the event manager subscribes to one of WORLD_EVENTS, and those in
+	EVENT_PARSERS when a handler subscribes to their event. The parsers are
+	updated whenever a handler is added to the event manager.
+
+	Attributes:
+		track_world	- if True, keep track of the actors around us in
+					  session.actors even if no handler asks for their events
+		event_manager - the event manager whose handlers decide which
+					  parsers are needed; by default the connection's
 	"""
-	def __init__(self, connection):
+
+	# Parsers for the protocol and the session's own state
+	STATE_PARSERS = {
+		ELNetFromServer.YOU_ARE: ELYouAreParser,
+		ELNetFromServer.GET_ACTIVE_CHANNELS: ELGetActiveChannelsMessageParser,
+		ELNetFromServer.BUDDY_EVENT: ELBuddyEventMessageParser,
+		ELNetFromServer.LOG_IN_NOT_OK: ELLoginFailedParser,
+		ELNetFromServer.LOG_IN_OK: ELLoginOKParser,
+		ELNetFromServer.YOU_DONT_EXIST: ELYouDontExistParser,
+		ELNetFromServer.PING_REQUEST: ELPingRequestParser,
+		ELNetFromServer.NEW_MINUTE: ELNewMinuteParser,
+		ELNetFromServer.CHANGE_MAP: ELChangeMapParser,
+	}
+	# Parsers that keep session.actors up to date. They're registered or
+	# unregistered together, so that the actors stay consistent
+	WORLD_PARSERS = {
+		ELNetFromServer.ADD_NEW_ENHANCED_ACTOR: ELAddActorMessageParser,
+		ELNetFromServer.ADD_NEW_ACTOR: ELAddActorMessageParser,
+		ELNetFromServer.ADD_ACTOR_COMMAND: ELAddActorCommandParser,
+		ELNetFromServer.REMOVE_ACTOR: ELRemoveActorMessageParser,
+		ELNetFromServer.KILL_ALL_ACTORS: ELRemoveAllActorsParser,
+	}
+	# The events that need WORLD_PARSERS. YOU_ARE isn't one of them, its
+	# parser is in STATE_PARSERS
+	WORLD_EVENTS = (ELNetFromServer.ADD_NEW_ACTOR, ELNetFromServer.ADD_ACTOR_COMMAND, \
+		ELNetFromServer.REMOVE_ACTOR, ELNetFromServer.KILL_ALL_ACTORS, ACTORS_MOVED)
+	# Parsers that only raise an event, registered when it's subscribed to
+	EVENT_PARSERS = {
+		ELNetFromServer.RAW_TEXT: ELRawTextMessageParser,
+	}
+
+	def __init__(self, connection, track_world=False, event_manager=None):
 		super(ExtendedELPacketHandler, self).__init__(connection)
-		self.CALLBACKS[ELNetFromServer.RAW_TEXT] = ELRawTextMessageParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.ADD_NEW_ENHANCED_ACTOR] = ELAddActorMessageParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.ADD_NEW_ACTOR] = ELAddActorMessageParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.ADD_ACTOR_COMMAND] = ELAddActorCommandParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.REMOVE_ACTOR] = ELRemoveActorMessageParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.KILL_ALL_ACTORS] = ELRemoveAllActorsParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.YOU_ARE] = ELYouAreParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.GET_ACTIVE_CHANNELS] = ELGetActiveChannelsMessageParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.BUDDY_EVENT] = ELBuddyEventMessageParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.LOG_IN_NOT_OK] = ELLoginFailedParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.LOG_IN_OK] = ELLoginOKParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.YOU_DONT_EXIST] = ELYouDontExistParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.PING_REQUEST] = ELPingRequestParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.NEW_MINUTE] = ELNewMinuteParser(self.connection)
-		self.CALLBACKS[ELNetFromServer.CHANGE_MAP] = ELChangeMapParser(self.connection)
+		self.track_world = track_world
+		if event_manager == None:
+			if connection != None:
+				event_manager = connection.event_manager
+			else:
+				event_manager = ELSimpleEventManager()
+		self.event_manager = event_manager
+		self._generation = None
+		self._parsers = {} # message type: parser instance, for all the optional parsers
+		for type, parser in self.STATE_PARSERS.items():
+			self.CALLBACKS[type] = parser(self.connection)
+		self.update_parsers()
+
+	@property
+	def wanted(self):
+		if self._generation != self.event_manager.generation:
+			self.update_parsers()
+		return self._wanted
+
+	def process_packets(self, packets):
+		if self._generation != self.event_manager.generation:
+			self.update_parsers()
+		return super(ExtendedELPacketHandler, self).process_packets(packets)
+
+	def update_parsers(self):
+		"""Register the optional parsers that are needed by the event manager's
+		handlers, and unregister the rest"""
+		em = self.event_manager
+		world = self.track_world or any(em.is_handled(ELEventType(t)) for t in self.WORLD_EVENTS)
+		for type, parser in self.WORLD_PARSERS.items():
+			self.__set_parser(type, parser, world)
+		for type, parser in self.EVENT_PARSERS.items():
+			self.__set_parser(type, parser, em.is_handled(ELEventType(type)))
+		self._generation = em.generation
+
+	def __set_parser(self, type, parser, needed):
+		current = self.CALLBACKS.get(type)
+		if current != None and current is not self._parsers.get(type):
+			# Registered by someone else, leave it alone
+			return
+		if needed and current == None:
+			if type not in self._parsers:
+				self._parsers[type] = parser(self.connection)
+			self.CALLBACKS[type] = self._parsers[type]
+		elif not needed and current != None:
+			del self.CALLBACKS[type]
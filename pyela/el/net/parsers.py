@@ -24,16 +24,26 @@ import logging
 import struct
 import time
 
-from pyela.el.common.actors import ELActor
-from pyela.el.util.strings import strip_chars, split_str, is_colour, el_colour_to_rgb, bytes_find, bytes_rfind
+from pyela.el.common.actors import ELActor, MOVES
+from pyela.el.util.strings import strip_chars, split_str, split_colours, el_colour_to_rgb
 from pyela.el.net.packets import ELPacket
 from pyela.el.net.elconstants import ELNetFromServer, ELNetToServer, ELConstants
 from pyela.el.net.channel import Channel
-from pyela.el.logic.eventmanagers import ELSimpleEventManager
-from pyela.el.logic.events import ELEventType, ELEvent
+from pyela.el.net.schema import FROM_SERVER
+from pyela.el.logic.events import ELEventType, ELEvent, ACTORS_MOVED, ConnectionData, RawTextData, \
+	RemoveActorData, ActorCommandData, ActorsMovedData, ActiveChannelsData, BuddyData, LoginFailedData, \
+	NewMinuteData, ChangeMapData
 
 log = logging.getLogger('pyela.el.net.parsers')
-em = ELSimpleEventManager()
+
+NEW_ACTOR = FROM_SERVER[ELNetFromServer.ADD_NEW_ACTOR]
+ENHANCED_ACTOR = FROM_SERVER[ELNetFromServer.ADD_NEW_ENHANCED_ACTOR]
+ACTOR_COMMAND = FROM_SERVER[ELNetFromServer.ADD_ACTOR_COMMAND]
+REMOVE_ACTOR = FROM_SERVER[ELNetFromServer.REMOVE_ACTOR]
+YOU_ARE = FROM_SERVER[ELNetFromServer.YOU_ARE]
+ACTIVE_CHANNELS = FROM_SERVER[ELNetFromServer.GET_ACTIVE_CHANNELS]
+ACTOR_SCALE = struct.Struct('<H')
+NEW_MINUTE = FROM_SERVER[ELNetFromServer.NEW_MINUTE]
 
 class MessageParser(object):
 	"""A message received from the Eternal Lands server"""
@@ -49,67 +59,92 @@ class MessageParser(object):
 		pass
 
 class ELRawTextMessageParser(MessageParser):
-	"""Parses RAW_TEXT messages"""
+	"""Parses RAW_TEXT messages. Messages that none of the handlers' text
+	filters match don't become events"""
 	def parse(self, packet):
-		event = ELEvent(ELEventType(ELNetFromServer.RAW_TEXT))
-		event.data = {}
-		event.data['connection'] = self.connection #The connection the message origins from
-		event.data['channel'] = packet.data[0] # The channel of the message
-		event.data['text'] = strip_chars(packet.data[1:]) # The stripped text of the message, no colour codes, special characters translated to utf8
-		event.data['raw'] = packet.data[1:] # The raw text including colour codes and untranslated special characters
-		return [event]
+		channel = packet.data[0]
+		raw = packet.data[1:]
+		if not self.connection.event_manager.wants_text(channel, raw):
+			return []
+		# The text is stripped of colour codes, with special characters translated to utf8.
+		# The raw text includes colour codes and untranslated special characters
+		return [ELEvent(ELEventType(ELNetFromServer.RAW_TEXT), RawTextData(self.connection, channel, strip_chars(raw), raw))]
+
+# The name, guild and name colour parsed from the raw names of actors, as
+# names repeat all session. Cleared when it reaches ACTOR_NAME_CACHE_SIZE
+actor_names = {}
+ACTOR_NAME_CACHE_SIZE = 4096
+
+def parse_actor_name(raw_name):
+	"""Returns (name, guild, name colour) for the raw name (bytes) of an actor.
+	guild is None if the name has no guild tag, the colour is None if the
+	name doesn't start with a colour code"""
+	parsed = actor_names.get(raw_name)
+	if parsed != None:
+		return parsed
+	runs = split_colours(raw_name)
+	name = ''.join(text for c, text in runs)
+	#The name's colour is that of the colour code(s) it starts with
+	colour = None
+	if runs and runs[0][0] != None:
+		colour = el_colour_to_rgb(runs[0][0])
+	#The guild tag is the last word, with a colour code of its own
+	guild = None
+	if len(runs) > 1 and runs[-1][0] != None and ' ' not in runs[-1][1] and runs[-2][1].endswith(' '):
+		# split the name into playername and guild
+		tokens = name.rsplit(' ', 1)
+		if len(tokens) == 2 and tokens[0]:
+			name, guild = tokens
+	if len(actor_names) >= ACTOR_NAME_CACHE_SIZE:
+		actor_names.clear()
+	parsed = actor_names[raw_name] = (name, guild, colour)
+	return parsed
 
 class ELAddActorMessageParser(MessageParser):
 	def parse(self, packet):
 		"""Parse an ADD_NEW_(ENHANCED)_ACTOR message"""
 		if log.isEnabledFor(logging.DEBUG): log.debug("New actor: %s" % packet)
 		actor = ELActor()
-		actor.id, actor.x_pos, actor.y_pos, actor.z_pos, \
-		actor.z_rot, actor.type, frame, actor.max_health, \
-		actor.cur_health, actor.kind_of_actor \
-		= struct.unpack('<HHHHHBBHHB', packet.data[:17])
+		data = packet.data
+		enhanced = packet.type == ELNetFromServer.ADD_NEW_ENHANCED_ACTOR
+		if enhanced:
+			#For some reason, data[11] is unused in the ENHANCED message
+			actor.id, x_pos, y_pos, actor.z_pos, \
+			actor.z_rot, actor.type, unused, actor.skin, actor.hair, actor.shirt, actor.pants, \
+			actor.boots, actor.cape, actor.head, actor.shield, actor.weapon, actor.helmet, frame, \
+			actor.max_health, actor.cur_health, actor.kind_of_actor \
+			= ENHANCED_ACTOR.decode(data)
+			offset = ENHANCED_ACTOR.size
+		else:
+			actor.id, x_pos, y_pos, actor.z_pos, \
+			actor.z_rot, actor.type, frame, actor.max_health, \
+			actor.cur_health, actor.kind_of_actor \
+			= NEW_ACTOR.decode(data)
+			offset = NEW_ACTOR.size
 		events = []
 
 		#Remove the buffs from the x/y coordinates
-		actor.x_pos = actor.x_pos & 0x7FF
-		actor.y_pos = actor.y_pos & 0x7FF
+		actor.x_pos = x_pos & 0x7FF
+		actor.y_pos = y_pos & 0x7FF
 
-		if packet.type == ELNetFromServer.ADD_NEW_ENHANCED_ACTOR:
-			actor.name = packet.data[28:]
-			frame = packet.data[22] #For some reason, data[11] is unused in the ENHANCED message
-			actor.kind_of_actor = packet.data[27]
-		else:
-			actor.name = packet.data[17:]
-		
 		#The end of name is a \0, and there _might_ be two OR three more bytes
-		# containing actor-scale info.
-		name_end = bytes_find(actor.name, 0)
-		if name_end < len(actor.name)-2:
-			#There are two OR three more bytes after the name,
-			# the actor scaling bytes and possibly the attachment type
-			unpacked = struct.unpack('<H', actor.name[name_end+1:name_end+3])
-			actor.scale = unpacked[0]
-			#actor.scale = float(scale)/ELConstants.ACTOR_SCALE_BASE
-			if len(actor.name) > name_end+3:
-				pass
-				#TODO: The actor class has no attachment_type member (yet)
-				#      The below code is tested and extracts the correct information
-				#actor.attachment_type = struct.unpack('B', actor.name[name_end+3])[0]
-				#if actor.attachment_type > 0 and actor.attachment_type < 255:
-				#	##ON A HORSE!!
-				#else:
-				#	actor.attachment_type = 0 # The server sends either 255 or 0 if we're not on a horse
-			actor.name = actor.name[:name_end]
+		# containing actor-scale info and the attachment type
+		name_end = data.find(b'\0', offset)
+		if name_end == -1:
+			raw_name = data[offset:]
 		else:
-			actor.scale = 1
-			actor.name = actor.name[:-1]
+			raw_name = data[offset:name_end]
+			if len(data) >= name_end+3:
+				actor.scale = ACTOR_SCALE.unpack_from(data, name_end+1)[0]
+				#actor.scale = float(scale)/ELConstants.ACTOR_SCALE_BASE
+				if len(data) > name_end+3 and data[name_end+3] < 255:
+					# The server sends either 255 or 0 if we're not on a horse
+					actor.attachment_type = data[name_end+3]
 
-		#Find the actor's name's colour char
-		i = 0
-		while i < len(actor.name) and is_colour(actor.name[i]):
-			actor.name_colour = el_colour_to_rgb(actor.name[i])
-			i += 1
-		if actor.name_colour[0] == -1:
+		actor.name, actor.guild, colour = parse_actor_name(raw_name)
+		if colour != None:
+			actor.name_colour = colour
+		else:
 			#We didn't find any colour codes, use kind_of_actor
 			if actor.kind_of_actor == ELConstants.NPC:
 				#NPC, bluish
@@ -118,24 +153,13 @@ class ELAddActorMessageParser(MessageParser):
 			elif actor.kind_of_actor in (ELConstants.HUMAN, ELConstants.COMPUTER_CONTROLLED_HUMAN):
 				#Regular player, white
 				actor.name_colour = (1.0, 1.0, 1.0)
-			elif packet.type == ELNetFromServer.ADD_NEW_ENHANCED_ACTOR and actor.kind_of_actor in (ELConstants.PKABLE_HUMAN, ELConstants.PKABLE_COMPUTER_CONTROLLED):
+			elif enhanced and actor.kind_of_actor in (ELConstants.PKABLE_HUMAN, ELConstants.PKABLE_COMPUTER_CONTROLLED):
 				#PKable player, red
 				actor.name_colour = (1.0, 0.0, 0.0)
 			else:
 				#Animal, yellow
 				actor.name_colour = (1.0, 1.0, 0.0)
 
-		space = bytes_rfind(actor.name, ord(' '))
-		if space != -1 and space > 0 and space+1 < len(actor.name) and is_colour(actor.name[space+1]):
-			actor.name = strip_chars(actor.name)
-			if log.isEnabledFor(logging.DEBUG): log.debug("Actor has a guild. Parsing from '%s'" % actor.name)
-			# split the name into playername and guild
-			tokens = actor.name.rsplit(' ', 1)
-			actor.name = tokens[0]
-			actor.guild = tokens[1]
-		else:
-			actor.name = strip_chars(actor.name)
-		
 		#Deal with the current frame of the actor
 		if frame in (ELConstants.FRAME_DIE1, ELConstants.FRAME_DIE2):
 			actor.dead = True
@@ -147,6 +171,7 @@ class ELAddActorMessageParser(MessageParser):
 			actor.fighting = True
 
 		self.connection.session.actors[actor.id] = actor
+		self.connection.session.resync.actor_added()
 		
 		event = ELEvent(ELEventType(ELNetFromServer.ADD_NEW_ACTOR))
 		event.data = actor #TODO: add connection to event data
@@ -164,67 +189,84 @@ class ELAddActorMessageParser(MessageParser):
 
 class ELRemoveActorMessageParser(MessageParser):
 	def _get_ids(data):
-		offset = 0
-		while offset < len(data):
-			yield struct.unpack_from('<H', data, offset)[0]
-			offset += 2
+		return (actor_id for actor_id, in REMOVE_ACTOR.decode_all(data))
 	_get_ids = staticmethod(_get_ids)
 
 	def parse(self, packet):
-		"""Remove actor packet. Remove from self.connection.session.actors dict"""
+		"""Remove actor packet. Remove from self.connection.session.actors dict.
+		Returns a REMOVE_ACTOR event for each of the actors removed"""
 		if log.isEnabledFor(logging.DEBUG): log.debug("Remove actor packet: '%s'" % packet.data)
 		if log.isEnabledFor(logging.DEBUG): log.debug("Actors: %s" % self.connection.session.actors)
+		events = []
+		session = self.connection.session
 		for actor_id in self._get_ids(packet.data):
-			event = ELEvent(ELEventType(ELNetFromServer.REMOVE_ACTOR))
-			event.data = {}
-			event.data['connection'] = self.connection
-			event.data['id'] = actor_id
-			event.data['actor'] = self.connection.session.actors[actor_id]
-			if actor_id in self.connection.session.actors:
-				del self.connection.session.actors[actor_id]
-			if actor_id == self.connection.session.own_actor_id:
-				self.connection.session.own_actor_id = -1
-				self.connection.session.own_actor = None
-		return [event]
+			actor = session.actors.pop(actor_id, None)
+			if actor == None:
+				if log.isEnabledFor(logging.DEBUG): log.debug("Removing unknown actor %d" % actor_id)
+				continue
+			events.append(ELEvent(ELEventType(ELNetFromServer.REMOVE_ACTOR), RemoveActorData(self.connection, actor_id, actor)))
+			if actor_id == session.own_actor_id:
+				session.own_actor_id = -1
+				session.own_actor = None
+		return events
 
 class ELRemoveAllActorsParser(MessageParser):
 	def parse(self, packet):
-		event = ELEvent(ELEventType(ELNetFromServer.KILL_ALL_ACTORS))
-		event.data = {'connection': self.connection} # The full actors list can be added to the event data if it's required
+		event = ELEvent(ELEventType(ELNetFromServer.KILL_ALL_ACTORS), ConnectionData(self.connection)) # The full actors list can be added to the event data if it's required
 		
 		self.connection.session.actors = {}
+		self.connection.session.resync.actors_cleared()
 		if log.isEnabledFor(logging.DEBUG): log.debug("Remove all actors packet")
 		return [event]
 
 class ELAddActorCommandParser(MessageParser):
-	def _get_commands(data):
-		offset = 0
-		while offset < len(data):
-			yield struct.unpack_from('<HB', data, offset)
-			offset += 3
-	_get_commands = staticmethod(_get_commands)
+	"""Parse the ADD_ACTOR_COMMAND message, a list of (actor id, command).
+
+	The commands are applied to the actors in one pass. A single ACTORS_MOVED
+	event lists the actors that moved or turned; an ADD_ACTOR_COMMAND event
+	per command is only raised if a handler subscribed to it.
+	"""
+	COMMAND_EVENT_TYPE = ELEventType(ELNetFromServer.ADD_ACTOR_COMMAND)
+	MOVED_EVENT_TYPE = ELEventType(ACTORS_MOVED)
 
 	def parse(self, packet):
 		events = []
 		if log.isEnabledFor(logging.DEBUG): log.debug("Actor command packet: '%s'" % packet.data)
-		for actor_id, command in self._get_commands(packet.data):
-			if actor_id in self.connection.session.actors:
-				self.connection.session.actors[actor_id].handle_command(command)
-	
-				event = ELEvent(ELEventType(ELNetFromServer.ADD_ACTOR_COMMAND))
-				event.data = {'actor': self.connection.session.actors[actor_id], 'command': command, 'connection': self.connection}
-				events.append(event)
+		actors = self.connection.session.actors
+		per_command = self.connection.event_manager.is_handled(self.COMMAND_EVENT_TYPE)
+		moved = {} # actor id: actor, for the actors that moved or turned
+		missing = False
+		for actor_id, command in ACTOR_COMMAND.decode_all(packet.data):
+			actor = actors.get(actor_id)
+			if actor == None:
+				missing = True
+				continue
+			move = MOVES[command]
+			if move != None:
+				actor.x_pos += move[0]
+				actor.y_pos += move[1]
+				actor.z_rot = move[2]
+				moved[actor_id] = actor
 			else:
-				#The actor could not be found. Something strange has happened.
-				#Request a new list of nearby actors from the server (resync).
-				#TODO: Log?
-				self.connection.send(ELPacket(ELNetToServer.SEND_ME_MY_ACTORS, None))
+				actor.handle_command(command)
+				if command in (ELConstants.TURN_LEFT, ELConstants.TURN_RIGHT):
+					moved[actor_id] = actor
+			if per_command:
+				events.append(ELEvent(self.COMMAND_EVENT_TYPE, ActorCommandData(self.connection, actor, command)))
+		if moved:
+			events.append(ELEvent(self.MOVED_EVENT_TYPE, ActorsMovedData(self.connection, list(moved.values()))))
+		if missing:
+			#At least one actor could not be found. Something strange has happened.
+			#Request a new list of nearby actors from the server (resync),
+			#unless we're already waiting for one
+			if self.connection.session.resync.request(self.connection):
+				log.info("Unknown actor in ADD_ACTOR_COMMAND, requested the actors list")
 		return events
 
 class ELYouAreParser(MessageParser):
 	def parse(self, packet):
 		if log.isEnabledFor(logging.DEBUG): log.debug("YouAre packet: '%s'" % packet.data)
-		id = struct.unpack('<H', packet.data)[0]
+		id = YOU_ARE.decode(packet.data)[0]
 		self.connection.session.own_actor_id = id
 		if id in self.connection.session.actors:
 			self.connection.session.own_actor = self.connection.session.actors[id]
@@ -239,7 +281,7 @@ class ELGetActiveChannelsMessageParser(MessageParser):
 	def parse(self, packet):
 		del self.connection.session.channels[:]
 		#Message structure: Active channel (1, 2 or 3), channel 1, channel 2, channel 3
-		chans = struct.unpack('<BIIII', packet.data)
+		chans = ACTIVE_CHANNELS.decode(packet.data)
 		i = 0
 		active = chans[0]
 		for c in chans[1:]:
@@ -247,54 +289,43 @@ class ELGetActiveChannelsMessageParser(MessageParser):
 				self.connection.session.channels.append(Channel(self.connection, c, i == active))
 			i += 1
 		#Event to notify about the change in the channel list
-		event = ELEvent(ELEventType(ELNetFromServer.GET_ACTIVE_CHANNELS))
-		event.data = {'connection': self.connection, 'channels': self.connection.session.channels}
+		event = ELEvent(ELEventType(ELNetFromServer.GET_ACTIVE_CHANNELS), \
+			ActiveChannelsData(self.connection, self.connection.session.channels))
 		return [event]
 
 class ELBuddyEventMessageParser(MessageParser):
 	"""Parse the BUDDY_EVENT message"""
 	def parse(self, packet):
 		change = packet.data[0]# 1 is online, 0 offline
-		event = ELEvent(ELEventType(ELNetFromServer.BUDDY_EVENT))
-		event.data = {}
 		if change == 1:
 			#Buddy came online
 			buddy = str(strip_chars(packet.data[2:]))
 			self.connection.session.buddies.append(buddy)
-			event.data['event'] = 'online'
+			change = 'online'
 		else:
 			#Buddy went offline
 			buddy = str(strip_chars(packet.data[1:]))
 			self.connection.session.buddies.remove(buddy)
-			event.data['event'] = 'offline'
-		event.data['name'] = buddy
-		event.data['connection'] = self.connection
-		return [event]
+			change = 'offline'
+		return [ELEvent(ELEventType(ELNetFromServer.BUDDY_EVENT), BuddyData(self.connection, change, buddy))]
 
 class ELLoginFailedParser(MessageParser):
 	"""Parse the LOG_IN_NOT_OK message"""
 	def parse(self, packet):
-		event = ELEvent(ELEventType(ELNetFromServer.LOG_IN_NOT_OK))
-		event.data = {}
-		event.data['text'] = strip_chars(packet.data)
-		event.data['raw'] = packet.data
-		event.data['connection'] = self.connection
+		event = ELEvent(ELEventType(ELNetFromServer.LOG_IN_NOT_OK), \
+			LoginFailedData(self.connection, strip_chars(packet.data), packet.data))
 		return [event]
 
 class ELYouDontExistParser(MessageParser):
 	"""Parse the YOU_DONT_EXIST message"""
 	def parse(self, packet):
-		event = ELEvent(ELEventType(ELNetFromServer.YOU_DONT_EXIST))
-		event.data = {}
-		event.data['connection'] = self.connection
+		event = ELEvent(ELEventType(ELNetFromServer.YOU_DONT_EXIST), ConnectionData(self.connection))
 		return[event]
 
 class ELLoginOKParser(MessageParser):
 	"""Parse the LOG_IN_OK message"""
 	def parse(self, packet):
-		event = ELEvent(ELEventType(ELNetFromServer.LOG_IN_OK))
-		event.data = {}
-		event.data['connection'] = self.connection
+		event = ELEvent(ELEventType(ELNetFromServer.LOG_IN_OK), ConnectionData(self.connection))
 		self.connection.con_tries = 0
 		return [event]
 
@@ -312,19 +343,13 @@ class ELNewMinuteParser(MessageParser):
 		if len(packet.data) != 2:
 			#TODO: Invalid message
 			return []
-		self.connection.session.game_time = struct.unpack('<H', packet.data)[0]
+		self.connection.session.game_time = NEW_MINUTE.decode(packet.data)[0]
 		self.connection.session.game_time %= 360 #Clamp to six-hour time
-		event = ELEvent(ELEventType(ELNetFromServer.NEW_MINUTE))
-		event.data = {}
-		event.data['connection'] = self.connection
-		event.data['time'] = self.connection.session.game_time
+		event = ELEvent(ELEventType(ELNetFromServer.NEW_MINUTE), NewMinuteData(self.connection, self.connection.session.game_time))
 		return [event]
 
 class ELChangeMapParser(MessageParser):
 	def parse(self, packet):
 		self.connection.session.current_map = packet.data
-		event = ELEvent(ELEventType(ELNetFromServer.CHANGE_MAP))
-		event.data = {}
-		event.data['connection'] = self.connection
-		event.data['map'] = self.connection.session.current_map
+		event = ELEvent(ELEventType(ELNetFromServer.CHANGE_MAP), ChangeMapData(self.connection, self.connection.session.current_map))
 		return [event]
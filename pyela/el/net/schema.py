@@ -0,0 +1,139 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""The layouts of the EL messages, described once.
+
+Each MessageLayout is built from a list of (field name, struct format)
+pairs, compiled into a single struct.Struct when the module is loaded.
+Messages made of a repeated record, like ADD_ACTOR_COMMAND, use the
+record's layout with decode_all().
+
+To support a new message, add its layout to FROM_SERVER or TO_SERVER:
+	FROM_SERVER[ELNetFromServer.SOME_MESSAGE] = MessageLayout(
+		ELNetFromServer.SOME_MESSAGE, [('id', 'H'), ('flags', 'B')], tail='name')
+"""
+
+import struct
+
+from pyela.el.net.elconstants import ELNetFromServer, ELNetToServer
+from pyela.el.net.packets import ELPacket
+
+class MessageLayout(object):
+	"""The layout of an EL message: fixed-size fields, all little endian,
+	optionally followed by a variable-length tail of bytes.
+
+	Attributes:
+		type	- the message type
+		names	- a tuple with the names of the fixed-size fields, in order
+		struct	- the compiled struct.Struct of the fixed-size fields
+		size	- the size in bytes of the fixed-size fields
+		tail	- None, or the name of the bytes following the fixed-size fields
+		decode	- decode(data, offset=0) returns a tuple with the fixed-size fields
+				  of the message in the bytes-like object data, starting at offset.
+				  It's the struct's own unpack_from, so it costs no extra call
+	"""
+
+	def __init__(self, type, fields, tail=None):
+		self.type = type
+		self.names = tuple(name for name, fmt in fields)
+		self.struct = struct.Struct('<' + ''.join(fmt for name, fmt in fields))
+		self.size = self.struct.size
+		self.tail = tail
+		self.decode = self.struct.unpack_from
+
+	def decode_dict(self, data, offset=0):
+		"""Returns a dict of field name: value for the message in data,
+		including the tail if the layout has one"""
+		fields = dict(zip(self.names, self.struct.unpack_from(data, offset)))
+		if self.tail != None:
+			fields[self.tail] = bytes(data[offset+self.size:])
+		return fields
+
+	def decode_all(self, data):
+		"""Returns an iterator over the tuples of a message that is a
+		sequence of records with this layout. Trailing bytes that don't
+		make up a whole record are ignored"""
+		extra = len(data) % self.size
+		if extra:
+			data = memoryview(data)[:len(data) - extra]
+		return self.struct.iter_unpack(data)
+
+	def encode(self, *values, tail=b''):
+		"""Returns the payload, as bytes, of a message with the given field
+		values, followed by tail"""
+		if not tail:
+			return self.struct.pack(*values)
+		buffer = bytearray(self.size + len(tail))
+		self.struct.pack_into(buffer, 0, *values)
+		buffer[self.size:] = tail
+		return bytes(buffer)
+
+	def pack_into(self, buffer, offset, *values):
+		"""Write the field values into the writable buffer at offset.
+		Returns the offset following the fields"""
+		self.struct.pack_into(buffer, offset, *values)
+		return offset + self.size
+
+	def packet(self, *values, tail=b''):
+		"""Returns an ELPacket of this message type with the given field values"""
+		return ELPacket(self.type, self.encode(*values, tail=tail))
+
+	def __str__(self):
+		return "MessageLayout: %s %s" % (self.type, self.names)
+
+# Messages sent to the client by the server
+FROM_SERVER = {
+	ELNetFromServer.RAW_TEXT: MessageLayout(ELNetFromServer.RAW_TEXT, \
+		[('channel', 'B')], tail='text'),
+	ELNetFromServer.ADD_NEW_ACTOR: MessageLayout(ELNetFromServer.ADD_NEW_ACTOR, \
+		[('id', 'H'), ('x_pos', 'H'), ('y_pos', 'H'), ('z_pos', 'H'), ('z_rot', 'H'), \
+		('type', 'B'), ('frame', 'B'), ('max_health', 'H'), ('cur_health', 'H'), \
+		('kind_of_actor', 'B')], tail='name'),
+	ELNetFromServer.ADD_NEW_ENHANCED_ACTOR: MessageLayout(ELNetFromServer.ADD_NEW_ENHANCED_ACTOR, \
+		[('id', 'H'), ('x_pos', 'H'), ('y_pos', 'H'), ('z_pos', 'H'), ('z_rot', 'H'), \
+		('type', 'B'), ('unused', 'B'), ('skin', 'B'), ('hair', 'B'), ('shirt', 'B'), \
+		('pants', 'B'), ('boots', 'B'), ('cape', 'B'), ('head', 'B'), ('shield', 'B'), \
+		('weapon', 'B'), ('helmet', 'B'), ('frame', 'B'), ('max_health', 'H'), \
+		('cur_health', 'H'), ('kind_of_actor', 'B')], tail='name'),
+	# A sequence of (actor id, command) records
+	ELNetFromServer.ADD_ACTOR_COMMAND: MessageLayout(ELNetFromServer.ADD_ACTOR_COMMAND, \
+		[('id', 'H'), ('command', 'B')]),
+	# A sequence of actor ids
+	ELNetFromServer.REMOVE_ACTOR: MessageLayout(ELNetFromServer.REMOVE_ACTOR, \
+		[('id', 'H')]),
+	ELNetFromServer.YOU_ARE: MessageLayout(ELNetFromServer.YOU_ARE, \
+		[('id', 'H')]),
+	ELNetFromServer.NEW_MINUTE: MessageLayout(ELNetFromServer.NEW_MINUTE, \
+		[('minute', 'H')]),
+	ELNetFromServer.GET_ACTIVE_CHANNELS: MessageLayout(ELNetFromServer.GET_ACTIVE_CHANNELS, \
+		[('active', 'B'), ('channel1', 'I'), ('channel2', 'I'), ('channel3', 'I'), ('channel4', 'I')]),
+	ELNetFromServer.BUDDY_EVENT: MessageLayout(ELNetFromServer.BUDDY_EVENT, \
+		[('online', 'B')], tail='name'),
+}
+
+# Messages sent to the server by the client
+TO_SERVER = {
+	ELNetToServer.RAW_TEXT: MessageLayout(ELNetToServer.RAW_TEXT, [], tail='text'),
+	ELNetToServer.MOVE_TO: MessageLayout(ELNetToServer.MOVE_TO, [('x', 'H'), ('y', 'H')]),
+	ELNetToServer.SEND_PM: MessageLayout(ELNetToServer.SEND_PM, [], tail='text'),
+	ELNetToServer.SIT_DOWN: MessageLayout(ELNetToServer.SIT_DOWN, [('sit', 'B')]),
+	ELNetToServer.SEND_ME_MY_ACTORS: MessageLayout(ELNetToServer.SEND_ME_MY_ACTORS, []),
+	ELNetToServer.HEART_BEAT: MessageLayout(ELNetToServer.HEART_BEAT, []),
+	ELNetToServer.PING_RESPONSE: MessageLayout(ELNetToServer.PING_RESPONSE, [], tail='data'),
+	ELNetToServer.SET_ACTIVE_CHANNEL: MessageLayout(ELNetToServer.SET_ACTIVE_CHANNEL, [('channel', 'B')]),
+	ELNetToServer.LOG_IN: MessageLayout(ELNetToServer.LOG_IN, [], tail='credentials'),
+	ELNetToServer.BYE: MessageLayout(ELNetToServer.BYE, []),
+}
@@ -17,6 +17,9 @@
 # 
 # You should have received a copy of the GNU General Public License
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+import codecs
+import re
+
 from pyela.el.net.elconstants import ELConstants
 
 def is_colour(ch):
@@ -68,33 +71,120 @@ def char_to_special_char(ch):
 	#else:
 	#	return None
 
+# The bytes strip_chars() removes: NUL, colour codes and the non-ascii bytes
+# that aren't special characters
+STRIP_TABLE = bytes(b for b in range(256) if not (0 < b < 127 or \
+	ELConstants.SPECIALCHAR_LBOUND < b <= ELConstants.SPECIALCHAR_UBOUND))
+
+# The characters that can be sent as EL text: ascii, and the special
+# characters, which use their iso8859-1 value
+EL_ENCODING_MAP = codecs.charmap_build(''.join(
+	chr(b) if b < 127 or ELConstants.SPECIALCHAR_LBOUND < b <= ELConstants.SPECIALCHAR_UBOUND else '\ufffe' \
+	for b in range(256)))
+
 def strip_chars(s):
-	"""Remove protocol and control characters from the given string"""
-	stripped_str = ""
-
-	for char in s:
-		if not is_colour(char):
-			if is_special_char(char):
-				stripped_str += special_char_to_char(char)
-			elif char < 127 and char > 0:
-				# Skip non-ascii characters
-				stripped_str += str(chr(char))
-	return stripped_str
+	"""Remove protocol and control characters from the given bytes-like object,
+	and return it as a string"""
+	return s.translate(None, STRIP_TABLE).decode('iso8859')
 
 def str_to_el_str(s):
-	"""Convert the special characters in a string to EL format and discard invalid characters"""
-	out_str = bytearray()
-	for char in s:
-		if ord(char) > 127:
-			elch = char_to_special_char(char)
-			if elch != None:
-				out_str.append(ord(elch))
-		else:
-			out_str += char.encode('ascii', 'replace')
-	return out_str
+	"""Convert the special characters in a string to EL format and replace invalid characters with '?'"""
+	return bytearray(s.encode('el', 'replace'))
+
+def el_encode(input, errors='strict'):
+	return codecs.charmap_encode(input, errors, EL_ENCODING_MAP)
+
+def el_decode(input, errors='strict'):
+	return (bytes(input).translate(None, STRIP_TABLE).decode('iso8859'), len(input))
+
+class ELIncrementalEncoder(codecs.IncrementalEncoder):
+	def encode(self, input, final=False):
+		return el_encode(input, self.errors)[0]
+
+class ELIncrementalDecoder(codecs.IncrementalDecoder):
+	def decode(self, input, final=False):
+		return el_decode(input, self.errors)[0]
+
+def el_codec_search(name):
+	"""The 'el' codec: decoding drops colour codes and other protocol bytes
+	like strip_chars(), encoding maps a string to EL text like str_to_el_str()"""
+	if name != 'el':
+		return None
+	return codecs.CodecInfo(el_encode, el_decode, name='el', \
+		incrementalencoder=ELIncrementalEncoder, incrementaldecoder=ELIncrementalDecoder)
+
+codecs.register(el_codec_search)
+
+# A run of colour codes (possibly empty), followed by the text they apply to
+COLOUR_RUN = re.compile(b'([%c-%c]*)([^%c-%c]*)' % ((127+ELConstants.C_LBOUND, 127+ELConstants.C_UBOUND) * 2))
+
+def split_colours(s):
+	"""Split the raw EL text s (a bytes-like object) into a list of
+	(colour, text) tuples. colour is the ELConstants.C_* value of the colour
+	code preceding the text, or None for text before the first colour code.
+	text is decoded like strip_chars(); runs that end up empty are left out"""
+	runs = []
+	for codes, text in COLOUR_RUN.findall(s):
+		if text:
+			text = text.translate(None, STRIP_TABLE).decode('iso8859')
+			if text:
+				runs.append((codes[-1] - 127 if codes else None, text))
+	return runs
+
+# The longest text sent in a single RAW_TEXT or SEND_PM message
+MAX_TEXT_LEN = 157
+
+COLOUR_CODE = re.compile(b'[%c-%c]' % (127+ELConstants.C_LBOUND, 127+ELConstants.C_UBOUND))
+
+def pack_text(items, max_len=MAX_TEXT_LEN, separator=', ', prefix=b''):
+	"""A generator of the payloads, as bytes, of the messages needed to send
+	the list of items as text, each at most max_len bytes long.
+		items - an iterable of str or EL-encoded bytes
+		separator - put between two items
+		prefix - EL-encoded bytes to start every message with, like the
+			recipient's name and a space for SEND_PM. Counts towards max_len
+
+	Messages are split after the last whole item that fits, or else after
+	the last whole word, or else after max_len bytes. The separator or space
+	at the split is left out. The colour code in effect at the end of a
+	message is repeated at the start of the next one"""
+	if max_len <= len(prefix) + 1:
+		raise ValueError("max_len leaves no room for the text")
+	items = list(items)
+	if isinstance(separator, str) and all(isinstance(item, str) for item in items):
+		# Encode everything in one go
+		text = separator.join(items).encode('el', 'replace')
+		separator = separator.encode('el', 'replace')
+	else:
+		if isinstance(separator, str):
+			separator = separator.encode('el', 'replace')
+		text = separator.join(item.encode('el', 'replace') if isinstance(item, str) else item for item in items)
+	colour = b''
+	pos = 0
+	end = len(text)
+	while pos < end:
+		room = max_len - len(prefix) - len(colour)
+		if end - pos <= room:
+			yield prefix + colour + text[pos:]
+			return
+		cut = text.rfind(separator, pos + 1, pos + room + len(separator))
+		skip = len(separator)
+		if cut <= pos:
+			cut = text.rfind(b' ', pos + 1, pos + room + 1)
+			skip = 1
+			if cut <= pos:
+				cut = pos + room
+				skip = 0
+		part = text[pos:cut]
+		yield prefix + colour + part
+		codes = COLOUR_CODE.findall(part)
+		if codes:
+			colour = codes[-1]
+		pos = cut + skip
 
 def split_str(str, max_len):
-	"""Split the given string into a list of strings small enough for RAW_TEXT messages
+	"""Split the given string into a list of strings small enough for RAW_TEXT messages.
+	See pack_text() for splitting between words
 		str - the string to split
 		max_len - the maximum length of any given string
 	"""
@@ -41,6 +41,7 @@ class BaseEvent(object):
 	"""Represents an action or occurance of actions within the framework.
 	Used in an event-driven manner within the PacketHandlers
 	"""
+	__slots__ = ()
 
 	def __init__(self):
 		"""Construct a basic event object with the optional 
@@ -52,40 +53,101 @@ class BaseEvent(object):
 		pass
 
 
+class EventData(object):
+	"""The base class of event payloads (event.data). Each subclass lists its
+	fields in __slots__ and sets all of them in its constructor, so a payload
+	takes less memory and less time to make than the dict it replaces.
+
+	Payloads can still be used like a read-only dict of their fields:
+	data['connection'], 'connection' in data, data.get(), keys() and items()
+	all work
+	"""
+	__slots__ = ()
+
+	def __getitem__(self, key):
+		if key in self.__slots__:
+			return getattr(self, key)
+		raise KeyError(key)
+
+	def __contains__(self, key):
+		return key in self.__slots__
+
+	def __iter__(self):
+		return iter(self.__slots__)
+
+	def __len__(self):
+		return len(self.__slots__)
+
+	def get(self, key, default=None):
+		if key in self.__slots__:
+			return getattr(self, key)
+		return default
+
+	def keys(self):
+		return list(self.__slots__)
+
+	def values(self):
+		return [getattr(self, key) for key in self.__slots__]
+
+	def items(self):
+		return [(key, getattr(self, key)) for key in self.__slots__]
+
+	def __str__(self):
+		return repr("%s%s" % (self.__class__.__name__, dict(self.items())))
+
 (NET_CONNECTED, NET_DISCONNECTED) = list(range(1,3))
 
 class NetEventType(BaseEventType):
-	def __init__(self, id):
-		if not id in (NET_CONNECTED, NET_DISCONNECTED):
-			raise TypeError("Not a valid net event")
-		self.id = id
+	"""The type of a NetEvent. Instances are interned, like ELEventType's:
+	NetEventType(id) always returns the same instance for a given id"""
+	_types = {}
+
+	def __new__(cls, id):
+		try:
+			return cls._types[id]
+		except KeyError:
+			if not id in (NET_CONNECTED, NET_DISCONNECTED):
+				raise TypeError("Not a valid net event")
+			self = object.__new__(cls)
+			self.id = id
+			return cls._types.setdefault(id, self)
+
+	def __reduce__(self):
+		return (self.__class__, (self.id,))
 
 	def __str__(self):
 		return repr("NetEventType.id=%s" % self.id)
 	
 	def __eq__(self, other):
-		return self.id == other.id
+		return self is other or (other.__class__ is self.__class__ and self.id == other.id)
 	
 	def __cmp__(self, other):
 		return self.id - other.id
 	
 	def __hash__(self):
-		s = self.__str__()
-		return hash(s)
+		return self.id
+
+class NetEventData(EventData):
+	__slots__ = ('connection', 'fileno')
+
+	def __init__(self, connection, fileno):
+		self.connection = connection
+		self.fileno = fileno
 
 class NetEvent(BaseEvent):
 	"""Network related events, like socket disconnected or connected.
 	The data field contains the Connection object and the fileno of the socket.
 	In the case of disconnection, NO operations should be performed on the socket."""
+	__slots__ = ('type', 'data')
+
 	def __init__(self, type, connection = None):
 		if not isinstance(type, NetEventType):
 			raise TypeError()
 		self.type = type
-		self.data = {'connection': connection}
 		if connection.socket != None:
-			self.data['fileno'] = connection.socket.fileno()
+			self.data = NetEventData(connection, connection.socket.fileno())
 		else:
-			self.data['fileno'] = None
+			self.data = NetEventData(connection, None)
 
 	def get_type(self):
 		return self.type
@@ -16,6 +16,11 @@
 # along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
 """Event handlers subscribe to particular events and act on them when raised"""
 
+import asyncio
+
+# Where the work of an OffLoopEventHandler runs
+INLINE, COROUTINE, THREAD, PROCESS = range(4)
+
 class HandlerException(Exception):
 	def __init__(self, val):
 		self.val = val
@@ -38,6 +43,75 @@ class BaseEventHandler(object):
 		"""Returns a list of event types that this handler is subscribed to"""
 		pass
 
+class BatchEventHandler(BaseEventHandler):
+	"""An event handler that gets the events from one network read in a
+	single call to notify_batch(), rather than one notify() per event, when
+	they're raised with raise_events(). It can then act on them as a whole,
+	like redrawing once after a batch of actor events"""
+
+	def notify(self, event):
+		"""An event raised on its own is a batch of one"""
+		self.notify_batch([event])
+
+	def notify_batch(self, events):
+		"""Notify this instance of the list of events raised together, in the
+		order they were raised. Only the events of the types this handler is
+		subscribed to are in the list"""
+		pass
+
+class OffLoopEventHandler(BaseEventHandler):
+	"""An event handler whose work is too slow to run in the connection
+	manager's loop, like disk or database I/O or a long computation.
+
+	For each event, prepare() runs in the loop, work() runs elsewhere (see
+	execution), and apply() runs back in the loop with what work() returned.
+	Only prepare() and apply() may use the connection, e.g. to send the reply
+	work() came up with. The events of a handler are worked on one at a time,
+	in the order they were raised.
+
+	The manager's pyela.logic.workers.EventWorkers does the dispatching. When
+	the event manager has none, like in the chat GUI, notify() does all three
+	steps right away.
+
+	Attributes:
+		execution	- where work() runs: INLINE, COROUTINE (work() is then a
+					  coroutine function, run on the workers' event loop thread),
+					  THREAD (a thread pool) or PROCESS (a process pool; the handler
+					  and what prepare() returns must then be picklable)
+		max_queued	- how many events may wait for work() before new ones are dropped
+	"""
+	execution = THREAD
+	max_queued = 1000
+
+	def notify(self, event):
+		"""Do the work for event right away. A coroutine is run as a task of
+		the running event loop if there is one, so apply() is called once
+		it's done; otherwise it's run to completion on an event loop of its own"""
+		arg = self.prepare(event)
+		if self.execution != COROUTINE:
+			self.apply(event, self.work(arg))
+			return
+		try:
+			loop = asyncio.get_running_loop()
+		except RuntimeError:
+			self.apply(event, asyncio.run(self.work(arg)))
+			return
+		task = loop.create_task(self.work(arg))
+		task.add_done_callback(lambda task: self.apply(event, task.result()))
+
+	def prepare(self, event):
+		"""Runs in the loop. Returns the argument for work(); event by default"""
+		return event
+
+	def work(self, arg):
+		"""Runs off the loop with what prepare() returned. Returns the result
+		for apply()"""
+		pass
+
+	def apply(self, event, result):
+		"""Runs in the loop with the result of work() for event"""
+		pass
+
 class SingleEventHandler(BaseEventHandler):
 	"""An event handler that deals with only one event"""
 
@@ -21,15 +21,27 @@ from pyela.logic.event import BaseEvent
 class SimpleEventManager(object):
 	"""Defines the 'contract' for all events and their respective handlers. 
 	An event manager will deal with notifying the relevant handlers when 
-	a particular event is raised"""
+	a particular event is raised
+
+	Attributes:
+		generation - a number that changes whenever the handlers change, so
+					 that others can tell when to re-check is_handled()
+	"""
 
 	def __init__(self):
 		self._handlers = {}
+		self.generation = 0
 
 	def raise_event(self, event):
 		"""Notify all handlers for the given event"""
 		pass
 
+	def raise_events(self, events):
+		"""Notify all handlers for the given list of events, like the events
+		from one network read. Handlers that implement notify_batch() get the
+		events they're subscribed to in one call"""
+		pass
+
 	def add_handler(self, event_handler):
 		"""Manage the given handler"""
 		# for each event in event_handler.get_events():
@@ -38,3 +50,7 @@ class SimpleEventManager(object):
 		#	else: 
 		#		self._handlers[event.type] = (event_handler)
 		pass
+
+	def is_handled(self, event_type):
+		"""Is there a handler for events of the type event_type?"""
+		pass
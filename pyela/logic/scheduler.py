@@ -0,0 +1,116 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Timers for code running inside a connection manager's loop"""
+
+import heapq
+import itertools
+import logging
+import time
+
+log = logging.getLogger('pyela.logic.scheduler')
+
+class Timer(object):
+	"""A callback scheduled to run at a given time. Returned by
+	Scheduler.call_at and Scheduler.call_later
+
+	Attributes:
+		when		- the time.time() at which the callback is due
+		callback	- the callable to run
+		args		- the positional arguments passed to callback
+		cancelled	- True once the timer has been cancelled or has run
+	"""
+
+	def __init__(self, scheduler, when, callback, args):
+		self.scheduler = scheduler
+		self.when = when
+		self.callback = callback
+		self.args = args
+		self.cancelled = False
+
+	def cancel(self):
+		"""Stop the callback from running, if it hasn't run yet"""
+		if not self.cancelled:
+			self.cancelled = True
+			self.scheduler._cancelled += 1
+
+	def __str__(self):
+		return repr("Timer.when=%f, callback=%s" % (self.when, self.callback))
+
+class Scheduler(object):
+	"""A heap of Timer instances, ordered by when they are due.
+
+	Scheduling and cancelling a timer is O(log n), finding the time until the
+	next timer is due is O(1). The owner of the scheduler is expected to call
+	run_due() regularly, waiting at most next_timeout() seconds in between.
+	"""
+
+	def __init__(self):
+		self._timers = [] # heap of (when, sequence number, Timer)
+		self._seq = itertools.count()
+		self._cancelled = 0
+
+	def __len__(self):
+		"""The amount of timers that haven't run or been cancelled"""
+		return len(self._timers) - self._cancelled
+
+	def call_at(self, when, callback, *args):
+		"""Run callback(*args) once time.time() has reached when.
+		Returns a Timer instance that can be used to cancel the call"""
+		timer = Timer(self, when, callback, args)
+		heapq.heappush(self._timers, (when, next(self._seq), timer))
+		return timer
+
+	def call_later(self, delay, callback, *args):
+		"""Run callback(*args) in delay seconds.
+		Returns a Timer instance that can be used to cancel the call"""
+		return self.call_at(time.time() + delay, callback, *args)
+
+	def next_timeout(self):
+		"""Returns the amount of seconds until the next timer is due (0 if it's
+		overdue), or None if no timers are scheduled"""
+		timers = self._timers
+		while timers and timers[0][2].cancelled:
+			heapq.heappop(timers)
+			self._cancelled -= 1
+		if not timers:
+			return None
+		return max(0, timers[0][0] - time.time())
+
+	def run_due(self):
+		"""Run all timers that are due. Returns the amount of callbacks run.
+		Exceptions raised by callbacks are logged and otherwise ignored"""
+		timers = self._timers
+		now = time.time()
+		ran = 0
+		while timers and timers[0][0] <= now:
+			timer = heapq.heappop(timers)[2]
+			if timer.cancelled:
+				self._cancelled -= 1
+				continue
+			# Mark it as done so that cancelling it from now on is a no-op
+			timer.cancelled = True
+			try:
+				timer.callback(*timer.args)
+			except Exception:
+				log.exception("Error running %s" % timer)
+			ran += 1
+		if self._cancelled > 64 and self._cancelled > len(timers) // 2:
+			# Don't let cancelled timers pile up in the heap
+			self._timers = [t for t in timers if not t[2].cancelled]
+			heapq.heapify(self._timers)
+			self._cancelled = 0
+		return ran
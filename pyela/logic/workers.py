@@ -0,0 +1,210 @@
+# Copyright 2026 Pyela project
+#
+# This file is part of Pyela.
+# 
+# Pyela is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Pyela is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Pyela.  If not, see <http://www.gnu.org/licenses/>.
+"""Runs the work of OffLoopEventHandlers away from a connection manager's loop"""
+
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import socket
+import threading
+import time
+
+from pyela.logic.eventhandlers import COROUTINE, THREAD, PROCESS
+
+log = logging.getLogger('pyela.logic.workers')
+
+# How many events may be worked on at once, over all the handlers
+MAX_IN_FLIGHT = 16
+
+class EventWorkers(object):
+	"""Dispatches the events of pyela.logic.eventhandlers.OffLoopEventHandler
+	instances to a thread pool, a process pool or an event loop running in a
+	thread of its own, each created the first time it's needed.
+
+	A handler has at most one event in flight, so its events are worked on in
+	order; the rest wait in its queue, of at most handler.max_queued events.
+	At most max_in_flight events are in flight over all the handlers.
+
+	When work is done, the worker wakes the manager's loop up through a socket
+	pair; the manager watches fileno() and calls process_done() when it's
+	readable, which runs the handlers' apply() in the loop.
+
+	Attributes:
+		max_in_flight - how many events may be worked on at once
+		threads		- the size of the thread pool, None for the default
+		processes	- the size of the process pool, None for one per CPU
+		in_flight	- how many events are being worked on
+		submitted, completed, failed, dropped - counts of events
+		latency_total, latency_max - the total and the highest amount of seconds
+					  events have waited between being raised and their work starting
+	"""
+
+	def __init__(self, max_in_flight=MAX_IN_FLIGHT, threads=None, processes=None):
+		self.max_in_flight = max_in_flight
+		self.threads = threads
+		self.processes = processes
+		self._thread_pool = None
+		self._process_pool = None
+		self._loop = None
+		self._queues = {} # handler: deque of (event, prepare() result, time.time() it was queued)
+		self._busy = set() # handlers with an event in flight
+		self._ready = collections.deque() # handlers with queued events, waiting for a slot
+		self._done = collections.deque() # (handler, event, future), filled from other threads
+		self._wakeup_r, self._wakeup_w = socket.socketpair()
+		self._wakeup_r.setblocking(False)
+		self._wakeup_w.setblocking(False)
+		self.in_flight = 0
+		self.submitted = 0
+		self.completed = 0
+		self.failed = 0
+		self.dropped = 0
+		self.latency_total = 0.0
+		self.latency_max = 0.0
+
+	def fileno(self):
+		"""The file descriptor that becomes readable when work is done"""
+		return self._wakeup_r.fileno()
+
+	def submit(self, handler, event):
+		"""Queue up event for handler. Called from the manager's loop"""
+		queue = self._queues.get(handler)
+		if queue == None:
+			queue = self._queues[handler] = collections.deque()
+		if len(queue) >= handler.max_queued:
+			self.dropped += 1
+			log.warning("Dropped %s for %s, %d events already queued" % (event, handler, len(queue)))
+			return
+		queue.append((event, handler.prepare(event), time.time()))
+		self.submitted += 1
+		if handler not in self._busy and len(queue) == 1:
+			self._ready.append(handler)
+			self.__start()
+
+	def __start(self):
+		while self._ready and self.in_flight < self.max_in_flight:
+			handler = self._ready.popleft()
+			event, arg, queued = self._queues[handler].popleft()
+			latency = time.time() - queued
+			self.latency_total += latency
+			if latency > self.latency_max:
+				self.latency_max = latency
+			self._busy.add(handler)
+			self.in_flight += 1
+			try:
+				future = self.__run(handler, arg)
+			except Exception as e:
+				future = concurrent.futures.Future()
+				future.set_exception(e)
+			future.add_done_callback(lambda f, handler=handler, event=event: self.__done(handler, event, f))
+
+	def __run(self, handler, arg):
+		if handler.execution == COROUTINE:
+			return asyncio.run_coroutine_threadsafe(handler.work(arg), self.__event_loop())
+		elif handler.execution == PROCESS:
+			if self._process_pool == None:
+				self._process_pool = concurrent.futures.ProcessPoolExecutor(self.processes)
+			return self._process_pool.submit(handler.work, arg)
+		if self._thread_pool == None:
+			self._thread_pool = concurrent.futures.ThreadPoolExecutor(self.threads, thread_name_prefix='pyela-worker')
+		return self._thread_pool.submit(handler.work, arg)
+
+	def __event_loop(self):
+		if self._loop == None:
+			self._loop = asyncio.new_event_loop()
+			threading.Thread(target=self._loop.run_forever, name='pyela-worker-loop', daemon=True).start()
+		return self._loop
+
+	def __done(self, handler, event, future):
+		# Runs in whichever thread completed the future
+		self._done.append((handler, event, future))
+		try:
+			self._wakeup_w.send(b'\0')
+		except (BlockingIOError, OSError):
+			# The loop has been woken up already
+			pass
+
+	def process_done(self):
+		"""Apply the results of the work that's done and start more work.
+		Called from the manager's loop when fileno() is readable.
+		Returns the amount of results applied"""
+		try:
+			while self._wakeup_r.recv(4096):
+				pass
+		except (BlockingIOError, OSError):
+			pass
+		applied = 0
+		while self._done:
+			handler, event, future = self._done.popleft()
+			self._busy.discard(handler)
+			self.in_flight -= 1
+			queue = self._queues.get(handler)
+			if queue:
+				self._ready.append(handler)
+			elif queue != None:
+				del self._queues[handler]
+			try:
+				result = future.result()
+			except Exception:
+				self.failed += 1
+				log.exception("Error running %s for %s" % (handler, event))
+				continue
+			self.completed += 1
+			try:
+				handler.apply(event, result)
+			except Exception:
+				log.exception("Error applying the result of %s for %s" % (handler, event))
+			applied += 1
+		self.__start()
+		return applied
+
+	def queued(self):
+		"""Returns the amount of events waiting for a slot"""
+		return sum(len(queue) for queue in self._queues.values())
+
+	def stats(self):
+		"""Returns a dict with the counts and latencies, and resets latency_max"""
+		started = self.completed + self.failed + self.in_flight
+		stats = {
+			'in_flight': self.in_flight,
+			'queued': self.queued(),
+			'submitted': self.submitted,
+			'completed': self.completed,
+			'failed': self.failed,
+			'dropped': self.dropped,
+			'latency_avg': self.latency_total / started if started else 0.0,
+			'latency_max': self.latency_max,
+		}
+		self.latency_max = 0.0
+		return stats
+
+	def shutdown(self, wait=True):
+		"""Stop the pools and the event loop. Work that's queued is dropped"""
+		self._queues.clear()
+		self._ready.clear()
+		if self._thread_pool != None:
+			self._thread_pool.shutdown(wait)
+			self._thread_pool = None
+		if self._process_pool != None:
+			self._process_pool.shutdown(wait)
+			self._process_pool = None
+		if self._loop != None:
+			self._loop.call_soon_threadsafe(self._loop.stop)
+			self._loop = None
+
+	def __str__(self):
+		return repr("EventWorkers.in_flight=%d, queued=%d" % (self.in_flight, self.queued()))
@@ -54,6 +54,19 @@ class BaseConnection(object):
 		"""sends the given packet to the remote server"""
 		pass
 
+	def flush(self):
+		"""Write out as much buffered output as possible without blocking.
+		Returns True if there's nothing left to send"""
+		return True
+
+	def want_write(self):
+		"""Is there buffered output waiting for the connection to become writable?"""
+		return False
+
+	def is_congested(self):
+		"""Has so much output been buffered that callers should stop sending?"""
+		return False
+
 	def send_all(self, packets):
 		"""Send all of the ELPacket instances in the list packets"""
 		pass
@@ -71,11 +84,12 @@ class BaseConnection(object):
 		"""Process this connection's output queue, if present
 		By default, this will retrieve its output queue from
 		self.packet_handler.opt_queue_shift()
+		Packets are sent one by one until the queue is empty or the
+		connection is congested; the rest are left in the queue for later.
 		"""
-		while True:
+		while not self.is_congested():
 			p = self.packet_handler.opt_queue_shift()
-			if log.isEnabledFor('DEBUG'): log.debug("Processing: %s" % p)
+			if log.isEnabledFor(logging.DEBUG): log.debug("Processing: %s" % p)
 			if not p:
 				break
-			else:
-				self.send(p)
+			self.send(p)
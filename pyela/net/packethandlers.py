@@ -25,7 +25,12 @@ class BasePacketHandler(object):
 	Attributes:
 		_inp	- an instance of collections.deque
 		_opt	- an instance of collections.deque
+		wanted	- None, or a sequence of 256 flags indexed by message type.
+				  Connections that support it don't create packets for the
+				  message types whose flag is 0. None means every type is wanted
 	"""
+
+	wanted = None
 	
 	def __init__(self):
 		self._inp = collections.deque()